@@ -0,0 +1,513 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks del Terminal Comandado por Voz
+"""
+
+import array
+import difflib
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import types
+import wave
+
+import voz
+import speech_recognition as sr
+
+
+# Corpus de frases reales tal como llegan del reconocedor
+CORPUS_FRASES = [
+    "listar",
+    "mostrar archivos",
+    "qué hora es",
+    "hora",
+    "fecha actual",
+    "qué día es",
+    "memoria",
+    "uso de disco",
+    "mostrar procesos",
+    "conexiones de red",
+    "información del sistema",
+    "directorio actual",
+    "dónde estoy",
+    "crear carpeta proyectos",
+    "crear archivo notas.txt",
+    "ejecutar ipconfig",
+    "ejecutar git status",
+    "cambiar ruta a c:/users/frank/documents",
+    "ir a documentos",
+    "cambiar directorio a descargas",
+    "buscar clima en lima",
+    "abrir navegador",
+    "activar voz",
+    "desactivar voz",
+    "ayuda",
+    "comandos",
+    "usar ruta predeterminada",
+    "redactar un correo",
+    "salir",
+]
+
+
+def cadena_original(texto):
+    """Reproduce la cadena de elif/any() original de procesar_comando"""
+    if any(p in texto for p in ["salir", "terminar", "adiós", "adios", "cerrar", "exit"]):
+        return "salir"
+    elif any(p in texto for p in ["establecer ruta a", "cambiar ruta a", "cambiar ruta de trabajo a", "ruta a"]):
+        return "establecer_ruta"
+    elif any(p in texto for p in ["usar ruta predeterminada", "ruta por defecto", "ruta predeterminada", "ruta home"]):
+        return "ruta_predeterminada"
+    elif any(p in texto for p in ["cambiar directorio a", "ir a directorio", "cambiar a", "ir a"]):
+        return "cambiar_directorio"
+    elif any(p in texto for p in ["crear carpeta", "nueva carpeta", "hacer carpeta", "crea carpeta"]):
+        return "crear_carpeta"
+    elif any(p in texto for p in ["ejecutar", "correr", "lanzar", "ejecuta"]):
+        return "ejecutar"
+    elif any(p in texto for p in ["listar", "mostrar archivos", "mostrar directorio", "lista", "ls", "dir", "ver archivos"]):
+        return "listar"
+    elif "cambiar directorio" in texto or "ir a directorio" in texto:
+        return "cambiar_directorio"
+    elif any(p in texto for p in ["directorio actual", "dónde estoy", "donde estoy", "ruta actual", "directorio"]):
+        return "directorio_actual"
+    elif any(p in texto for p in ["hora", "qué hora es", "que hora es", "hora actual", "tiempo"]):
+        return "hora"
+    elif any(p in texto for p in ["fecha", "qué día es", "que dia es", "qué fecha es", "fecha actual", "hoy"]):
+        return "fecha"
+    elif any(p in texto for p in ["abrir navegador", "abrir web", "navegador", "abrir browser", "internet"]):
+        return "abrir_navegador"
+    elif "buscar" in texto or "busca" in texto:
+        return "buscar"
+    elif any(p in texto for p in ["crear archivo", "nuevo archivo", "hacer archivo", "crea archivo"]):
+        return "crear_archivo"
+    elif any(p in texto for p in ["información del sistema", "info sistema", "información", "sistema", "información de sistema"]):
+        return "informacion_sistema"
+    elif any(p in texto for p in ["mostrar procesos", "procesos en ejecución", "procesos", "ver procesos", "listar procesos"]):
+        return "procesos"
+    elif any(p in texto for p in ["uso de memoria", "memoria", "ram", "memoria ram"]):
+        return "memoria"
+    elif any(p in texto for p in ["uso de disco", "espacio en disco", "disco", "espacio disco"]):
+        return "disco"
+    elif any(p in texto for p in ["conexiones de red", "mostrar conexiones", "red", "conexiones", "conexión"]):
+        return "red"
+    elif any(p in texto for p in ["activar voz", "habilitar voz", "con voz", "activa voz"]):
+        return "activar_voz"
+    elif any(p in texto for p in ["desactivar voz", "deshabilitar voz", "sin voz", "desactiva voz"]):
+        return "desactivar_voz"
+    elif any(p in texto for p in ["ayuda", "help", "comandos", "qué puedo hacer", "que puedo hacer"]):
+        return "ayuda"
+    return None
+
+
+def medir(funcion, entradas, repeticiones):
+    """Devuelve los microsegundos promedio por llamada"""
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        for entrada in entradas:
+            funcion(entrada)
+    transcurrido = time.perf_counter() - inicio
+    return transcurrido / (repeticiones * len(entradas)) * 1e6
+
+
+def benchmark_intenciones(repeticiones=2000):
+    """Compara IntentMatcher con la cadena lineal original"""
+    matcher = voz.IntentMatcher()
+
+    print("== Resolución de intenciones ==")
+    print(f"{'frase':<42}{'original':<22}{'compilado':<22}")
+    for frase in CORPUS_FRASES:
+        print(f"{frase:<42}{str(cadena_original(frase)):<22}{str(matcher.resolve(frase)[0]):<22}")
+
+    t_original = medir(cadena_original, CORPUS_FRASES, repeticiones)
+    t_compilado = medir(matcher.resolve, CORPUS_FRASES, repeticiones)
+    print(f"\nCadena original:  {t_original:.2f} µs/frase")
+    print(f"IntentMatcher:    {t_compilado:.2f} µs/frase")
+    print()
+
+
+def normalizacion_original(texto):
+    """Reproduce la cadena de str.replace original de process_recognized_text"""
+    texto_limpio = texto.lower().strip()
+    replacements = dict(voz.TEXT_REPLACEMENTS)  # El original reconstruía el dict en cada llamada
+    for wrong, correct in replacements.items():
+        texto_limpio = texto_limpio.replace(wrong, correct)
+    return texto_limpio
+
+
+def benchmark_normalizacion(tamano_corpus=50000):
+    """Mide el rendimiento del normalizador sobre un corpus grande"""
+    normalizer = voz.TextNormalizer()
+    corpus = [CORPUS_FRASES[i % len(CORPUS_FRASES)].capitalize() for i in range(tamano_corpus)]
+    caracteres = sum(len(frase) for frase in corpus)
+
+    print("== Normalización de texto ==")
+    for frase in ["Lista", "redactar un correo", "procesos", "crea carpeta red", "muestrame los procesos"]:
+        print(f"{frase!r:<24} original={normalizacion_original(frase)!r:<40} nuevo={normalizer.normalize(frase)!r}")
+
+    for nombre, funcion in (("Cadena str.replace", normalizacion_original), ("TextNormalizer", normalizer.normalize)):
+        inicio = time.perf_counter()
+        for frase in corpus:
+            funcion(frase)
+        transcurrido = time.perf_counter() - inicio
+        print(f"{nombre:<20} {tamano_corpus / transcurrido:>12,.0f} frases/s  {caracteres / transcurrido / 1e6:.2f} M caracteres/s")
+    print()
+
+
+def cargar_audios_benchmark():
+    """Lee los WAV de $VOZ_BENCH_AUDIO o genera una frase sintética de 1.5 s"""
+    carpeta = os.environ.get("VOZ_BENCH_AUDIO")
+    audios = []
+    if carpeta and os.path.isdir(carpeta):
+        for nombre in sorted(os.listdir(carpeta)):
+            if nombre.lower().endswith(".wav"):
+                with wave.open(os.path.join(carpeta, nombre), "rb") as wav:
+                    audios.append(sr.AudioData(wav.readframes(wav.getnframes()),
+                                               wav.getframerate(), wav.getsampwidth()))
+    if not audios:
+        muestras = array.array("h", (int(8000 * math.sin(2 * math.pi * 220 * i / 16000)) for i in range(24000)))
+        audios.append(sr.AudioData(muestras.tobytes(), 16000, 2))
+    return audios
+
+
+def benchmark_reconocimiento(repeticiones=3):
+    """Compara la latencia de cada motor de reconocimiento disponible"""
+    audios = cargar_audios_benchmark()
+    print("== Motores de reconocimiento ==")
+    print(f"{len(audios)} audio(s), {repeticiones} repetición(es)")
+    for nombre in voz.RECOGNITION_BACKENDS:
+        try:
+            backend = voz.create_recognition_backend(nombre)
+        except Exception as e:
+            print(f"{nombre:<10} no disponible: {e}")
+            continue
+        latencias = []
+        errores = 0
+        for _ in range(repeticiones):
+            for audio in audios:
+                inicio = time.perf_counter()
+                try:
+                    backend.recognize(audio)
+                except sr.UnknownValueError:
+                    pass  # Audio sin texto: la latencia sigue siendo válida
+                except Exception:
+                    errores += 1
+                    continue
+                latencias.append(time.perf_counter() - inicio)
+        if not latencias:
+            print(f"{nombre:<10} sin resultados ({errores} errores)")
+            continue
+        latencias.sort()
+        media = sum(latencias) / len(latencias)
+        p95 = latencias[min(len(latencias) - 1, int(len(latencias) * 0.95))]
+        print(f"{nombre:<10} media {media * 1000:8.1f} ms  p95 {p95 * 1000:8.1f} ms  errores {errores}")
+    print()
+
+
+# Transcripciones erróneas típicas que no contienen ninguna frase exacta
+CORPUS_DIFUSO = [
+    "ora",
+    "memorya",
+    "mostar procesos",
+    "ver prosesos",
+    "informasion del sistema",
+    "crear carpta proyectos",
+    "abrir navegdor",
+    "cambiar directoryo a descargas",
+    "uso de disko",
+    "conexiones de rez",
+    "direktorio actual",
+    "aiuda",
+]
+
+
+def busqueda_difflib(texto, entradas):
+    """Recorre todas las frases con difflib y devuelve la intención más parecida"""
+    mejor = max(entradas, key=lambda e: difflib.SequenceMatcher(None, texto, e[0]).ratio())
+    return mejor[1]
+
+
+def benchmark_difuso(repeticiones=200):
+    """Compara FuzzyCommandIndex con un recorrido completo usando difflib"""
+    indice = voz.FuzzyCommandIndex()
+    print("== Coincidencia difusa de comandos ==")
+    print(f"{len(indice.entradas)} frases indexadas")
+    print(f"{'texto':<34}{'difflib':<22}{'índice':<22}{'confianza'}")
+    for texto in CORPUS_DIFUSO:
+        candidatos = indice.search(texto)
+        intent, confianza = (candidatos[0][1], candidatos[0][0]) if candidatos else (None, 0.0)
+        print(f"{texto:<34}{busqueda_difflib(texto, indice.entradas):<22}{str(intent):<22}{confianza:.2f}")
+    
+    t_difflib = medir(lambda t: busqueda_difflib(t, indice.entradas), CORPUS_DIFUSO, repeticiones)
+    t_indice = medir(indice.search, CORPUS_DIFUSO, repeticiones)
+    print(f"\nRecorrido difflib:  {t_difflib:.1f} µs/frase")
+    print(f"FuzzyCommandIndex:  {t_indice:.1f} µs/frase")
+    print()
+
+
+def benchmark_consola(mensajes=20000, lote=200):
+    """Mide los mensajes por segundo que pinta la consola con la plataforma Qt offscreen"""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+    
+    print("== Consola ==")
+    tipos = ["respuesta", "sistema", "error", "comando"]
+    for tema in ("black_and_white", "light"):
+        ventana = types.SimpleNamespace(current_theme=tema)
+        consola = voz.ConsoleTextEdit(parent_window=ventana, max_lines=2000)
+        consola.resize(800, 600)
+        consola.show()
+        inicio = time.perf_counter()
+        # Ráfagas de lote mensajes; el planificador de la consola decide cuándo pintar
+        for i in range(mensajes):
+            consola.append_message(f"línea de salida número {i} con algo de texto", tipos[i % len(tipos)])
+            if i % lote == lote - 1:
+                app.processEvents()
+        while consola.buffer:
+            app.processEvents()
+        transcurrido = time.perf_counter() - inicio
+        metricas = consola.metrics()
+        print(f"{tema:<16} {mensajes / transcurrido:>10,.0f} mensajes/s  ({consola.document().blockCount()} líneas retenidas, "
+              f"{metricas['pintados']} pintados, latencia media {metricas['latencia_media_ms']:.1f} ms, "
+              f"máx {metricas['latencia_max_ms']:.1f} ms)")
+        consola.close()
+    print()
+
+
+def benchmark_historial(entradas=300000, distintos=60000):
+    """Mide la búsqueda en un historial persistente de cientos de miles de entradas"""
+    verbos = ["ejecutar", "crear carpeta", "crear archivo", "cambiar a", "buscar", "ir a"]
+    objetos = ["git status", "npm install", "proyecto", "notas", "documentos", "python main.py",
+               "informe", "descargas", "docker ps", "ping google.com"]
+    aleatorio = random.Random(1)
+    comandos = [f"{aleatorio.choice(verbos)} {aleatorio.choice(objetos)} {i}" for i in range(distintos)]
+    
+    print("== Historial de comandos ==")
+    with tempfile.TemporaryDirectory() as carpeta:
+        historial = voz.CommandHistory(os.path.join(carpeta, "historial.sqlite3"))
+        inicio = time.perf_counter()
+        for _ in range(entradas):
+            historial.add(aleatorio.choice(comandos))
+        historial.close()  # Espera a que el escritor vacíe la cola
+        print(f"{entradas:,} entradas ({distintos:,} distintas) guardadas en {time.perf_counter() - inicio:.2f} s")
+        
+        historial = voz.CommandHistory(os.path.join(carpeta, "historial.sqlite3"))
+        inicio = time.perf_counter()
+        recientes = len(historial.recientes)
+        print(f"Carga perezosa de {recientes} recientes: {(time.perf_counter() - inicio) * 1000:.1f} ms")
+        for consulta in ["ejecutar git", "docker", "notas 59", "gst", "crpt doc"]:
+            repeticiones = 20
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                resultados = historial.search(consulta)
+            transcurrido = (time.perf_counter() - inicio) / repeticiones * 1000
+            primero = resultados[0] if resultados else "-"
+            print(f"{consulta!r:<16} {transcurrido:8.2f} ms  {len(resultados):>2} resultados  primero: {primero}")
+        historial.close()
+    print()
+
+
+def benchmark_sistema(repeticiones=20):
+    """Compara las consultas del sistema en Python con lanzar el comando en un shell"""
+    windows = platform.system() == "Windows"
+    comandos = {
+        "memoria": "wmic OS get FreePhysicalMemory,TotalVisibleMemorySize /Value" if windows else "free -h",
+        "disco": "wmic logicaldisk get caption,freespace,size /format:table" if windows else "df -h",
+        "procesos": "tasklist" if windows else "ps aux",
+        "red": "netstat -an" if windows else "netstat -tup",
+    }
+    print("== Consultas del sistema ==")
+    print(f"psutil: {'sí' if voz.psutil is not None else 'no'}")
+    for consulta, comando in comandos.items():
+        try:
+            voz.system_report(consulta)
+        except voz.NativeQueryUnavailable:
+            print(f"{consulta:<9} sin implementación nativa en este sistema")
+            continue
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            voz.system_report(consulta)
+        nativo = (time.perf_counter() - inicio) / repeticiones * 1000
+        
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            subprocess.run(comando, shell=True, capture_output=True)
+        shell = (time.perf_counter() - inicio) / repeticiones * 1000
+        print(f"{consulta:<9} nativo {nativo:7.2f} ms   shell ({comando.split()[0]}) {shell:7.2f} ms   x{shell / nativo:.1f}")
+    print()
+
+
+def benchmark_shell(comandos=200):
+    """Compara comandos por segundo con el shell persistente y con un shell por comando"""
+    comando = "echo hola" if platform.system() == "Windows" else "echo $((1 + 1))"
+    cwd = tempfile.gettempdir()
+    print("== Shell persistente ==")
+    for nombre, persistente in (("un shell por comando", False), ("shell persistente", True)):
+        ejecutor = voz.CommandExecutor(streaming=False, persistent_shell=persistente)
+        ejecutor.run_command(comando, cwd)  # Arranca el shell persistente fuera de la medida
+        inicio = time.perf_counter()
+        for _ in range(comandos):
+            mensaje, tipo = ejecutor.run_command(comando, cwd)
+        transcurrido = time.perf_counter() - inicio
+        ejecutor.shutdown()
+        print(f"{nombre:<22} {comandos / transcurrido:8.0f} comandos/s  ({transcurrido / comandos * 1000:.2f} ms/comando, {tipo})")
+    print()
+
+
+def benchmark_listado(entradas=100000, repeticiones=5):
+    """Compara el listado nativo cacheado con ls -la/dir sobre un directorio enorme"""
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+    comando = "dir" if platform.system() == "Windows" else "ls -la"
+    
+    print("== Listado de directorios ==")
+    with tempfile.TemporaryDirectory() as carpeta:
+        for i in range(entradas):
+            open(os.path.join(carpeta, f"archivo_{i:06d}.txt"), "w").close()
+        
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            subprocess.run(comando, shell=True, cwd=carpeta, capture_output=True)
+        shell = (time.perf_counter() - inicio) / repeticiones * 1000
+        
+        lister = voz.DirectoryLister()
+        inicio = time.perf_counter()
+        texto = lister.page_text(carpeta, 0)
+        frio = (time.perf_counter() - inicio) * 1000
+        app.processEvents()  # Alta del watcher
+        
+        inicio = time.perf_counter()
+        for pagina in range(repeticiones):
+            lister.page_text(carpeta, pagina * lister.page_size)
+        caliente = (time.perf_counter() - inicio) / repeticiones * 1000
+        print(f"{entradas:,} entradas")
+        print(f"{comando:<22} {shell:8.2f} ms")
+        print(f"{'nativo, sin caché':<22} {frio:8.2f} ms  (primera página: {len(texto.splitlines())} líneas)")
+        print(f"{'nativo, con caché':<22} {caliente:8.2f} ms  {lister.metrics()}")
+    print()
+
+
+def benchmark_indice(archivos_disco=100000, archivos_memoria=1000000):
+    """Mide el recorrido paralelo de un árbol real y la búsqueda sobre un millón de nombres"""
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+    palabras = ["informe", "factura", "notas", "proyecto", "presupuesto", "foto", "acta", "contrato",
+                "datos", "resumen", "borrador", "final", "copia", "versión", "enero", "marzo"]
+    extensiones = [".pdf", ".txt", ".docx", ".xlsx", ".jpg", ".py", ".md"]
+    aleatorio = random.Random(1)
+    
+    def nombre(i):
+        return f"{aleatorio.choice(palabras)}_{aleatorio.choice(palabras)}_{i}{aleatorio.choice(extensiones)}"
+    
+    print("== Índice de archivos ==")
+    with tempfile.TemporaryDirectory() as carpeta:
+        por_carpeta = 100
+        for c in range(archivos_disco // por_carpeta):
+            ruta = os.path.join(carpeta, f"grupo_{c // 30}", f"carpeta_{c}")
+            os.makedirs(ruta)
+            for i in range(por_carpeta):
+                open(os.path.join(ruta, nombre(c * por_carpeta + i)), "w").close()
+        
+        for trabajadores in (1, 8):
+            indice = voz.FileIndex(workers=trabajadores)
+            listo = []
+            indice.ready.connect(lambda entradas, segundos: listo.append((entradas, segundos)))
+            indice.build(carpeta)
+            while not listo:
+                app.processEvents()
+                time.sleep(0.01)
+            entradas, segundos = listo[0]
+            print(f"Recorrido con {trabajadores} hilo(s): {entradas:,} entradas en {segundos:.2f} s")
+            indice.close()
+    
+    # Un millón de nombres en memoria para medir solo la búsqueda
+    indice = voz.FileIndex()
+    por_carpeta = 200
+    indice.carpetas = {
+        f"/datos/carpeta_{c}": ([nombre(c * por_carpeta + i) for i in range(por_carpeta)], [])
+        for c in range(archivos_memoria // por_carpeta)
+    }
+    inicio = time.perf_counter()
+    indice.snapshot = indice._make_snapshot(indice.carpetas)
+    print(f"Instantánea de {archivos_memoria:,} nombres: {time.perf_counter() - inicio:.2f} s")
+    
+    # Un archivo nuevo solo rehace la capa de cambios de su carpeta
+    indice.carpetas["/datos/carpeta_7"][0].append(nombre(archivos_memoria))
+    indice.cambiadas.add("/datos/carpeta_7")
+    inicio = time.perf_counter()
+    indice._make_overlay()
+    print(f"Actualización de una carpeta: {(time.perf_counter() - inicio) * 1000:.2f} ms")
+    for consulta in ["informe final", "presupuesto_acta_4242", "acta 99999", "contrto", "rsmn brrdr 777"]:
+        repeticiones = 5
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            resultados = indice.search(consulta)
+        transcurrido = (time.perf_counter() - inicio) / repeticiones * 1000
+        primero = os.path.basename(resultados[0][0]) if resultados else "-"
+        tipo = resultados[0][2] if resultados else ""
+        print(f"{consulta!r:<24} {transcurrido:8.2f} ms  {len(resultados):>2} resultados  primero: {primero} ({tipo})")
+    indice.close()
+    print()
+
+
+def benchmark_directorios(carpetas=2000, repeticiones=200):
+    """Mide la resolución de nombres de carpeta hablados con la caché caliente"""
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication(sys.argv)
+    nombres = ["Documents", "Downloads", "Desktop", "Mis Vídeos", "Música", "Hojas de Cálculo", "Xilófono"]
+    consultas = ["documentos", "descargas", "escritorio", "bideos", "musica", "hojas de calculo",
+                 "jilofono", "proyecto 1234", "kimica"]
+    print("== Resolución de carpetas ==")
+    with tempfile.TemporaryDirectory() as casa:
+        for nombre in nombres:
+            os.makedirs(os.path.join(casa, nombre))
+        for i in range(carpetas):
+            os.makedirs(os.path.join(casa, "proyectos", f"proyecto_{i}"))
+        cwd = os.path.join(casa, "proyectos", "proyecto_0")
+        resolver = voz.DirectoryResolver(voz.DirectoryLister(), bookmarks=[casa])
+        
+        inicio = time.perf_counter()
+        resolver.resolve("documentos", cwd)
+        print(f"{carpetas:,} carpetas hermanas; primera consulta (construye los índices): "
+              f"{(time.perf_counter() - inicio) * 1000:.2f} ms")
+        app.processEvents()
+        for consulta in consultas:
+            # Sin el resultado recordado: claves de la consulta, votos y distancias de edición
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                resolver.results.clear()
+                resultado = resolver.resolve(consulta, cwd)
+            nueva = (time.perf_counter() - inicio) / repeticiones * 1000
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                resultado = resolver.resolve(consulta, cwd)
+            repetida = (time.perf_counter() - inicio) / repeticiones * 1000
+            mejor = f"{os.path.basename(resultado[0][1])} ({resultado[0][0]:.2f})" if resultado else "-"
+            print(f"{consulta!r:<20} nueva {nueva:6.3f} ms  repetida {repetida:6.3f} ms  {mejor}")
+    print()
+
+
+BENCHMARKS = {
+    "intenciones": benchmark_intenciones,
+    "normalizacion": benchmark_normalizacion,
+    "reconocimiento": benchmark_reconocimiento,
+    "difuso": benchmark_difuso,
+    "consola": benchmark_consola,
+    "historial": benchmark_historial,
+    "sistema": benchmark_sistema,
+    "shell": benchmark_shell,
+    "listado": benchmark_listado,
+    "indice": benchmark_indice,
+    "directorios": benchmark_directorios,
+}
+
+
+if __name__ == "__main__":
+    # Ejecutar solo los benchmarks indicados o todos si no se indica ninguno
+    seleccion = sys.argv[1:] or list(BENCHMARKS)
+    for nombre in seleccion:
+        BENCHMARKS[nombre]()
@@ -0,0 +1,1126 @@
+"""Pruebas de las partes de voz.py que no necesitan micrófono ni ventana
+
+Se ejecutan con:  python -m unittest test_voz
+"""
+import array
+import json
+import math
+import os
+import platform
+import queue
+import shlex
+import shutil
+import signal
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import unittest.mock
+import wave
+
+import speech_recognition as sr
+from PyQt5.QtCore import QCoreApplication, Qt
+
+import voz
+
+
+def setUpModule():
+    # QFileSystemWatcher y QTimer necesitan una aplicación Qt
+    global app
+    app = QCoreApplication.instance() or QCoreApplication([])
+
+
+def procesar_eventos_hasta(condicion, timeout=5):
+    """Atiende el bucle de eventos de Qt hasta que condicion() se cumpla o pase timeout"""
+    limite = time.monotonic() + timeout
+    while not condicion() and time.monotonic() < limite:
+        QCoreApplication.processEvents()
+        time.sleep(0.01)
+    return condicion()
+
+
+def palabra_sintetica(tonos, duracion=0.8, ruido=0.0, semilla=0, rate=16000):
+    """AudioData con un tramo de tono por elemento de tonos y ruido gaussiano opcional"""
+    rng = voz.np.random.default_rng(semilla)
+    t = voz.np.arange(int(duracion * rate)) / rate
+    tramos = voz.np.array_split(t, len(tonos))
+    senal = voz.np.concatenate([voz.np.sin(2 * voz.np.pi * f * tramo) for f, tramo in zip(tonos, tramos)])
+    senal = senal * voz.np.hanning(len(senal)) * 8000 + rng.normal(0, ruido, len(senal))
+    return sr.AudioData(voz.np.clip(senal, -32768, 32767).astype(voz.np.int16).tobytes(), rate, 2)
+
+
+class TextNormalizerTest(unittest.TestCase):
+    def setUp(self):
+        self.normalizer = voz.TextNormalizer()
+
+    def test_ampliacion_sin_verbo(self):
+        self.assertEqual(self.normalizer.normalize("procesos"), "mostrar procesos")
+        self.assertEqual(self.normalizer.normalize("internet"), "abrir navegador")
+
+    def test_verbo_previo_no_duplica_la_orden(self):
+        self.assertEqual(self.normalizer.normalize("muestrame los procesos"), "mostrar los procesos")
+        self.assertEqual(self.normalizer.normalize("abre internet"), "abrir internet")
+
+    def test_argumento_literal(self):
+        self.assertEqual(self.normalizer.normalize("ejecutar ps procesos"), "ejecutar ps procesos")
+
+
+class IntentMatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.matcher = voz.IntentMatcher()
+
+    def test_gana_la_frase_mas_larga(self):
+        self.assertEqual(self.matcher.resolve("desactivar voz"), ("desactivar_voz", ""))
+        self.assertEqual(self.matcher.resolve("activar voz"), ("activar_voz", ""))
+        self.assertEqual(self.matcher.resolve("directorio actual"), ("directorio_actual", ""))
+        self.assertEqual(self.matcher.resolve("cambiar directorio a docs"), ("cambiar_directorio", "docs"))
+        self.assertEqual(self.matcher.resolve("ir a directorio fotos"), ("cambiar_directorio", "fotos"))
+        self.assertEqual(self.matcher.resolve("establecer ruta a /tmp"), ("establecer_ruta", "/tmp"))
+
+    def test_solo_palabras_completas(self):
+        for texto in ["redactar", "redactar un informe", "dirección", "el listado", "horario", "mi radio", ""]:
+            with self.subTest(texto=texto):
+                self.assertEqual(self.matcher.resolve(texto), (None, ""))
+
+    def test_el_argumento_es_el_resto_del_texto(self):
+        self.assertEqual(self.matcher.resolve("ejecutar ls y salir"), ("ejecutar", "ls y salir"))
+        self.assertEqual(self.matcher.resolve("crear carpeta mis fotos"), ("crear_carpeta", "mis fotos"))
+        self.assertEqual(self.matcher.resolve("por favor qué hora es"), ("hora", ""))
+
+    def test_metricas(self):
+        self.assertEqual(self.matcher.resolve("mostrar métricas"), ("metricas", ""))
+        self.assertEqual(self.matcher.resolve("estadísticas"), ("metricas", ""))
+
+
+class IntentSelectionTest(unittest.TestCase):
+    def setUp(self):
+        self.matcher = voz.IntentMatcher()
+
+    def test_gana_la_mejor_situada_a_igualdad_de_intencion(self):
+        texto, intent, argumento, indice = self.matcher.select([("crear carpeta fotos", 0.6),
+                                                                ("crear carpeta foto", 0.54)])
+        self.assertEqual((texto, intent, argumento, indice), ("crear carpeta fotos", "crear_carpeta", "fotos", 0))
+
+    def test_la_alternativa_con_intencion_pesa_mas(self):
+        self.assertEqual(self.matcher.select([("ora", 0.9), ("hora", 0.5)])[1:], ("hora", "", 1))
+        self.assertEqual(self.matcher.select([]), (None, None, "", -1))
+
+    def test_confianzas_de_google_sin_valor(self):
+        backend = voz.GoogleRecognitionBackend()
+        backend.recognizer.recognize_google = lambda audio, **opciones: {"alternative": [
+            {"transcript": "crear carpeta fotos", "confidence": 0.6},
+            {"transcript": "crear carpeta foto"},
+            {"transcript": "crear carpeta photos"},
+        ]}
+        alternativas = backend.recognize_alternatives(None)
+        confianzas = [confianza for _, confianza in alternativas]
+        self.assertEqual(confianzas[0], 0.6)
+        self.assertTrue(confianzas[0] > confianzas[1] > confianzas[2])
+        self.assertEqual(self.matcher.select(alternativas)[3], 0)
+
+    def test_google_sin_ninguna_confianza(self):
+        backend = voz.GoogleRecognitionBackend()
+        backend.recognizer.recognize_google = lambda audio, **opciones: {"alternative": [
+            {"transcript": "hora"}, {"transcript": "ora"}]}
+        self.assertAlmostEqual(backend.recognize_alternatives(None)[0][1], 0.8)
+        backend.recognizer.recognize_google = lambda audio, **opciones: []
+        with self.assertRaises(sr.UnknownValueError):
+            backend.recognize_alternatives(None)
+
+
+class FuzzyCommandIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.index = voz.FuzzyCommandIndex()
+
+    def test_puntuaciones(self):
+        confianza, intent, argumento, frase = self.index.search("mostar procesos")[0]
+        self.assertEqual((intent, frase), ("procesos", "mostrar procesos"))
+        self.assertAlmostEqual(confianza, 1 - 1 / 16)
+        confianza, intent, argumento, _ = self.index.search("nueva carpta fotos")[0]
+        self.assertEqual((intent, argumento), ("crear_carpeta", "fotos"))
+        self.assertGreater(confianza, 0.9)
+        self.assertEqual(self.index.search(""), [])
+        self.assertLessEqual(len(self.index.search("crear carpta", limite=2)), 2)
+        puntuaciones = [c[0] for c in self.index.search("memorya")]
+        self.assertEqual(puntuaciones, sorted(puntuaciones, reverse=True))
+
+    def test_consultas_se_ejecutan_por_aproximacion(self):
+        for texto, intent in [("memorya", "memoria"), ("mostar procesos", "procesos"),
+                              ("direktorio actual", "directorio_actual"), ("aiuda", "ayuda")]:
+            with self.subTest(texto=texto):
+                elegido, sugerencias = self.index.resolve(texto)
+                self.assertEqual(elegido[1], intent)
+                self.assertEqual(sugerencias, [])
+
+    def test_ordenes_con_efectos_solo_se_sugieren(self):
+        for texto, intent in [("nueva carpta fotos", "crear_carpeta"), ("establecer rota a /etc", "establecer_ruta"),
+                              ("cerar", "salir"), ("ruta por defeto", "ruta_predeterminada"),
+                              ("desactivar bos", "desactivar_voz")]:
+            with self.subTest(texto=texto):
+                elegido, sugerencias = self.index.resolve(texto)
+                self.assertIsNone(elegido)
+                self.assertGreaterEqual(sugerencias[0][0], 0.8)
+                self.assertEqual(sugerencias[0][1], intent)
+
+    def test_umbrales(self):
+        # "ora" se parece a "hora" un 75 %: por debajo del umbral de ejecución, se sugiere
+        elegido, sugerencias = self.index.resolve("ora")
+        self.assertIsNone(elegido)
+        self.assertEqual(sugerencias[0][1], "hora")
+        self.assertEqual(self.index.resolve("ora", umbral_auto=0.7)[0][1], "hora")
+        self.assertEqual(self.index.resolve("ora", umbral_sugerencia=0.8), (None, []))
+        self.assertEqual(self.index.resolve("xyz"), (None, []))
+        self.assertTrue(all(c[0] >= 0.5 for c in self.index.resolve("crear carpta")[1]))
+
+
+class CommandPlannerTest(unittest.TestCase):
+    def setUp(self):
+        self.planner = voz.CommandPlanner(voz.IntentMatcher())
+
+    def pasos(self, texto):
+        grupos, excluidos = self.planner.plan(texto)
+        return [(intent, argumento) for grupo in grupos for _, intent, argumento in grupo], excluidos
+
+    def test_ordenes_encadenadas(self):
+        pasos, _ = self.pasos("crear carpeta demo y luego ir a demo y listar")
+        self.assertEqual(pasos, [("crear_carpeta", "demo"), ("cambiar_directorio", "demo"), ("listar", "")])
+
+    def test_consultas_en_un_grupo(self):
+        grupos, _ = self.planner.plan("hora y memoria y disco")
+        self.assertEqual([[intent for _, intent, _ in grupo] for grupo in grupos], [["hora", "memoria", "disco"]])
+
+    def test_ejecutar_se_queda_con_el_resto(self):
+        pasos, _ = self.pasos("ejecutar echo hola y adiós")
+        self.assertEqual(pasos, [("ejecutar", "echo hola y adiós")])
+        pasos, _ = self.pasos("ejecutar ls y luego listar")
+        self.assertEqual(pasos, [("ejecutar", "ls y luego listar")])
+
+    def test_comillas_no_se_cortan(self):
+        pasos, _ = self.pasos('ejecutar git commit -m "hora y fecha"')
+        self.assertEqual(pasos, [("ejecutar", 'git commit -m "hora y fecha"')])
+        pasos, _ = self.pasos('ir a demo y crear carpeta "notas, luego hora"')
+        self.assertEqual(pasos, [("cambiar_directorio", "demo"), ("crear_carpeta", '"notas, luego hora"')])
+
+    def test_texto_libre_solo_se_corta_en_secuencia(self):
+        pasos, _ = self.pasos("crear carpeta fotos y red")
+        self.assertEqual(pasos, [("crear_carpeta", "fotos y red")])
+        pasos, _ = self.pasos("buscar archivo informe, hora")
+        self.assertEqual(pasos, [("buscar_archivo", "informe, hora")])
+        pasos, _ = self.pasos("crear archivo notas después listar")
+        self.assertEqual(pasos, [("crear_archivo", "notas"), ("listar", "")])
+
+    def test_salir_no_entra_en_un_plan(self):
+        pasos, excluidos = self.pasos("listar y salir")
+        self.assertEqual(pasos, [("listar", "")])
+        self.assertEqual(excluidos, ["salir"])
+        pasos, excluidos = self.pasos("salir")
+        self.assertEqual(pasos, [("salir", "")])
+        self.assertEqual(excluidos, [])
+
+
+def escribir_wav(ruta, tramos, rate=16000):
+    """WAV mono de 16 bits con tramos [(segundos, frecuencia o 0 para silencio), ...]"""
+    muestras = array.array("h")
+    for duracion, frecuencia in tramos:
+        muestras.extend(int(8000 * math.sin(2 * math.pi * frecuencia * i / rate)) if frecuencia else 0
+                        for i in range(int(duracion * rate)))
+    with wave.open(ruta, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(muestras.tobytes())
+
+
+class AudioRingBufferTest(unittest.TestCase):
+    def trama(self, n):
+        return bytes([n]) * 4
+
+    def test_lectura_por_secuencia(self):
+        buffer = voz.AudioRingBuffer(frame_bytes=4, capacity=8)
+        for n in range(3):
+            buffer.write(self.trama(n))
+        seq = 0
+        leidas = []
+        for _ in range(3):
+            trama, seq = buffer.read(seq)
+            leidas.append(trama)
+        self.assertEqual(leidas, [self.trama(0), self.trama(1), self.trama(2)])
+        self.assertEqual(seq, 3)
+        # Sin tramas nuevas: None al vencer el plazo y la secuencia no avanza
+        self.assertEqual(buffer.read(seq, timeout=0.05), (None, 3))
+        # Dos lectores independientes sobre el mismo buffer
+        self.assertEqual(buffer.read(1), (self.trama(1), 2))
+
+    def test_desbordamiento_salta_a_la_mas_antigua(self):
+        buffer = voz.AudioRingBuffer(frame_bytes=4, capacity=4)
+        for n in range(10):
+            buffer.write(self.trama(n))
+        # Un lector en la trama 0 se quedó atrás: las tramas 0-5 ya se sobrescribieron
+        self.assertEqual(buffer.read(0), (self.trama(6), 7))
+        self.assertEqual(buffer.latest(2), [self.trama(8), self.trama(9)])
+        self.assertEqual(buffer.latest(20), [self.trama(n) for n in range(6, 10)])
+
+    def test_tramas_incompletas_y_cierre(self):
+        buffer = voz.AudioRingBuffer(frame_bytes=4, capacity=4)
+        buffer.write(b"\x01\x02")
+        buffer.write(b"\x01\x02\x03\x04\x05")
+        self.assertEqual(buffer.latest(2), [b"\x01\x02\x00\x00", b"\x01\x02\x03\x04"])
+        lector = []
+        hilo = threading.Thread(target=lambda: lector.append(buffer.read(2, timeout=5)))
+        hilo.start()
+        buffer.close()
+        hilo.join(5)
+        self.assertEqual(lector, [(b"", 2)])
+
+
+class AudioCaptureTest(unittest.TestCase):
+    """Un WAV generado recorre la fuente, el buffer circular y la captura hasta el motor falso"""
+    def setUp(self):
+        carpeta = tempfile.mkdtemp()
+        self.ruta = os.path.join(carpeta, "frases.wav")
+        # Dos "frases" separadas por silencios más largos que pause_threshold
+        escribir_wav(self.ruta, [(0.5, 0), (0.8, 440), (1.5, 0), (0.6, 660), (1.5, 0)])
+
+    def crear_hilo(self, backend, **opciones):
+        hilo = voz.SpeechRecognitionThread(energy_threshold=500, frame_source=voz.WavFrameSource(self.ruta, **opciones),
+                                           backend=backend)
+        self.addCleanup(hilo.recognition_worker.shutdown)
+        self.comandos = []
+        self.estados = []
+        hilo.command_recognized.connect(self.comandos.append, Qt.DirectConnection)
+        hilo.status_message.connect(self.estados.append, Qt.DirectConnection)
+        return hilo
+
+    def llenar_buffer(self, hilo, capacidad):
+        """Escribe todo el WAV en un buffer circular de capacidad tramas, como el hilo de captura"""
+        fuente = hilo.frame_source
+        hilo.ring_buffer = voz.AudioRingBuffer(fuente.chunk_size * fuente.sample_width, capacidad)
+        for bloque in iter(fuente.read, b""):
+            hilo.ring_buffer.write(bloque)
+        hilo.ring_buffer.close()
+        hilo.running = True
+
+    def test_fuente_wav(self):
+        fuente = voz.WavFrameSource(self.ruta, chunk_size=1600)
+        self.assertEqual((fuente.sample_rate, fuente.sample_width, fuente.channels), (16000, 2, 1))
+        bloques = list(iter(fuente.read, b""))
+        fuente.close()
+        self.assertEqual(len(bloques), 49)  # 4.9 s en bloques de 0.1 s
+        self.assertEqual(len(bloques[0]), 3200)
+        self.assertEqual(voz.frame_rms(bloques[0], 2), 0.0)
+        self.assertAlmostEqual(voz.frame_rms(bloques[8], 2), 8000 / math.sqrt(2), delta=50)
+
+    def test_frases_del_wav_llegan_al_motor(self):
+        duraciones = []
+
+        def responder(audio):
+            duraciones.append(len(audio.frame_data) / audio.sample_width / audio.sample_rate)
+            return [("ora", 0.9), ("hora", 0.6)] if len(duraciones) == 1 else "listar"
+
+        backend = voz.FakeRecognitionBackend(responder)
+        hilo = self.crear_hilo(backend)
+        hilo.run()  # Termina solo al acabarse el WAV
+        self.assertEqual(self.comandos, ["hora", "listar"])
+        self.assertEqual(backend.calls, 2)
+        self.assertIn("Comando reconocido (alternativa 2)", self.estados)
+        # El detector de voz deja cada tono con un margen corto a cada lado
+        self.assertAlmostEqual(duraciones[0], 0.8 + 2 * 0.15, delta=0.15)
+        self.assertAlmostEqual(duraciones[1], 0.6 + 2 * 0.15, delta=0.15)
+        self.assertEqual(hilo.ring_buffer.write_seq, math.ceil(4.9 * 16000 / 1024))
+
+    def test_captura_con_audio_previo_y_silencio_final(self):
+        hilo = self.crear_hilo(voz.FakeRecognitionBackend())
+        self.llenar_buffer(hilo, 256)
+        # Cada frase conserva hasta non_speaking_duration (0.8 s) de audio antes y después
+        # de la voz, redondeado a tramas de 64 ms; la primera solo tiene 0.5 s de silencio previo
+        primera = hilo.capture_utterance()
+        self.assertAlmostEqual(len(primera.frame_data) / 2 / 16000, 0.5 + 0.8 + 0.8, delta=0.25)
+        segunda = hilo.capture_utterance()
+        self.assertAlmostEqual(len(segunda.frame_data) / 2 / 16000, 0.8 + 0.6 + 0.8, delta=0.25)
+        with self.assertRaises(voz.CaptureInterrupted):
+            hilo.capture_utterance()
+        self.assertFalse(hilo.running)
+
+    def test_lector_retrasado_salta_al_audio_reciente(self):
+        hilo = self.crear_hilo(voz.FakeRecognitionBackend())
+        # Un buffer de ~1 s: al leer tarde, las dos frases ya se sobrescribieron
+        self.llenar_buffer(hilo, 16)
+        with self.assertRaises(voz.CaptureInterrupted):
+            hilo.capture_utterance()
+        self.assertEqual(hilo.read_seq, hilo.ring_buffer.write_seq)
+
+    def test_motor_falso(self):
+        backend = voz.FakeRecognitionBackend(["hora", [("fecha", 0.7), ("feca", 0.2)], None])
+        self.assertEqual(backend.recognize(None), "hora")
+        self.assertEqual(backend.recognize_alternatives(None), [("fecha", 0.7), ("feca", 0.2)])
+        with self.assertRaises(sr.UnknownValueError):
+            backend.recognize(None)
+        with self.assertRaises(sr.UnknownValueError):
+            backend.recognize(None)  # Sin respuestas restantes
+        self.assertEqual(backend.calls, 4)
+
+
+class NoiseFloorTest(unittest.TestCase):
+    """Seguimiento del ruido de fondo con tramas de nivel conocido (64 ms cada una)"""
+    def setUp(self):
+        ruta = os.path.join(tempfile.mkdtemp(), "silencio.wav")
+        escribir_wav(ruta, [(0.1, 0)])
+        self.hilo = voz.SpeechRecognitionThread(energy_threshold=300, frame_source=voz.WavFrameSource(ruta))
+        self.addCleanup(self.hilo.recognition_worker.shutdown)
+
+    def alimentar(self, nivel, segundos):
+        """Pasa por el seguimiento tramas con RMS nivel durante segundos"""
+        trama = array.array("h", [nivel, -nivel] * 512).tobytes()
+        for _ in range(int(segundos / (1024 / 16000))):
+            self.hilo._track_noise(trama)
+
+    def test_umbral_sigue_al_ruido_por_encima_de_la_sensibilidad(self):
+        self.alimentar(100, 1)
+        self.assertAlmostEqual(self.hilo.noise_floor, 100)
+        self.assertEqual(self.hilo.recognizer.energy_threshold, 300)  # 100 * 1.5 no llega a la sensibilidad
+        # Un ruido por debajo del umbral lo sube a noise_floor * dynamic_energy_ratio
+        self.alimentar(250, 10)
+        self.assertAlmostEqual(self.hilo.noise_floor, 250, delta=5)
+        self.assertAlmostEqual(self.hilo.recognizer.energy_threshold, 375, delta=8)
+        # Al volver el silencio el umbral baja, pero nunca por debajo de la sensibilidad elegida
+        self.alimentar(0, 20)
+        self.assertEqual(self.hilo.recognizer.energy_threshold, 300)
+
+    def test_la_voz_no_cuenta_como_ruido(self):
+        self.alimentar(200, 2)
+        antes = self.hilo.noise_floor
+        self.alimentar(5000, 3)  # Frase de 3 s por encima del umbral
+        self.assertEqual(self.hilo.noise_floor, antes)
+        # Una "voz" continua de más de noise_max_speech es ruido ambiente nuevo
+        self.alimentar(5000, 15)
+        self.assertGreater(self.hilo.noise_floor, 4000)
+
+    def test_sensibilidad_del_usuario(self):
+        self.alimentar(1000, 2)
+        self.hilo.set_energy_threshold(4000)
+        self.assertEqual(self.hilo.recognizer.energy_threshold, 4000)
+        self.hilo.set_energy_threshold(200)
+        self.assertAlmostEqual(self.hilo.recognizer.energy_threshold, 1500, delta=75)
+        self.hilo.reset_recognizer()
+        self.assertEqual(self.hilo.recognizer.energy_threshold, 200)
+        self.assertIsNone(self.hilo.noise_floor)
+
+    def test_calibracion(self):
+        calibraciones = []
+        self.hilo.calibration_finished.connect(lambda ruido, umbral: calibraciones.append((ruido, umbral)),
+                                               Qt.DirectConnection)
+        self.alimentar(100, 2)
+        self.hilo.request_calibration(duration=0.5)
+        self.alimentar(2000, 1)
+        self.assertEqual(len(calibraciones), 1)
+        ruido, umbral = calibraciones[0]
+        self.assertAlmostEqual(ruido, 2000)
+        self.assertAlmostEqual(umbral, 3000)
+        self.assertIsNone(self.hilo.calibration_remaining)
+
+
+@unittest.skipIf(voz.np is None, "la huella acústica necesita numpy")
+class RecognitionCacheTest(unittest.TestCase):
+    SUBIDA = [300, 600, 1200, 2400]
+    BAJADA = [2400, 1200, 600, 300]
+
+    def setUp(self):
+        self.cache = voz.RecognitionCache()
+
+    def huella(self, tonos, **opciones):
+        return self.cache.fingerprint(palabra_sintetica(tonos, **opciones))
+
+    def test_similitud_de_la_huella(self):
+        original = self.huella(self.SUBIDA)
+        con_ruido = self.huella(self.SUBIDA, ruido=200, semilla=1)
+        otra = self.huella(self.BAJADA)
+        self.assertNotEqual(original[0], con_ruido[0])
+        self.assertGreaterEqual(self.cache.similarity(original[1], con_ruido[1]), self.cache.threshold)
+        self.assertLess(self.cache.similarity(original[1], otra[1]), 0.5)
+        self.assertAlmostEqual(self.cache.similarity(original[1], original[1]), 1.0, places=5)
+
+    def test_coincidencia_cercana_de_orden_segura(self):
+        self.cache.store(self.huella(self.SUBIDA), [("hora", 0.9)])
+        self.assertEqual(self.cache.lookup(self.huella(self.SUBIDA, ruido=200, semilla=1)), [("hora", 0.9)])
+        self.assertIsNone(self.cache.lookup(self.huella(self.BAJADA)))
+        self.assertEqual(self.cache.stats["aproximados"], 1)
+        self.assertEqual(self.cache.stats["fallos"], 1)
+
+    def test_ordenes_solo_exactas(self):
+        for texto in ["salir", "sal", "sierra", "cerar", "hora y salir", "ejecutar ls",
+                      "crear carpeta fotos", "nueva carpta fotos", "ir a descargas", "buscar archivo informe"]:
+            with self.subTest(texto=texto):
+                self.assertTrue(self.cache.exact_only([(texto, 0.9)]))
+        for texto in ["hora", "listar", "memoria", "bla bla"]:
+            with self.subTest(texto=texto):
+                self.assertFalse(self.cache.exact_only([(texto, 0.9)]))
+        # Basta con que una alternativa sea peligrosa
+        self.assertTrue(self.cache.exact_only([("hora", 0.9), ("sal", 0.7)]))
+
+    def test_orden_exacta_no_se_sirve_por_parecido(self):
+        original = self.huella(self.SUBIDA)
+        self.cache.store(original, [("cerar", 0.9)])
+        self.assertIsNone(self.cache.lookup(self.huella(self.SUBIDA, ruido=200, semilla=1)))
+        self.assertEqual(self.cache.lookup(original), [("cerar", 0.9)])
+
+    def test_expulsa_la_menos_usada(self):
+        self.cache.capacity = 2
+        huellas = [self.huella(self.SUBIDA), self.huella(self.BAJADA), self.huella([500, 2000, 500, 2000])]
+        self.cache.store(huellas[0], [("hora", 1.0)])
+        self.cache.store(huellas[1], [("fecha", 1.0)])
+        self.cache.lookup(huellas[0])  # La primera pasa a ser la más reciente
+        self.cache.store(huellas[2], [("listar", 1.0)])
+        self.assertEqual(list(self.cache.entries), [huellas[0][0], huellas[2][0]])
+        self.assertEqual(self.cache.stats["expulsados"], 1)
+
+    def test_guardar_y_cargar(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            ruta = os.path.join(carpeta, "cache.json")
+            cache = voz.RecognitionCache(path=ruta)
+            huella = cache.fingerprint(palabra_sintetica(self.SUBIDA))
+            cache.store(huella, [("hora", 0.9), ("ora", 0.5)])
+            cache.save()
+            self.assertFalse(os.path.exists(ruta + ".tmp"))
+            cargada = voz.RecognitionCache(path=ruta)
+            self.assertEqual(cargada.lookup(huella), [("hora", 0.9), ("ora", 0.5)])
+            cercana = cargada.fingerprint(palabra_sintetica(self.SUBIDA, ruido=200, semilla=1))
+            self.assertEqual(cargada.lookup(cercana), [("hora", 0.9), ("ora", 0.5)])
+            # Otra versión de la huella invalida el archivo
+            self.assertEqual(len(voz.RecognitionCache(path=ruta, bands=8).entries), 0)
+
+
+class SystemQueryTest(unittest.TestCase):
+    MEMINFO = ("MemTotal:        8000000 kB\n"
+               "MemFree:         1000000 kB\n"
+               "MemAvailable:    3000000 kB\n"
+               "Buffers:          200000 kB\n"
+               "SwapTotal:       2000000 kB\n"
+               "SwapFree:        1500000 kB\n"
+               "HugePages_Total:       0\n")
+    MOUNTS = ("sysfs /sys sysfs rw 0 0\n"
+              "/dev/sda1 / ext4 rw,relatime 0 0\n"
+              "/dev/sda2 /mnt/mis\\040datos ext4 rw 0 0\n"
+              "/dev/sda1 /var/lib/docker ext4 rw 0 0\n"
+              "overlay /merged overlay rw 0 0\n"
+              "tmpfs /tmp tmpfs rw 0 0\n")
+    STAT = "4242 (Web Content (2)) S 1 4242 4242 0 -1 4194560 100 0 0 0 150 50 0 0 20 0 1 0 100 1000 300 18446744073709551615"
+    NET_TCP = ("  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+               "   0: 0100007F:0035 00000000:0000 0A 00000000:00000000 00:00000000 00000000   101        0 1\n"
+               "   1: 0F02000A:C350 2E2E2E2E:01BB 01 00000000:00000000 00:00000000 00000000  1000        0 2\n")
+    NET_TCP6 = ("  sl  local_address                         remote_address                        st\n"
+                "   0: 00000000000000000000000001000000:0016 00000000000000000000000000000000:0000 0A\n")
+
+    def test_format_table(self):
+        tabla = voz.format_table([("Nombre", "<"), ("Tamaño", ">")], [["a", 5], ["largo", "1.5K"]])
+        self.assertEqual(tabla.splitlines(), ["Nombre  Tamaño", "a            5", "largo     1.5K"])
+        self.assertEqual(voz.format_table([("A", "<"), ("B", "<")], []), "A  B")
+
+    def test_format_metrics(self):
+        tabla = voz.format_metrics([("Caché", {"aciertos": 3, "tasa_aciertos": 0.75}),
+                                    ("VAD", {"ultima_decision": None})])
+        self.assertEqual(tabla.splitlines(), ["Componente  Métrica          Valor",
+                                              "Caché       aciertos             3",
+                                              "            tasa_aciertos     0.75",
+                                              "VAD         ultima_decision      -"])
+
+    def test_format_bytes(self):
+        self.assertEqual(voz.format_bytes(512), "512B")
+        self.assertEqual(voz.format_bytes(1536), "1.5K")
+        self.assertEqual(voz.format_bytes(3 * 1024 ** 3), "3.0G")
+
+    def test_meminfo(self):
+        datos = voz.parse_meminfo(self.MEMINFO)
+        self.assertEqual(datos, {"total": 8000000 * 1024, "usada": 5000000 * 1024, "disponible": 3000000 * 1024,
+                                 "swap_total": 2000000 * 1024, "swap_usada": 500000 * 1024})
+        # Núcleos antiguos sin MemAvailable: libre + buffers + caché
+        antiguo = voz.parse_meminfo(self.MEMINFO.replace("MemAvailable", "Otro"))
+        self.assertEqual(antiguo["disponible"], 1200000 * 1024)
+
+    def test_mounts(self):
+        self.assertEqual(voz.parse_mounts(self.MOUNTS), ["/", "/mnt/mis datos", "/merged"])
+
+    def test_proc_stat(self):
+        proceso = voz.parse_proc_stat(self.STAT, tick=100, pagina=4096)
+        self.assertEqual(proceso, {"pid": 4242, "nombre": "Web Content (2)", "rss": 300 * 4096, "cpu": 2.0})
+
+    def test_proc_net(self):
+        self.assertEqual(voz.parse_proc_net(self.NET_TCP, "tcp"), [
+            {"proto": "tcp", "local": "127.0.0.1:53", "remoto": "0.0.0.0:0", "estado": "LISTEN"},
+            {"proto": "tcp", "local": "10.0.2.15:50000", "remoto": "46.46.46.46:443", "estado": "ESTABLISHED"},
+        ])
+        self.assertEqual(voz.parse_proc_net(self.NET_TCP6, "tcp6"),
+                         [{"proto": "tcp6", "local": "[::1]:22", "remoto": "[::]:0", "estado": "LISTEN"}])
+        self.assertEqual(voz.parse_proc_net(self.NET_TCP, "udp")[0]["estado"], "")
+
+    def test_consulta_no_disponible_usa_el_respaldo(self):
+        ejecutor = voz.CommandExecutor(persistent_shell=False)
+        self.addCleanup(ejecutor.shutdown)
+        terminados = queue.Queue()
+        ejecutor.command_finished.connect(lambda i, m, t: terminados.put((m, t)), Qt.DirectConnection)
+
+        def no_disponible():
+            raise voz.NativeQueryUnavailable()
+
+        def fallo():
+            raise NotImplementedError("sin terminar")
+
+        ejecutor.submit_task("memoria", no_disponible, "echo respaldo", tempfile.gettempdir())
+        self.assertEqual(terminados.get(timeout=5), ("respaldo\n", "respuesta"))
+        # Otros errores no se confunden con la falta de consulta nativa
+        ejecutor.submit_task("memoria", fallo, "echo respaldo", tempfile.gettempdir())
+        mensaje, tipo = terminados.get(timeout=5)
+        self.assertEqual(tipo, "error")
+        self.assertIn("sin terminar", mensaje)
+
+
+class ConfigStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.ruta = os.path.join(tempfile.mkdtemp(), "config.json")
+
+    def crear(self, **opciones):
+        config = voz.ConfigStore(self.ruta, **opciones)
+        self.addCleanup(config.flush)
+        self.escrituras = []
+        self.cambios = []
+        config.written.connect(lambda: self.escrituras.append(time.monotonic()), Qt.DirectConnection)
+        config.changed.connect(self.cambios.append)
+        return config
+
+    def leer(self):
+        with open(self.ruta, encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_valores_por_defecto_y_migracion(self):
+        self.assertEqual(self.crear().get("energy_threshold"), 3000)
+        with open(self.ruta, "w", encoding="utf-8") as f:
+            json.dump({"theme": "dark", "tts_enabled": False}, f)  # Esquema 1: sin versión
+        config = self.crear()
+        self.assertEqual((config.get("theme"), config.get("tts_enabled")), ("dark", False))
+        self.assertEqual(config.get("energy_threshold"), 3000)
+        self.assertEqual(config.get("version"), voz.ConfigStore.SCHEMA_VERSION)
+
+    def test_cambios_seguidos_en_una_escritura_atomica(self):
+        config = self.crear(debounce=0.1, max_delay=2)
+        for valor in (1000, 1500, 2000):
+            config.set("energy_threshold", valor)
+        config.update({"theme": "dark", "tts_enabled": False})
+        config.set("theme", "dark")  # Sin cambio: no programa nada
+        self.assertTrue(procesar_eventos_hasta(lambda: self.escrituras))
+        time.sleep(0.3)
+        self.assertEqual(len(self.escrituras), 1)
+        datos = self.leer()
+        self.assertEqual((datos["energy_threshold"], datos["theme"], datos["tts_enabled"]), (2000, "dark", False))
+        self.assertEqual(datos["version"], voz.ConfigStore.SCHEMA_VERSION)
+        self.assertFalse(os.path.exists(self.ruta + ".tmp"))
+
+    def test_flush_escribe_lo_pendiente(self):
+        config = voz.ConfigStore(self.ruta, debounce=30)
+        config.set("theme", "dark")
+        config.flush()
+        self.assertEqual(self.leer()["theme"], "dark")
+
+    def test_recarga_solo_cambios_externos(self):
+        config = self.crear(debounce=0.05)
+        config.set("theme", "dark")
+        self.assertTrue(procesar_eventos_hasta(lambda: self.escrituras))
+        # El aviso de nuestra propia escritura no se trata como un cambio
+        config._on_file_changed(self.ruta)
+        self.assertEqual(self.cambios, [])
+        # Otro programa reescribe el archivo: solo se notifican las claves distintas
+        datos = self.leer()
+        datos.update({"theme": "light", "energy_threshold": 5000})
+        with open(self.ruta, "w", encoding="utf-8") as f:
+            json.dump(datos, f)
+        self.assertTrue(procesar_eventos_hasta(lambda: self.cambios))
+        self.assertEqual(self.cambios[0], {"theme": "light", "energy_threshold": 5000})
+        self.assertEqual(config.get("energy_threshold"), 5000)
+        # Un archivo a medio escribir se ignora
+        with open(self.ruta, "w", encoding="utf-8") as f:
+            f.write("{")
+        config._on_file_changed(self.ruta)
+        self.assertEqual(config.get("theme"), "light")
+
+
+class CommandHistoryTest(unittest.TestCase):
+    COMANDOS = ["git status", "git status", "git status", "git commit -m x", "ls -la", "grep 100% informe",
+                "echo a_b", "echo axb", "listar", "git stash"]
+
+    def setUp(self):
+        self.ruta = os.path.join(tempfile.mkdtemp(), "historial.db")
+        historial = voz.CommandHistory(self.ruta)
+        for comando in self.COMANDOS:
+            historial.add(comando)
+        historial.add("   ")  # Vacío: no se guarda
+        historial.close()  # Espera al hilo escritor
+        self.historial = voz.CommandHistory(self.ruta, memoria=5)
+        self.addCleanup(self.historial.close)
+
+    def test_recientes_y_frecuencia(self):
+        self.assertEqual(list(self.historial.recientes), self.COMANDOS[-5:])
+        self.assertEqual(self.historial.frequency("git status"), 3)
+        self.assertEqual(self.historial.frequency("nunca"), 0)
+        self.historial.add("hora")
+        self.assertEqual(self.historial.recientes[-1], "hora")
+        self.assertEqual(self.historial.search("")[0], "git status")
+
+    def test_prefijo_antes_que_subcadena_y_subsecuencia(self):
+        self.assertEqual(self.historial.search("git st"), ["git status", "git stash"])
+        self.assertEqual(self.historial.search("status"), ["git status"])
+        # "gcm" solo aparece como subsecuencia de "git commit -m x"
+        self.assertEqual(self.historial.search("gcm"), ["git commit -m x"])
+        # Primero el más usado; a igual frecuencia, el más reciente
+        self.assertEqual(self.historial.search("git", limite=2), ["git status", "git stash"])
+
+    def test_comodines_de_like_se_escapan(self):
+        self.assertEqual(self.historial.search("a_b"), ["echo a_b"])
+        self.assertEqual(self.historial.search("100%"), ["grep 100% informe"])
+        self.assertEqual(self.historial.search("%"), ["grep 100% informe"])
+
+
+class DirectoryListerTest(unittest.TestCase):
+    def setUp(self):
+        self.carpeta = tempfile.mkdtemp()
+        for nombre in ["beta", "Alfa"]:
+            os.mkdir(os.path.join(self.carpeta, nombre))
+        for nombre in ["zeta.txt", "Caso.txt", "a.txt"]:
+            with open(os.path.join(self.carpeta, nombre), "w") as f:
+                f.write("12345")
+        self.lister = voz.DirectoryLister(capacity=2, page_size=2)
+
+    def nombres(self):
+        return [entrada.name for entrada in self.lister.entries(self.carpeta)]
+
+    def test_carpetas_primero_y_por_nombre(self):
+        self.assertEqual(self.nombres(), ["Alfa", "beta", "a.txt", "Caso.txt", "zeta.txt"])
+        self.assertEqual(self.lister.count(self.carpeta), 5)
+        self.assertIsNone(self.lister.count(tempfile.gettempdir()))
+
+    def test_paginas(self):
+        pagina, total = self.lister.page(self.carpeta)
+        self.assertEqual(total, 5)
+        self.assertEqual([(e.nombre, e.tipo) for e in pagina], [("Alfa", "carpeta"), ("beta", "carpeta")])
+        pagina, _ = self.lister.page(self.carpeta, inicio=4)
+        self.assertEqual([(e.nombre, e.tipo, e.tamano) for e in pagina], [("zeta.txt", "archivo", 5)])
+        texto = self.lister.page_text(self.carpeta, inicio=2)
+        self.assertIn("5 entradas (3-4)", texto)
+        self.assertIn("Quedan 1.", texto)
+        vacia = tempfile.mkdtemp()
+        self.assertEqual(self.lister.page_text(vacia), f"{vacia} está vacío")
+
+    def test_cache_se_valida_con_la_fecha_del_directorio(self):
+        self.nombres()
+        self.nombres()
+        self.assertEqual((self.lister.stats["aciertos"], self.lister.stats["fallos"]), (1, 1))
+        # Reescribir un archivo no cambia el directorio, pero la página vuelve a leer su tamaño
+        with open(os.path.join(self.carpeta, "zeta.txt"), "w") as f:
+            f.write("123456789")
+        self.assertEqual(self.lister.page(self.carpeta, inicio=4)[0][0].tamano, 9)
+        # Un archivo nuevo cambia la fecha del directorio
+        with open(os.path.join(self.carpeta, "nuevo.txt"), "w"):
+            pass
+        os.utime(self.carpeta, ns=(0, time.time_ns() + 10 ** 9))
+        self.assertIn("nuevo.txt", self.nombres())
+        self.assertEqual(self.lister.stats["fallos"], 2)
+
+    def test_watcher_invalida_y_se_libera_al_expulsar(self):
+        self.nombres()
+        self.assertEqual(self.lister.watcher.directories(), [self.carpeta])
+        os.rmdir(os.path.join(self.carpeta, "beta"))
+        self.assertTrue(procesar_eventos_hasta(lambda: self.lister.stats["invalidaciones"] == 1))
+        self.assertIsNone(self.lister.count(self.carpeta))
+        # Con capacity=2, el tercer directorio expulsa al primero y deja de vigilarse
+        otras = [tempfile.mkdtemp() for _ in range(3)]
+        for otra in otras:
+            self.lister.entries(otra)
+        self.assertEqual(sorted(self.lister.watcher.directories()), sorted(otras[1:]))
+        self.assertEqual(self.lister.metrics()["directorios"], 2)
+
+
+class FileIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.raiz = tempfile.mkdtemp()
+        self.crear("docs/Informe_Final.pdf", "docs/informe borrador.docx", "fotos/2024/playa.jpg",
+                   "fotos/2024/montaña.png", "notas.txt", ".oculto/secreto.txt", "node_modules/paquete.js")
+        self.indice = voz.FileIndex(workers=2)
+        self.addCleanup(self.indice.close)
+        self.indice.build(self.raiz)
+        self.assertTrue(procesar_eventos_hasta(lambda: not self.indice.indexando))
+
+    def crear(self, *rutas):
+        for ruta in rutas:
+            completa = os.path.join(self.raiz, ruta)
+            os.makedirs(os.path.dirname(completa), exist_ok=True)
+            open(completa, "w").close()
+
+    def buscar(self, texto, **opciones):
+        return [(os.path.relpath(ruta, self.raiz), coincidencia)
+                for ruta, _, coincidencia in self.indice.search(texto, **opciones)]
+
+    def actualizar(self, carpeta, condicion):
+        """Avisa del cambio como lo haría el watcher y espera a que el índice lo refleje"""
+        self.indice._on_directory_changed(os.path.join(self.raiz, carpeta) if carpeta else self.raiz)
+        self.assertTrue(procesar_eventos_hasta(condicion))
+
+    def test_tipos_de_coincidencia(self):
+        self.assertEqual(self.buscar("notas"), [("notas.txt", "prefijo")])
+        self.assertEqual(self.buscar("final informe"), [(os.path.join("docs", "Informe_Final.pdf"), "palabras")])
+        self.assertEqual(self.buscar("laya"), [(os.path.join("fotos", "2024", "playa.jpg"), "subcadena")])
+        self.assertEqual(self.buscar("montana"), [(os.path.join("fotos", "2024", "montaña.png"), "prefijo")])
+        self.assertEqual(self.buscar("infrme"), [(os.path.join("docs", "Informe_Final.pdf"), "aproximada"),
+                                                 (os.path.join("docs", "informe borrador.docx"), "aproximada")])
+        self.assertEqual(self.buscar("2024"), [(os.path.join("fotos", "2024"), "prefijo")])
+        self.assertEqual(self.buscar("informe", limite=1), [(os.path.join("docs", "informe borrador.docx"), "prefijo")])
+
+    def test_ocultas_y_excluidas_no_se_indexan(self):
+        self.assertEqual(self.buscar("secreto"), [])
+        self.assertEqual(self.buscar("paquete"), [])
+        estadisticas = self.indice.stats()
+        self.assertEqual((estadisticas["entradas"], estadisticas["carpetas"]), (8, 4))
+
+    def test_capa_de_cambios(self):
+        base = self.indice.snapshot
+        self.crear("docs/presupuesto.xlsx")
+        self.actualizar("docs", lambda: self.buscar("presupuesto"))
+        self.assertIs(self.indice.snapshot, base)  # La instantánea grande no se rehace
+        self.assertIsNotNone(self.indice.capa)
+        self.assertEqual(self.buscar("presupuesto"), [(os.path.join("docs", "presupuesto.xlsx"), "prefijo")])
+        # Las entradas antiguas de la carpeta cambiada salen de la base y no se duplican
+        self.assertEqual(len(self.buscar("informe")), 2)
+        self.assertEqual(self.indice.stats()["entradas"], 9)
+        # Una carpeta nueva se recorre entera y una borrada desaparece con sus hijas
+        self.crear("proyectos/web/index.html")
+        self.actualizar("", lambda: self.buscar("index"))
+        shutil.rmtree(os.path.join(self.raiz, "fotos"))
+        self.actualizar("", lambda: not self.buscar("playa"))
+        self.assertEqual(self.buscar("2024"), [])
+        self.assertIs(self.indice.snapshot, base)
+        self.assertEqual(self.indice.stats()["entradas"], 9 + 3 - 4)
+
+    def test_capa_grande_se_funde_con_la_base(self):
+        self.indice.max_overlay = 0
+        base = self.indice.snapshot
+        self.crear(*[f"docs/extra_{i}.txt" for i in range(20)])
+        self.actualizar("docs", lambda: self.indice.snapshot is not base)
+        self.assertIsNone(self.indice.capa)
+        self.assertEqual(len(self.buscar("extra", limite=50)), 20)
+        self.assertEqual(self.indice.stats()["entradas"], 28)
+
+
+def distancia_simple(a, b):
+    """Levenshtein por programación dinámica, como referencia"""
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        actual = [i]
+        for j, cb in enumerate(b, 1):
+            actual.append(min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + (ca != cb)))
+        anterior = actual
+    return anterior[-1]
+
+
+class DirectoryResolverTest(unittest.TestCase):
+    def setUp(self):
+        # La carpeta personal también es una raíz: se sustituye por una temporal
+        self.home = tempfile.mkdtemp()
+        entorno = unittest.mock.patch.dict(os.environ, {"HOME": self.home, "USERPROFILE": self.home})
+        entorno.start()
+        self.addCleanup(entorno.stop)
+        for ruta in ["Downloads", "Música", "trabajo/hermana", "trabajo/actual/Vídeos", "trabajo/actual/Mis Documentos",
+                     "trabajo/actual/proyecto_final", "trabajo/actual/Presupuestos 2024"]:
+            os.makedirs(os.path.join(self.home, ruta))
+        open(os.path.join(self.home, "trabajo", "actual", "videos.txt"), "w").close()
+        self.favorita = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.favorita, "Recetas"))
+        self.cwd = os.path.join(self.home, "trabajo", "actual")
+        self.resolver = voz.DirectoryResolver(voz.DirectoryLister(), [self.favorita], max_queries=4)
+
+    def mejor(self, texto):
+        resultado = self.resolver.resolve(texto, self.cwd)
+        return (resultado[0][0], os.path.relpath(resultado[0][1], self.home)) if resultado else None
+
+    def test_nombres_plegados_foneticos_y_alias(self):
+        self.assertEqual(self.mejor("videos"), (1.0, os.path.join("trabajo", "actual", "Vídeos")))
+        self.assertEqual(self.mejor("bideos"), (0.95, os.path.join("trabajo", "actual", "Vídeos")))
+        self.assertEqual(self.mejor("proyecto final"), (1.0, os.path.join("trabajo", "actual", "proyecto_final")))
+        self.assertEqual(self.mejor("presupuestos"), (0.9, os.path.join("trabajo", "actual", "Presupuestos 2024")))
+        self.assertEqual(self.mejor("documentos")[1], os.path.join("trabajo", "actual", "Mis Documentos"))
+        self.assertEqual(self.mejor("proyecto finl")[1], os.path.join("trabajo", "actual", "proyecto_final"))
+        self.assertEqual(self.resolver.resolve("xyz", self.cwd), [])
+        self.assertEqual(self.resolver.resolve("  ", self.cwd), [])
+
+    def test_raices_con_penalizacion(self):
+        self.assertEqual(self.mejor("hermana"), (0.97, os.path.join("trabajo", "hermana")))
+        self.assertEqual(self.mejor("descargas"), (0.95, "Downloads"))
+        self.assertEqual(self.mejor("musica"), (0.95, "Música"))
+        confianza, ruta = self.resolver.resolve("recetas", self.cwd)[0]
+        self.assertEqual((confianza, ruta), (0.95, os.path.join(self.favorita, "Recetas")))
+        # Los archivos no cuentan como carpetas
+        self.assertNotIn(os.path.join(self.cwd, "videos.txt"), [r for _, r in self.resolver.resolve("videos", self.cwd)])
+
+    def test_resultados_en_cache_hasta_que_cambia_una_raiz(self):
+        primero = self.resolver.resolve("fotos", self.cwd)
+        self.assertIs(self.resolver.resolve("fotos", self.cwd), primero)
+        os.mkdir(os.path.join(self.cwd, "Fotos"))
+        os.utime(self.cwd, ns=(0, time.time_ns() + 10 ** 9))
+        self.assertEqual(self.resolver.resolve("fotos", self.cwd)[0], (1.0, os.path.join(self.cwd, "Fotos")))
+        # Las consultas recordadas no pasan de max_queries
+        for texto in ["uno", "dos", "tres", "cuatro", "cinco"]:
+            self.resolver.resolve(texto, self.cwd)
+        self.assertEqual(len(self.resolver.query_keys), 4)
+        self.assertEqual(len(self.resolver.results), 4)
+        self.assertNotIn("fotos", self.resolver.query_keys)
+
+    def test_claves(self):
+        self.assertEqual(voz.phonetic_key("Vídeos"), voz.phonetic_key("bideos"))
+        self.assertEqual(voz.phonetic_key("Chaqueta"), voz.phonetic_key("chaketa"))
+        self.assertEqual(voz.fold_name("Mis_Documentos-v2.TXT"), "mis documentos v2 txt")
+
+    def test_distancia_de_edicion(self):
+        casos = [("", ""), ("", "abc"), ("kitten", "sitting"), ("carpeta", "carpta"), ("música", "musica"),
+                 ("a" * 70, "a" * 69 + "b"), ("documentos" * 8, "documents" * 9), ("xyz", "documentos")]
+        for a, b in casos:
+            with self.subTest(a=a, b=b):
+                self.assertEqual(voz.edit_distance(a, b), distancia_simple(a, b))
+                self.assertEqual(voz.edit_distance(b, a), distancia_simple(a, b))
+
+
+@unittest.skipIf(platform.system() == "Windows", "las pruebas del shell usan bash")
+class ShellSessionTest(unittest.TestCase):
+    def setUp(self):
+        self.shell = voz.ShellSession()
+        self.carpeta = tempfile.mkdtemp()
+        self.addCleanup(self.shell.close)
+
+    def ejecutar(self, comando, cwd=None):
+        """Devuelve (código, salida) de un comando en el shell persistente"""
+        cola = queue.Queue()
+        with self.shell.lock:
+            self.shell.start(comando, cwd or self.carpeta, cola)
+            salida = []
+            abiertas = 2
+            while abiertas:
+                elemento = cola.get(timeout=5)
+                if elemento is None:
+                    abiertas -= 1
+                else:
+                    salida.append(elemento)
+            return self.shell.finish(), salida
+
+    def test_salida_sin_salto_final(self):
+        self.assertEqual(self.ejecutar("printf abc"), (0, [("normal", "abc")]))
+        self.assertEqual(self.ejecutar("printf 'uno\\n\\ndos'"),
+                         (0, [("normal", "uno"), ("normal", ""), ("normal", "dos")]))
+        self.assertEqual(self.ejecutar("printf err >&2"), (0, [("error", "err")]))
+        self.assertEqual(self.ejecutar("true"), (0, []))
+
+    def test_codigo_de_salida(self):
+        self.assertEqual(self.ejecutar("exit_code() { return 3; }; exit_code")[0], 3)
+        self.assertEqual(self.ejecutar("false")[0], 1)
+        self.assertEqual(self.ejecutar("echo ok")[0], 0)
+
+    def test_estado_entre_comandos(self):
+        self.ejecutar("export VOZ_PRUEBA=42")
+        self.assertEqual(self.ejecutar("echo $VOZ_PRUEBA"), (0, [("normal", "42")]))
+
+    def test_sigue_el_directorio_tras_cd(self):
+        os.mkdir(os.path.join(self.carpeta, "sub dir"))
+        self.ejecutar("cd 'sub dir'")
+        self.assertEqual(self.shell.pwd, os.path.join(self.carpeta, "sub dir"))
+        self.assertEqual(self.ejecutar("pwd", cwd=self.shell.pwd)[1], [("normal", self.shell.pwd)])
+        # Pedir otra ruta de trabajo vuelve a situar el shell
+        otra = tempfile.mkdtemp()
+        self.ejecutar("true", cwd=otra)
+        self.assertEqual(self.shell.pwd, otra)
+
+    def test_se_reinicia_tras_morir(self):
+        self.ejecutar("true")
+        os.killpg(self.shell.proceso.pid, signal.SIGKILL)
+        self.shell.proceso.wait()
+        self.assertFalse(self.shell.alive())
+        self.assertEqual(self.ejecutar("echo otra vez"), (0, [("normal", "otra vez")]))
+        self.assertEqual(self.shell.spawns, 2)
+        # exit también termina el shell; el código llega aunque falte la centinela
+        self.assertEqual(self.ejecutar("exit 4")[0], 4)
+        self.assertEqual(self.ejecutar("echo sigue"), (0, [("normal", "sigue")]))
+
+
+class ExecutorTestCase(unittest.TestCase):
+    """Recoge las señales del ejecutor en el hilo que las emite, sin bucle de eventos"""
+    def crear_ejecutor(self, **opciones):
+        ejecutor = voz.CommandExecutor(**opciones)
+        self.addCleanup(ejecutor.shutdown)
+        self.terminados = {}
+        self.salida = []
+        self.reinicios = []
+        self.iniciados = []
+        self.liberar_bloques = True  # False simula una interfaz que no consume la salida
+        self.condicion = threading.Condition()
+
+        def terminado(id_comando, mensaje, tipo):
+            with self.condicion:
+                self.terminados[id_comando] = (mensaje, tipo, time.monotonic())
+                self.condicion.notify_all()
+
+        def salida(id_comando, texto, tipo):
+            with self.condicion:
+                self.salida.append((id_comando, texto, tipo))
+                self.condicion.notify_all()
+            if self.liberar_bloques:
+                ejecutor.chunk_consumed()
+
+        def iniciado(id_comando, comando):
+            with self.condicion:
+                self.iniciados.append(id_comando)
+                self.condicion.notify_all()
+
+        ejecutor.command_finished.connect(terminado, Qt.DirectConnection)
+        ejecutor.command_output.connect(salida, Qt.DirectConnection)
+        ejecutor.shell_restarted.connect(self.reinicios.append, Qt.DirectConnection)
+        ejecutor.command_started.connect(iniciado, Qt.DirectConnection)
+        return ejecutor
+
+    def esperar_condicion(self, condicion, timeout=10):
+        with self.condicion:
+            self.assertTrue(self.condicion.wait_for(condicion, timeout))
+
+    def esperar(self, *ids, timeout=10):
+        with self.condicion:
+            self.assertTrue(self.condicion.wait_for(lambda: all(i in self.terminados for i in ids), timeout))
+        return [self.terminados[i] for i in ids]
+
+    def lineas(self, id_comando):
+        return [linea for i, texto, tipo in self.salida if i == id_comando and tipo == "normal"
+                for linea in texto.split("\n")]
+
+
+def python_command(codigo):
+    """Comando de shell que ejecuta codigo con el intérprete de las pruebas"""
+    return f"{shlex.quote(sys.executable)} -c {shlex.quote(codigo)}"
+
+
+IMPRIMIR_LINEAS = "import sys\nfor i in range({}): print(i)\nsys.stdout.flush()"
+ESPERAR = "import time; time.sleep({})"
+
+
+class CommandExecutorTest(ExecutorTestCase):
+    def setUp(self):
+        self.cwd = tempfile.gettempdir()
+
+    def test_salida_por_bloques(self):
+        ejecutor = self.crear_ejecutor(persistent_shell=False, chunk_lines=50)
+        id_comando = ejecutor.submit(python_command(IMPRIMIR_LINEAS.format(120)), self.cwd)
+        mensaje, tipo, _ = self.esperar(id_comando)[0]
+        self.assertEqual(tipo, "respuesta")
+        self.assertTrue(mensaje.endswith("(120 líneas)"))
+        self.assertEqual(self.lineas(id_comando), [str(i) for i in range(120)])
+        bloques = [texto for i, texto, _ in self.salida if i == id_comando]
+        self.assertTrue(all(len(bloque.split("\n")) <= 50 for bloque in bloques))
+        self.assertGreaterEqual(len(bloques), 3)
+
+    def test_salida_de_error_y_codigo(self):
+        ejecutor = self.crear_ejecutor(persistent_shell=False)
+        id_comando = ejecutor.submit(python_command("import sys; sys.stderr.write('mal\\n'); sys.exit(2)"), self.cwd)
+        self.assertEqual(self.esperar(id_comando)[0][:2], ("El comando terminó con código 2", "error"))
+        self.assertIn((id_comando, "mal", "error"), self.salida)
+
+    def test_contrapresion(self):
+        ejecutor = self.crear_ejecutor(persistent_shell=False, chunk_lines=10, max_chunks_in_flight=2)
+        self.liberar_bloques = False
+        id_comando = ejecutor.submit(python_command(IMPRIMIR_LINEAS.format(100)), self.cwd)
+        # Sin consumir, solo se emiten tantos bloques como permite el semáforo
+        self.esperar_condicion(lambda: len(self.salida) == 2)
+        time.sleep(0.3)
+        self.assertEqual(len(self.salida), 2)
+        self.assertNotIn(id_comando, self.terminados)
+        # Al consumirlos, el comando avanza hasta el final
+        consumidos = 0
+        limite = time.monotonic() + 10
+        while id_comando not in self.terminados and time.monotonic() < limite:
+            with self.condicion:
+                self.condicion.wait_for(lambda: len(self.salida) > consumidos or id_comando in self.terminados, 1)
+                nuevos = len(self.salida) - consumidos
+            for _ in range(nuevos):
+                ejecutor.chunk_consumed()
+            consumidos += nuevos
+        self.assertEqual(self.esperar(id_comando)[0][1], "respuesta")
+        self.assertEqual(self.lineas(id_comando), [str(i) for i in range(100)])
+
+    def test_recorte_de_lineas(self):
+        ejecutor = self.crear_ejecutor(persistent_shell=False, max_output_lines=20)
+        id_comando = ejecutor.submit(python_command(IMPRIMIR_LINEAS.format(100)), self.cwd)
+        self.esperar(id_comando)
+        self.assertEqual(self.lineas(id_comando), [str(i) for i in range(20)])
+        self.assertIn((id_comando, "... 80 líneas omitidas", "sistema"), self.salida)
+        # Sin streaming, el texto devuelto se recorta igual
+        mensaje, tipo = ejecutor.run_command(python_command(IMPRIMIR_LINEAS.format(100)), self.cwd)
+        self.assertEqual(tipo, "respuesta")
+        self.assertEqual(mensaje.splitlines(), [str(i) for i in range(20)] + ["... 80 líneas omitidas"])
+
+    def test_timeout(self):
+        for streaming in (True, False):
+            with self.subTest(streaming=streaming):
+                ejecutor = self.crear_ejecutor(persistent_shell=False, timeout=0.5)
+                inicio = time.monotonic()
+                id_comando = ejecutor.submit(python_command(ESPERAR.format(10)), self.cwd, streaming=streaming)
+                mensaje, tipo, fin = self.esperar(id_comando)[0]
+                self.assertEqual(tipo, "error")
+                self.assertIn("timeout", mensaje)
+                self.assertLess(fin - inicio, 5)
+
+    def test_cancelar_en_ejecucion(self):
+        ejecutor = self.crear_ejecutor(persistent_shell=False)
+        inicio = time.monotonic()
+        id_comando = ejecutor.submit(python_command(ESPERAR.format(10)), self.cwd)
+        self.esperar_condicion(lambda: id_comando in self.iniciados)
+        time.sleep(0.2)  # Dar tiempo a que arranque el proceso
+        self.assertTrue(ejecutor.cancel(id_comando))
+        mensaje, tipo, fin = self.esperar(id_comando)[0]
+        self.assertEqual((mensaje, tipo), ("Comando cancelado.", "sistema"))
+        self.assertLess(fin - inicio, 5)
+        self.assertFalse(ejecutor.cancel(id_comando))
+        self.assertEqual(ejecutor.pending_count(), 0)
+
+    def test_cancelar_en_cola_y_pool_lleno(self):
+        ejecutor = self.crear_ejecutor(persistent_shell=False, max_workers=1, max_pending=2)
+        primero = ejecutor.submit(python_command(ESPERAR.format(10)), self.cwd)
+        segundo = ejecutor.submit("echo nunca", self.cwd)
+        self.assertIsNone(ejecutor.submit("echo sobra", self.cwd))
+        self.assertTrue(ejecutor.cancel(segundo))
+        self.assertEqual(self.esperar(segundo)[0][:2], ("Comando cancelado.", "sistema"))
+        self.assertNotIn(segundo, self.iniciados)
+        self.assertEqual(ejecutor.cancel_all(), 1)
+        self.esperar(primero)
+        self.assertEqual(ejecutor.pending_count(), 0)
+
+
+@unittest.skipIf(platform.system() == "Windows", "las pruebas del shell usan bash")
+class PersistentShellExecutorTest(ExecutorTestCase):
+    def test_shell_ocupado_no_bloquea_otros_comandos(self):
+        ejecutor = self.crear_ejecutor(timeout=5)
+        inicio = time.monotonic()
+        lento = ejecutor.submit("sleep 1; echo lento", tempfile.gettempdir())
+        time.sleep(0.2)
+        rapido = ejecutor.submit("echo rapido", tempfile.gettempdir())
+        (_, _, fin_lento), (mensaje, tipo, fin_rapido) = self.esperar(lento, rapido)
+        self.assertEqual(tipo, "respuesta")
+        self.assertLess(fin_rapido - inicio, 0.9)
+        self.assertLess(fin_rapido, fin_lento)
+        self.assertEqual(self.lineas(rapido), ["rapido"])
+        self.assertIn((rapido, "El shell persistente está ocupado: el comando se ejecuta en un proceso aparte.",
+                       "sistema"), self.salida)
+
+    def test_avisa_al_reiniciar_el_shell(self):
+        ejecutor = self.crear_ejecutor(timeout=1)
+        primero = ejecutor.submit("export VOZ_PRUEBA=1; sleep 5", tempfile.gettempdir())
+        mensaje, tipo, _ = self.esperar(primero)[0]
+        self.assertEqual(tipo, "error")
+        self.assertIn("timeout", mensaje)
+        self.assertEqual(self.reinicios, [])
+        segundo = ejecutor.submit("echo ${VOZ_PRUEBA:-vacio}", tempfile.gettempdir())
+        self.esperar(segundo)
+        self.assertEqual(self.reinicios, [segundo])
+        self.assertEqual(self.lineas(segundo), ["vacio"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,14 +6,36 @@ import webbrowser           # Para abrir navegadores web
 import datetime             # Para manejar fechas y horas
 import time                 # Para funciones relacionadas con tiempo
 import json                 # Para leer/guardar configuraciones
+import re                   # Para expresiones regulares
 import sys                  # Para acceder a variables del sistema
+import signal               # Para terminar grupos de procesos
 import pyttsx3              # Para síntesis de voz (TTS)
 import threading            # Para manejo de hilos
-import random               # Para generar números aleatorios
+import math                 # Para cálculos de nivel de audio
+import array                # Muestras PCM sin numpy
+import wave                 # Para leer audio desde archivos WAV
+import collections          # Para colas de tramas de audio
+import queue                # Colas seguras entre hilos
+import heapq                # Cola de prioridad para la síntesis de voz
+import sqlite3              # Historial de comandos persistente
+import shutil               # Uso de disco sin lanzar procesos
+import shlex                # Citar comandos para el shell persistente
+import socket               # Direcciones de las conexiones de red
+import bisect               # Búsqueda por prefijo en el índice de archivos
+import unicodedata          # Quitar tildes de los nombres de archivo
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError  # Pools de hilos
 try:
     import numpy as np      # Para operaciones numéricas (opcional)
 except ImportError:
     np = None
+try:
+    import vosk             # Reconocimiento de voz local sin conexión (opcional)
+except ImportError:
+    vosk = None
+try:
+    import psutil           # Consultas del sistema multiplataforma (opcional)
+except ImportError:
+    psutil = None
 
 # Importación de componentes PyQt5 para la interfaz gráfica
 from PyQt5.QtWidgets import (
@@ -26,6 +48,7 @@ from PyQt5.QtWidgets import (
     QProgressBar,           # Barras de progreso
     QSlider,                # Controles deslizantes
     QTextEdit,              # Áreas de texto
+    QPlainTextEdit,         # Texto plano con límite de bloques (consola)
     QLineEdit,              # Campos de entrada de una línea
     QFileDialog,            # Diálogos para seleccionar archivos
     QMessageBox,            # Ventanas de mensaje
@@ -38,98 +61,1417 @@ from PyQt5.QtCore import (
     Qt,                     # Constantes de Qt
     QTimer,                 # Temporizador
     pyqtSignal, pyqtSlot,   # Mecanismos para comunicación entre componentes
-    QThread                 # Clase para crear hilos
+    QThread,                # Clase para crear hilos
+    QObject,                # Objeto base con soporte de señales
+    QFileSystemWatcher      # Vigilancia del archivo de configuración
 )
 
 # Importación de componentes PyQt5 para manejo gráfico
 from PyQt5.QtGui import (
     QFont,                  # Fuentes
     QColor,                 # Colores
-    QTextCursor             # Cursor para manipular texto
+    QTextCursor,            # Cursor para manipular texto
+    QTextCharFormat         # Formato de caracteres de la consola
 )
 
 # Biblioteca para reconocimiento de voz
 import speech_recognition as sr
 
 
+# Tabla declarativa de intenciones. El orden de la lista define la prioridad
+# solo en caso de empate; la coincidencia más larga siempre gana.
+# "argumento" indica si el resto del texto tras la frase es un parámetro.
+COMMAND_INTENTS = [
+    {"intent": "salir", "argumento": False,
+     "frases": ["salir", "terminar", "adiós", "adios", "cerrar", "exit"]},
+    {"intent": "establecer_ruta", "argumento": True,
+     "frases": ["establecer ruta a", "cambiar ruta a", "cambiar ruta de trabajo a", "ruta a"]},
+    {"intent": "ruta_predeterminada", "argumento": False,
+     "frases": ["usar ruta predeterminada", "ruta por defecto", "ruta predeterminada", "ruta home"]},
+    {"intent": "cambiar_directorio", "argumento": True,
+     "frases": ["cambiar directorio a", "ir a directorio", "cambiar a", "ir a", "cambiar directorio"]},
+    {"intent": "crear_carpeta", "argumento": True,
+     "frases": ["crear carpeta", "nueva carpeta", "hacer carpeta", "crea carpeta"]},
+    {"intent": "ejecutar", "argumento": True,
+     "frases": ["ejecutar", "correr", "lanzar", "ejecuta"]},
+    {"intent": "listar_mas", "argumento": False,
+     "frases": ["más archivos", "mas archivos", "siguiente página", "siguiente pagina", "ver más", "ver mas",
+                "mostrar más", "mostrar mas"]},
+    {"intent": "listar", "argumento": False,
+     "frases": ["listar", "mostrar archivos", "mostrar archivo", "mostrar directorio", "lista", "ls", "dir",
+                "ver archivos", "ver archivo"]},
+    {"intent": "directorio_actual", "argumento": False,
+     "frases": ["directorio actual", "dónde estoy", "donde estoy", "ruta actual", "directorio"]},
+    {"intent": "hora", "argumento": False,
+     "frases": ["hora", "qué hora es", "que hora es", "hora actual", "tiempo"]},
+    {"intent": "fecha", "argumento": False,
+     "frases": ["fecha", "qué día es", "que dia es", "qué fecha es", "fecha actual", "hoy"]},
+    {"intent": "abrir_navegador", "argumento": False,
+     "frases": ["abrir navegador", "abrir web", "navegador", "abrir browser", "internet"]},
+    {"intent": "buscar_archivo", "argumento": True,
+     "frases": ["buscar archivo", "busca archivo", "buscar fichero", "encontrar archivo", "buscar carpeta",
+                "dónde está el archivo", "donde está el archivo"]},
+    {"intent": "buscar", "argumento": True,
+     "frases": ["buscar", "busca"]},
+    {"intent": "crear_archivo", "argumento": True,
+     "frases": ["crear archivo", "nuevo archivo", "hacer archivo", "crea archivo"]},
+    {"intent": "informacion_sistema", "argumento": False,
+     "frases": ["información del sistema", "info sistema", "información", "sistema", "información de sistema"]},
+    {"intent": "procesos", "argumento": False,
+     "frases": ["mostrar procesos", "procesos en ejecución", "procesos", "ver procesos", "listar procesos"]},
+    {"intent": "memoria", "argumento": False,
+     "frases": ["uso de memoria", "memoria", "ram", "memoria ram"]},
+    {"intent": "disco", "argumento": False,
+     "frases": ["uso de disco", "espacio en disco", "disco", "espacio disco"]},
+    {"intent": "red", "argumento": False,
+     "frases": ["conexiones de red", "mostrar conexiones", "red", "conexiones", "conexión"]},
+    {"intent": "activar_voz", "argumento": False,
+     "frases": ["activar voz", "habilitar voz", "con voz", "activa voz"]},
+    {"intent": "desactivar_voz", "argumento": False,
+     "frases": ["desactivar voz", "deshabilitar voz", "sin voz", "desactiva voz"]},
+    {"intent": "cancelar_comandos", "argumento": False,
+     "frases": ["cancelar comandos", "cancelar comando", "detener comandos", "detener comando", "cancelar ejecución"]},
+    {"intent": "metricas", "argumento": False,
+     "frases": ["métricas", "metricas", "mostrar métricas", "mostrar metricas", "estadísticas", "estadisticas"]},
+    {"intent": "ayuda", "argumento": False,
+     "frases": ["ayuda", "help", "comandos", "qué puedo hacer", "que puedo hacer"]},
+]
+
+
+# Clase que resuelve la intención de un texto en una sola pasada
+class IntentMatcher:
+    """Compila la tabla de intenciones en una única expresión regular"""
+    def __init__(self, intents=None):
+        self.intents = intents if intents is not None else COMMAND_INTENTS
+        
+        # Mapa frase -> (intención, acepta argumento, prioridad)
+        self.frases = {}
+        for prioridad, definicion in enumerate(self.intents):
+            for frase in definicion["frases"]:
+                self.frases.setdefault(frase, (definicion["intent"], definicion["argumento"], prioridad))
+        
+        # Las alternativas más largas van primero para que en cada posición
+        # la expresión regular elija la frase más específica
+        alternativas = sorted(self.frases, key=len, reverse=True)
+        self.patron = re.compile(r"\b(?:" + "|".join(re.escape(f) for f in alternativas) + r")\b")
+    
+    def resolve(self, texto):
+        """Devuelve (intención, argumento) o (None, "") si no hay coincidencia"""
+        mejor = None
+        for coincidencia in self.patron.finditer(texto):
+            intent, con_argumento, prioridad = self.frases[coincidencia.group(0)]
+            clave = (-len(coincidencia.group(0)), prioridad)
+            if mejor is None or clave < mejor[0]:
+                mejor = (clave, intent, con_argumento, coincidencia.end())
+            # Todo lo que sigue a una intención con argumento es su parámetro
+            if con_argumento:
+                break
+        
+        if mejor is None:
+            return None, ""
+        _, intent, con_argumento, fin = mejor
+        argumento = texto[fin:].strip() if con_argumento else ""
+        return intent, argumento
+    
+    def select(self, alternativas, peso_sin_intencion=0.25):
+        """Elige entre transcripciones alternativas [(texto, confianza), ...] la mejor para un comando
+        
+        Devuelve (texto, intención, argumento, índice). Las alternativas que
+        resuelven una intención pesan más que las que no; a igualdad de
+        puntuación gana la que el motor puso antes.
+        """
+        mejor = None
+        for indice, (texto, confianza) in enumerate(alternativas):
+            intent, argumento = self.resolve(texto)
+            puntuacion = confianza if intent else confianza * peso_sin_intencion
+            if mejor is None or puntuacion > mejor[0]:
+                mejor = (puntuacion, texto, intent, argumento, indice)
+        if mejor is None:
+            return None, None, "", -1
+        return mejor[1:]
+
+
+# Conectores que unen varias órdenes en una misma frase ("crear carpeta x y luego listar")
+COMMAND_CONNECTORS = ["y luego", "y después", "y despues", "y entonces", "y también", "y tambien",
+                      "luego", "después", "despues", "entonces", "además", "ademas", "y"]
+
+# Conectores que marcan una secuencia explícita: son los únicos que cortan el texto
+# libre de crear o buscar ("crear carpeta fotos y red" es una sola carpeta)
+SEQUENCE_CONNECTORS = {"y luego", "y después", "y despues", "y entonces", "luego", "después", "despues", "entonces"}
+
+# Intenciones cuyo argumento es texto libre. El de "ejecutar" es un comando de
+# terminal y se queda con todo lo que sigue; el resto solo se corta en una secuencia
+LITERAL_INTENTS = {"ejecutar"}
+FREE_TEXT_INTENTS = {"ejecutar", "crear_carpeta", "crear_archivo", "buscar", "buscar_archivo"}
+
+# Órdenes que no se ejecutan dentro de un plan: cerrar la aplicación a mitad de
+# una frase compuesta casi siempre es un error de reconocimiento
+PLAN_EXCLUDED_INTENTS = {"salir"}
+
+# Texto entre comillas: nunca se corta, aunque contenga un conector
+QUOTED_TEXT = re.compile(r'"[^"]*"?|«[^»]*»?|“[^”]*”?' + r"|(?<!\w)'[^']*'?")
+
+# Intenciones que solo consultan: dentro de un plan se pueden ejecutar a la vez
+READ_ONLY_INTENTS = {"hora", "fecha", "memoria", "disco", "procesos", "red", "informacion_sistema",
+                     "directorio_actual", "listar", "buscar_archivo", "metricas", "ayuda"}
+
+# Confirmación hablada de cada paso al terminar un plan
+PLAN_CONFIRMATIONS = {
+    "memoria": "memoria consultada", "disco": "disco consultado", "procesos": "procesos mostrados",
+    "red": "conexiones mostradas", "informacion_sistema": "información mostrada",
+    "directorio_actual": "ruta mostrada", "listar": "archivos listados", "listar_mas": "archivos listados",
+    "buscar_archivo": "búsqueda hecha", "metricas": "métricas mostradas", "crear_carpeta": "carpeta creada", "crear_archivo": "archivo creado",
+    "cambiar_directorio": "directorio cambiado", "establecer_ruta": "ruta cambiada", "ejecutar": "comando ejecutado",
+}
+
+
+# Divide una frase con varias órdenes en un plan de ejecución
+class CommandPlanner:
+    """Corta el texto en los conectores que van seguidos de otra orden y agrupa los pasos:
+    las consultas seguidas forman un grupo concurrente y cada orden que cambia algo
+    (crear, cambiar de carpeta, ejecutar...) forma su propio grupo, en orden"""
+    def __init__(self, intent_matcher):
+        self.intent_matcher = intent_matcher
+        conectores = sorted(COMMAND_CONNECTORS, key=len, reverse=True)
+        self.patron = re.compile(r"\s*,?\s+(?:" + "|".join(re.escape(c) for c in conectores) + r")\s+|\s*,\s*")
+    
+    def split(self, texto):
+        """Devuelve los fragmentos de texto; un conector solo corta si lo sigue una orden,
+        así "crear carpeta fotos y videos" sigue siendo una sola orden. Tampoco se corta
+        dentro de comillas ni en el argumento de una orden de texto libre"""
+        comillas = [(m.start(), m.end()) for m in QUOTED_TEXT.finditer(texto)]
+        fragmentos = []
+        inicio = 0
+        for conector in self.patron.finditer(texto):
+            if conector.start() < inicio:
+                continue
+            if any(a < conector.end() and conector.start() < b for a, b in comillas):
+                continue
+            izquierda = texto[inicio:conector.start()].strip()
+            if not izquierda or not self.intent_matcher.patron.match(texto, conector.end()):
+                continue
+            libre = self.free_text_intent(texto, inicio, conector.start())
+            if libre in LITERAL_INTENTS:
+                break  # El comando de terminal se queda con el resto de la frase
+            if libre and " ".join(conector.group(0).replace(",", " ").split()) not in SEQUENCE_CONNECTORS:
+                continue
+            fragmentos.append(izquierda)
+            inicio = conector.end()
+        fragmentos.append(texto[inicio:].strip())
+        return [f for f in fragmentos if f]
+    
+    def free_text_intent(self, texto, inicio, fin):
+        """Devuelve la intención de texto libre que empieza en texto[inicio:fin] o None"""
+        for coincidencia in self.intent_matcher.patron.finditer(texto, inicio, fin):
+            intent, con_argumento, _ = self.intent_matcher.frases[coincidencia.group(0)]
+            if con_argumento:
+                return intent if intent in FREE_TEXT_INTENTS else None
+        return None
+    
+    def plan(self, texto):
+        """Devuelve (grupos, excluidos): los grupos de pasos [[(texto, intención, argumento), ...], ...]
+        y los fragmentos descartados por pedir una orden que no se ejecuta dentro de un plan"""
+        fragmentos = self.split(texto)
+        grupos = []
+        excluidos = []
+        for fragmento in fragmentos:
+            intent, argumento = self.intent_matcher.resolve(fragmento)
+            if len(fragmentos) > 1 and intent in PLAN_EXCLUDED_INTENTS:
+                excluidos.append(fragmento)
+                continue
+            paso = (fragmento, intent, argumento)
+            if intent in READ_ONLY_INTENTS and grupos and grupos[-1][0][1] in READ_ONLY_INTENTS:
+                grupos[-1].append(paso)
+            else:
+                grupos.append([paso])
+        return grupos, excluidos
+
+
+# Estado de un plan de varias órdenes en ejecución
+class CommandPlan:
+    """Grupos pendientes, pasos ya lanzados y comandos en segundo plano de cada paso"""
+    def __init__(self, grupos):
+        self.grupos = collections.deque(grupos)
+        self.pasos = []            # {"texto", "intent", "respuestas", "errores"} por paso lanzado
+        self.pendientes = {}       # id de comando -> paso que lo lanzó
+        self.omitidos = 0          # Pasos no ejecutados porque falló una orden anterior
+        self.inicio = time.perf_counter()
+    
+    def new_step(self, texto, intent):
+        paso = {"texto": texto, "intent": intent, "respuestas": [], "errores": []}
+        self.pasos.append(paso)
+        return paso
+    
+    @staticmethod
+    def record(paso, mensaje, tipo):
+        if tipo == "error":
+            paso["errores"].append(mensaje)
+        elif tipo == "respuesta":
+            paso["respuestas"].append(mensaje)
+
+
+# Correcciones para palabras mal reconocidas. Se aplican en una sola pasada
+# y solo sobre palabras completas, por lo que una corrección nunca se
+# vuelve a corregir ni afecta a partes de otras palabras.
+TEXT_REPLACEMENTS = {
+    'ejecuta': 'ejecutar',
+    'ejecutate': 'ejecutar',
+    'lista': 'listar',
+    'listado': 'listar',
+    'muestra': 'mostrar',
+    'muestrame': 'mostrar',
+    'crea': 'crear',
+    'elimina': 'eliminar',
+    'borra': 'borrar',
+    'abre': 'abrir',
+    'sal': 'salir',
+    'sierra': 'cerrar',
+    'correr': 'ejecutar',
+    'enseñar': 'mostrar',
+    'enseña': 'mostrar',
+    'hora actual': 'hora',
+    'que hora es': 'qué hora es',
+    'fecha actual': 'fecha',
+    'que dia es': 'qué día es',
+    'que fecha es': 'qué fecha es',
+    'informacion': 'información',
+    'informacion del sistema': 'información del sistema',
+    'carpetas': 'carpeta',
+    'archivos': 'archivo',
+    'directorio actual': 'directorio actual',
+    'donde estoy': 'dónde estoy',
+    'navegar': 'abrir navegador',
+    'browser': 'navegador',
+    'internet': 'abrir navegador',
+    'web': 'abrir navegador',
+    'busca': 'buscar',
+    'buscame': 'buscar',
+    'procesos': 'mostrar procesos',
+    'ram': 'memoria',
+    'memoria ram': 'memoria',
+    'espacio': 'uso de disco',
+    'red': 'conexiones de red',
+    'conexión': 'conexiones de red',
+    'ayudar': 'ayuda',
+    'auxilio': 'ayuda',
+    'comandos disponibles': 'comandos',
+    'que puedo hacer': 'qué puedo hacer',
+    'que comandos': 'comandos'
+}
+
+
+# Clase que normaliza el texto de entrada en una sola pasada
+class TextNormalizer:
+    """Compila la tabla de correcciones en una única expresión regular"""
+    def __init__(self, replacements=None, intents=None):
+        replacements = replacements if replacements is not None else TEXT_REPLACEMENTS
+        intents = intents if intents is not None else COMMAND_INTENTS
+        
+        # Las frases de comando ya correctas se conservan tal cual para que
+        # "mostrar procesos" no se convierta en "mostrar mostrar procesos"
+        self.tabla = dict(replacements)
+        frases_argumento = set()
+        for definicion in intents:
+            for frase in definicion["frases"]:
+                self.tabla.setdefault(frase, frase)
+                if definicion["argumento"]:
+                    frases_argumento.add(frase)
+        
+        # Frases tras las cuales el resto del texto es un argumento literal
+        # (nombre de carpeta, comando de terminal, ruta...) y no se corrige
+        self.claves_argumento = {
+            clave for clave, valor in self.tabla.items()
+            if clave in frases_argumento or valor in frases_argumento
+        }
+        
+        # Verbos de comando: primera palabra de las frases y de las correcciones
+        verbos = {valor.split()[0] for valor in self.tabla.values()}
+        self.verbos = {v for v in verbos if len(v) > 3 and v.endswith(("ar", "er", "ir"))} | {"ir", "ver"}
+        
+        # Sustantivos que se amplían a una orden con verbo ("procesos" -> "mostrar procesos").
+        # Si el texto ya lleva un verbo antes, ampliarlos repetiría la orden
+        # ("muestrame los procesos" -> "mostrar los mostrar procesos")
+        self.ampliaciones = {
+            clave for clave, valor in self.tabla.items()
+            if len(valor.split()) > len(clave.split()) and valor.split()[0] in self.verbos
+        }
+        
+        alternativas = sorted(self.tabla, key=len, reverse=True)
+        self.patron = re.compile(r"\b(?:" + "|".join(re.escape(a) for a in alternativas) + r")\b")
+    
+    def normalize(self, texto):
+        """Devuelve el texto en minúsculas con las correcciones aplicadas"""
+        texto = texto.lower().strip()
+        partes = []
+        posicion = 0
+        for coincidencia in self.patron.finditer(texto):
+            clave = coincidencia.group(0)
+            partes.append(texto[posicion:coincidencia.start()])
+            if clave in self.ampliaciones and any(p in self.verbos for p in "".join(partes).split()):
+                partes.append(clave)
+            else:
+                partes.append(self.tabla[clave])
+            posicion = coincidencia.end()
+            if clave in self.claves_argumento:
+                break
+        partes.append(texto[posicion:])
+        return "".join(partes)
+
+
+# Sinónimos de los verbos de comando, usados para ampliar el índice difuso
+COMMAND_SYNONYMS = {
+    'ejecutar': ['ejecutar', 'correr', 'lanzar', 'iniciar'],
+    'listar': ['listar', 'mostrar', 'ver', 'enseñar'],
+    'crear': ['crear', 'hacer', 'generar', 'nuevo'],
+    'eliminar': ['eliminar', 'borrar', 'quitar', 'suprimir'],
+    'abrir': ['abrir', 'ejecutar', 'lanzar'],
+    'salir': ['salir', 'cerrar', 'terminar', 'finalizar', 'adiós', 'adios']
+}
+
+
+def edit_distance(a, b):
+    """Distancia de Levenshtein entre dos cadenas"""
+    if len(a) < len(b):
+        a, b = b, a
+    m = len(b)
+    if m == 0:
+        return len(a)
+    
+    # Algoritmo de bits paralelos de Myers: cada columna de la matriz de
+    # distancias es un entero con los incrementos (+1/-1) de sus celdas
+    coincidencias = {}
+    for i, c in enumerate(b):
+        coincidencias[c] = coincidencias.get(c, 0) | (1 << i)
+    mascara = (1 << m) - 1
+    ultimo = 1 << (m - 1)
+    positivos, negativos, distancia = mascara, 0, m
+    for c in a:
+        eq = coincidencias.get(c, 0)
+        xv = eq | negativos
+        xh = (((eq & positivos) + positivos) ^ positivos) | eq
+        ph = negativos | (~(xh | positivos) & mascara)
+        mh = positivos & xh
+        if ph & ultimo:
+            distancia += 1
+        elif mh & ultimo:
+            distancia -= 1
+        ph = ((ph << 1) | 1) & mascara
+        mh = (mh << 1) & mascara
+        positivos = mh | (~(xv | ph) & mascara)
+        negativos = ph & xv
+    return distancia
+
+
+# Separadores que se leen como espacios al buscar nombres de archivo por voz
+NAME_SEPARATORS = str.maketrans({"_": " ", "-": " ", ".": " "})
+
+
+def fold_name(nombre):
+    """Clave de búsqueda de un nombre: minúsculas, sin tildes y con _ - . como espacios"""
+    clave = nombre.casefold()
+    if not clave.isascii():
+        clave = "".join(c for c in unicodedata.normalize("NFD", clave) if not unicodedata.combining(c))
+    return clave.translate(NAME_SEPARATORS)
+
+
+# Reglas de pronunciación en español para la clave fonética, en orden de aplicación
+PHONETIC_RULES = [
+    (re.compile(r"ch"), "X"),            # Protegida antes de tratar la c y la h
+    (re.compile(r"ph"), "f"),
+    (re.compile(r"qu(?=[ei])"), "k"),
+    (re.compile(r"c(?=[ei])"), "s"),
+    (re.compile(r"gu(?=[ei])"), "g"),
+    (re.compile(r"g(?=[ei])"), "j"),
+    (re.compile(r"ll"), "y"),
+    (re.compile(r"h"), ""),
+    (re.compile(r"[cq]"), "k"),
+    (re.compile(r"v"), "b"),
+    (re.compile(r"z"), "s"),
+    (re.compile(r"w"), "u"),
+    (re.compile(r"x"), "ks"),
+    (re.compile(r"y(?=\b|[^aeiou])"), "i"),
+    (re.compile(r"(.)\1+"), r"\1"),     # Letras dobles
+]
+
+
+def phonetic_key(texto):
+    """Clave aproximada de cómo suena un nombre en español ("Vídeos" y "bideos" coinciden)"""
+    clave = " ".join(fold_name(texto).split())
+    for patron, reemplazo in PHONETIC_RULES:
+        clave = patron.sub(reemplazo, clave)
+    return clave
+
+
+# Nombres habituales de las carpetas del usuario en otros idiomas o versiones del sistema
+FOLDER_ALIASES = {
+    "documentos": ["documents", "mis documentos"],
+    "descargas": ["downloads"],
+    "escritorio": ["desktop"],
+    "imagenes": ["pictures", "mis imagenes"],
+    "fotos": ["pictures", "photos"],
+    "musica": ["music", "mi musica"],
+    "videos": ["videos", "movies", "mis videos"],
+    "plantillas": ["templates"],
+    "publico": ["public"],
+}
+
+
+# Únicas intenciones que una coincidencia aproximada ejecuta sin preguntar: consultas
+# sin argumento. Las que cambian algo o llevan argumento ("nueva carpta fotos",
+# "establecer rota a /etc") solo se sugieren
+FUZZY_AUTO_INTENTS = READ_ONLY_INTENTS - {d["intent"] for d in COMMAND_INTENTS if d["argumento"]}
+
+
+# Índice difuso para textos que no contienen ninguna frase de comando exacta
+class FuzzyCommandIndex:
+    """Índice invertido de trigramas sobre frases de comando, sinónimos y correcciones"""
+    def __init__(self, intents=None, synonyms=None, replacements=None, max_candidates=8):
+        intents = intents if intents is not None else COMMAND_INTENTS
+        synonyms = synonyms if synonyms is not None else COMMAND_SYNONYMS
+        replacements = replacements if replacements is not None else TEXT_REPLACEMENTS
+        self.max_candidates = max_candidates  # Candidatos que se puntúan con distancia de edición
+        
+        # Entradas (frase, intención, acepta argumento, número de palabras); las
+        # frases originales van primero para que una variante no las sustituya
+        self.entradas = []
+        vistas = set()
+        
+        def agregar(frase, intent, con_argumento):
+            if frase not in vistas:
+                vistas.add(frase)
+                self.entradas.append((frase, intent, con_argumento, len(frase.split())))
+        
+        for definicion in intents:
+            for frase in definicion["frases"]:
+                agregar(frase, definicion["intent"], definicion["argumento"])
+        
+        # Variantes con sinónimos del verbo inicial ("listar procesos" -> "ver procesos")
+        for definicion in intents:
+            for frase in definicion["frases"]:
+                primera, _, resto = frase.partition(" ")
+                for sinonimo in synonyms.get(primera, ()):
+                    agregar(f"{sinonimo} {resto}".strip(), definicion["intent"], definicion["argumento"])
+        
+        # Formas mal reconocidas cuya corrección es una frase de comando completa
+        frases = {frase: (d["intent"], d["argumento"]) for d in intents for frase in d["frases"]}
+        for incorrecta, correcta in replacements.items():
+            if correcta in frases:
+                agregar(incorrecta, *frases[correcta])
+        
+        # Trigrama -> índices de las entradas que lo contienen
+        self.indice = collections.defaultdict(list)
+        self.tamanos = []
+        for posicion, (frase, _, _, _) in enumerate(self.entradas):
+            gramas = self._trigramas(frase)
+            self.tamanos.append(len(gramas))
+            for grama in gramas:
+                self.indice[grama].append(posicion)
+    
+    @staticmethod
+    def _trigramas(texto):
+        relleno = f"  {texto} "
+        return {relleno[i:i + 3] for i in range(len(relleno) - 2)}
+    
+    def search(self, texto, limite=3):
+        """Devuelve hasta limite candidatos [(confianza, intención, argumento, frase), ...]"""
+        palabras = texto.split()
+        if not palabras:
+            return []
+        
+        # Preselección: entradas con más trigramas presentes en el texto
+        conteos = collections.Counter()
+        for grama in self._trigramas(texto):
+            for posicion in self.indice.get(grama, ()):
+                conteos[posicion] += 1
+        preseleccion = sorted(conteos, key=lambda p: conteos[p] / self.tamanos[p], reverse=True)
+        
+        # Puntuación fina con distancia de edición sobre la parte comparable del texto
+        mejores = {}
+        for posicion in preseleccion[:self.max_candidates]:
+            frase, intent, con_argumento, n = self.entradas[posicion]
+            if con_argumento:
+                # La frase va al principio y el resto es el argumento
+                segmentos = [(" ".join(palabras[:n]), " ".join(palabras[n:]), 1.0)]
+            else:
+                # La frase puede estar en cualquier posición del texto, pero una
+                # ventana que cubre pocas palabras del texto cuenta menos
+                segmentos = [(texto, "", 1.0)]
+                if len(palabras) > n:
+                    cobertura = 0.5 + 0.5 * n / len(palabras)
+                    segmentos += [(" ".join(palabras[i:i + n]), "", cobertura)
+                                  for i in range(len(palabras) - n + 1)]
+            for segmento, argumento, peso in segmentos:
+                largo = max(len(segmento), len(frase))
+                # La diferencia de longitud acota la confianza: si ni así mejora, no se calcula
+                if intent in mejores and peso * (1 - abs(len(segmento) - len(frase)) / largo) <= mejores[intent][0]:
+                    continue
+                confianza = peso * (1 - edit_distance(segmento, frase) / largo)
+                if intent not in mejores or confianza > mejores[intent][0]:
+                    mejores[intent] = (confianza, intent, argumento, frase)
+        return sorted(mejores.values(), key=lambda c: c[0], reverse=True)[:limite]
+    
+    def resolve(self, texto, umbral_auto=0.8, umbral_sugerencia=0.5):
+        """Devuelve (candidato que se ejecuta sin preguntar o None, sugerencias)"""
+        candidatos = [c for c in self.search(texto) if c[0] >= umbral_sugerencia]
+        if candidatos and candidatos[0][0] >= umbral_auto and candidatos[0][1] in FUZZY_AUTO_INTENTS:
+            return candidatos[0], []
+        return None, candidatos
+
+
 # Clase para manejar la síntesis de voz (Text-to-Speech)
 class TextToSpeechManager:
-    """Clase para manejar la síntesis de voz"""
-    def __init__(self):
+    """Clase para manejar la síntesis de voz en un hilo dedicado"""
+    # Prioridades de los mensajes: menor valor se habla antes
+    PRIORITY_HIGH = 0      # Confirmaciones pedidas explícitamente por el usuario
+    PRIORITY_NORMAL = 1    # Respuestas a comandos
+    PRIORITY_LOW = 2       # Mensajes informativos del sistema
+    
+    def __init__(self, max_queue=3, max_age=6.0):
+        self.max_queue = max_queue    # Mensajes pendientes como máximo; se descartan los menos importantes
+        self.max_age = max_age        # Segundos tras los cuales un mensaje pendiente ya no se habla
+        
+        self.cola = []                # heap de (prioridad, secuencia, instante, texto)
+        self.secuencia = 0
+        self.condicion = threading.Condition()
+        self.interrumpir = threading.Event()
+        self.running = True
+        
+        # Métricas de la cola
+        self.stats = {"hablados": 0, "descartados": 0, "fusionados": 0, "interrumpidos": 0,
+                      "latencia_ultima": 0.0, "latencia_media": 0.0}
+        
+        # pyttsx3 debe usarse siempre desde el mismo hilo, así que el motor se crea en el worker
+        self.engine = None
+        self.available = False
+        inicializado = threading.Event()
+        self.worker = threading.Thread(target=self._run, args=(inicializado,), daemon=True)
+        self.worker.start()
+        inicializado.wait(timeout=5)
+    
+    def _init_engine(self):
+        """Crea y configura el motor de síntesis"""
+        self.engine = pyttsx3.init()
+        # Configurar propiedades de la voz
+        voices = self.engine.getProperty('voices')
+        # Intentar usar una voz en español si está disponible
+        spanish_voice = None
+        for voice in voices:
+            if 'spanish' in voice.id.lower() or 'español' in voice.id.lower() or 'spa' in voice.id.lower():
+                spanish_voice = voice.id
+                break
+        
+        # Si hay una voz en español disponible, usarla
+        if spanish_voice:
+            self.engine.setProperty('voice', spanish_voice)
+        
+        # Configurar velocidad de habla (valor predeterminado = 200)
+        self.engine.setProperty('rate', 170)
+        # Permite cortar la frase en curso entre palabras (barge-in)
+        self.engine.connect('started-word', self._on_word)
+    
+    def _on_word(self, name, location, length):
+        """Callback del motor: detiene la frase si se pidió interrumpir"""
+        if self.interrumpir.is_set():
+            self.engine.stop()
+    
+    def speak(self, text, priority=PRIORITY_NORMAL):
+        """Encola un texto para hablarlo sin bloquear"""
+        if not self.available:
+            return False
+        with self.condicion:
+            # Un mensaje idéntico ya pendiente no se repite
+            if any(pendiente[3] == text for pendiente in self.cola):
+                self.stats["fusionados"] += 1
+                return True
+            heapq.heappush(self.cola, (priority, self.secuencia, time.time(), text))
+            self.secuencia += 1
+            # En ráfagas se descarta el mensaje más antiguo de menor prioridad
+            while len(self.cola) > self.max_queue:
+                self.cola.remove(max(self.cola, key=lambda m: (m[0], -m[1])))
+                heapq.heapify(self.cola)
+                self.stats["descartados"] += 1
+            self.condicion.notify()
+        return True
+    
+    def cancel(self):
+        """Vacía la cola y corta la frase en curso (barge-in)"""
+        with self.condicion:
+            self.stats["descartados"] += len(self.cola)
+            self.cola.clear()
+        self.interrumpir.set()
+    
+    def queue_depth(self):
+        """Número de mensajes pendientes"""
+        with self.condicion:
+            return len(self.cola)
+    
+    def metrics(self):
+        """Devuelve una copia de las métricas con la profundidad actual de la cola"""
+        with self.condicion:
+            metricas = dict(self.stats)
+            metricas["cola"] = len(self.cola)
+        return metricas
+    
+    def stop(self):
+        """Detiene el hilo de síntesis"""
+        self.cancel()
+        with self.condicion:
+            self.running = False
+            self.condicion.notify()
+    
+    def _run(self, inicializado):
+        """Bucle del hilo de síntesis"""
         try:
-            self.engine = pyttsx3.init()
-            # Configurar propiedades de la voz
-            voices = self.engine.getProperty('voices')
-            # Intentar usar una voz en español si está disponible
-            spanish_voice = None
-            for voice in voices:
-                if 'spanish' in voice.id.lower() or 'español' in voice.id.lower() or 'spa' in voice.id.lower():
-                    spanish_voice = voice.id
-                    break
-            
-            # Si hay una voz en español disponible, usarla
-            if spanish_voice:
-                self.engine.setProperty('voice', spanish_voice)
-            
-            # Configurar velocidad de habla (valor predeterminado = 200)
-            self.engine.setProperty('rate', 170)
+            self._init_engine()
             self.available = True
         except Exception as e:
             print(f"Error al inicializar motor de síntesis de voz: {e}")
             self.available = False
-    
-    def speak(self, text):
-        """Convierte texto a voz"""
-        if self.available:
+        finally:
+            inicializado.set()
+        
+        while self.available:
+            with self.condicion:
+                while self.running and not self.cola:
+                    self.condicion.wait()
+                if not self.running:
+                    return
+                _, _, instante, texto = heapq.heappop(self.cola)
+                self.interrumpir.clear()
+            
+            espera = time.time() - instante
+            if espera > self.max_age:
+                with self.condicion:
+                    self.stats["descartados"] += 1
+                continue
+            
             try:
-                self.engine.say(text)
+                self.engine.say(texto)
                 self.engine.runAndWait()
-                return True
+                if self.interrumpir.is_set():
+                    self.stats["interrumpidos"] += 1
+                else:
+                    self.stats["hablados"] += 1
+                    # Latencia desde que se encoló hasta que empezó a hablarse
+                    self.stats["latencia_ultima"] = espera
+                    self.stats["latencia_media"] += (espera - self.stats["latencia_media"]) * 0.2
             except Exception as e:
                 print(f"Error en síntesis de voz: {e}")
-                return False
-        return False
 
 
-# Clase que maneja la simulación del nivel de audio en un hilo separado
+# Energía RMS de un bloque PCM en unidades de muestra (misma escala que energy_threshold)
+def frame_rms(data, sample_width):
+    """Calcula el RMS de un bloque PCM con numpy o, si no está, con la biblioteca estándar"""
+    data = data[:len(data) - len(data) % sample_width]
+    if not data:
+        return 0.0
+    if np is not None:
+        dtype = {1: np.uint8, 2: np.int16, 4: np.int32}.get(sample_width)
+        if dtype is None:
+            return 0.0
+        samples = np.frombuffer(data, dtype=dtype).astype(np.float32)
+        if sample_width == 1:
+            samples -= 128.0  # PCM de 8 bits no tiene signo
+        return float(np.sqrt(np.mean(samples * samples)))
+    typecode = {1: 'B', 2: 'h', 4: 'i'}.get(sample_width)
+    if typecode is None:
+        return 0.0
+    samples = array.array(typecode, data)
+    offset = 128 if sample_width == 1 else 0
+    return math.sqrt(sum((s - offset) ** 2 for s in samples) / len(samples))
+
+
+# Fuente de audio que lee tramas PCM de un archivo WAV
+class WavFrameSource:
+    """Fuente de tramas de audio desde un archivo WAV (pruebas sin micrófono)"""
+    def __init__(self, path, chunk_size=1024, realtime=False):
+        self.wav = wave.open(path, 'rb')
+        self.sample_rate = self.wav.getframerate()
+        self.sample_width = self.wav.getsampwidth()
+        self.channels = self.wav.getnchannels()
+        self.chunk_size = chunk_size    # Tramas por lectura
+        self.realtime = realtime        # Simular la velocidad de un micrófono real
+    
+    def read(self, timeout=None):
+        """Devuelve el siguiente bloque PCM o b"" al llegar al final"""
+        data = self.wav.readframes(self.chunk_size)
+        if self.realtime and data:
+            time.sleep(self.chunk_size / self.sample_rate)
+        return data
+    
+    def close(self):
+        """Cierra el archivo"""
+        self.wav.close()
+
+
+# Fuente de audio alimentada por un hilo que ya está capturando
+class StreamTap:
+    """Reparte los bloques que lee otro hilo sin abrir el dispositivo otra vez"""
+    def __init__(self, max_chunks=32):
+        self.cola = queue.Queue(maxsize=max_chunks)
+        self.sample_rate = 16000
+        self.sample_width = 2
+        self.channels = 1
+    
+    def push(self, data, sample_rate, sample_width):
+        """Publica un bloque; si nadie lo consume se descarta para no frenar la captura"""
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        try:
+            self.cola.put_nowait(data)
+        except queue.Full:
+            pass
+    
+    def read(self, timeout=None):
+        """Devuelve el siguiente bloque o None si no llegó audio a tiempo"""
+        try:
+            return self.cola.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def close(self):
+        """Indica a los lectores que no habrá más audio"""
+        try:
+            self.cola.put_nowait(b"")
+        except queue.Full:
+            pass
+
+
+# Fuente de audio que mantiene abierto el micrófono entre frases
+class MicrophoneFrameSource:
+    """Fuente de tramas de audio desde un sr.Microphone abierto una sola vez"""
+    def __init__(self, microphone):
+        self.microphone = microphone
+        self.source = None
+        self.sample_rate = microphone.SAMPLE_RATE
+        self.sample_width = microphone.SAMPLE_WIDTH
+        self.chunk_size = microphone.CHUNK
+        self.channels = 1
+    
+    def read(self, timeout=None):
+        """Devuelve el siguiente bloque PCM abriendo el dispositivo si hace falta"""
+        if self.source is None:
+            self.source = self.microphone.__enter__()
+        return self.source.stream.read(self.chunk_size)
+    
+    def close(self):
+        """Cierra el dispositivo; la siguiente lectura lo vuelve a abrir"""
+        if self.source is not None:
+            self.source = None
+            self.microphone.__exit__(None, None, None)
+
+
+# Buffer circular preasignado de tramas de audio
+class AudioRingBuffer:
+    """Buffer circular de tramas de tamaño fijo con lectores por número de secuencia"""
+    def __init__(self, frame_bytes, capacity):
+        self.frame_bytes = frame_bytes    # Bytes por trama
+        self.capacity = capacity          # Tramas que caben antes de sobrescribir
+        self.data = bytearray(frame_bytes * capacity)
+        self.write_seq = 0                # Número total de tramas escritas
+        self.closed = False
+        self.condicion = threading.Condition()
+    
+    def write(self, frame):
+        """Copia una trama en el siguiente hueco (O(1), sin reservar memoria)"""
+        if len(frame) != self.frame_bytes:
+            frame = frame[:self.frame_bytes].ljust(self.frame_bytes, b"\0")
+        with self.condicion:
+            inicio = (self.write_seq % self.capacity) * self.frame_bytes
+            self.data[inicio:inicio + self.frame_bytes] = frame
+            self.write_seq += 1
+            self.condicion.notify_all()
+    
+    def read(self, seq, timeout=None):
+        """Devuelve (trama, siguiente_seq); trama es None si no llegó a tiempo y b"" si se cerró"""
+        with self.condicion:
+            if not self.condicion.wait_for(lambda: seq < self.write_seq or self.closed, timeout):
+                return None, seq
+            if seq >= self.write_seq:
+                return b"", seq
+            # Un lector que se quedó atrás salta a la trama más antigua disponible
+            seq = max(seq, self.write_seq - self.capacity)
+            inicio = (seq % self.capacity) * self.frame_bytes
+            return bytes(self.data[inicio:inicio + self.frame_bytes]), seq + 1
+    
+    def latest(self, count):
+        """Devuelve las últimas count tramas escritas (o menos si aún no hay tantas)"""
+        with self.condicion:
+            count = min(count, self.write_seq, self.capacity)
+            tramas = []
+            for seq in range(self.write_seq - count, self.write_seq):
+                inicio = (seq % self.capacity) * self.frame_bytes
+                tramas.append(bytes(self.data[inicio:inicio + self.frame_bytes]))
+            return tramas
+    
+    def close(self):
+        """Despierta a los lectores indicando que no habrá más tramas"""
+        with self.condicion:
+            self.closed = True
+            self.condicion.notify_all()
+
+
+# Clase que mide el nivel de audio real en un hilo separado
 class AudioLevelThread(QThread):
     """Hilo para monitorear el nivel de audio del micrófono"""
     # Señal que se emite cuando cambia el nivel de audio
     level_updated = pyqtSignal(float)
     
-    def __init__(self, parent=None):
+    def __init__(self, source=None, min_interval=1 / 30, min_change=0.02, parent=None):
         super().__init__(parent)
         self.running = False  # Bandera para controlar si el hilo está ejecutándose
-        
-        # Verificar si numpy está disponible
-        self.has_numpy = np is not None
+        self.source = source if source is not None else StreamTap()
+        self.min_interval = min_interval  # Segundos mínimos entre emisiones
+        self.min_change = min_change      # Cambio mínimo de nivel para volver a emitir
+        self.last_level = 0.0
+        self.last_emit_time = 0.0
+    
+    def compute_level(self, data, sample_width):
+        """Calcula el nivel RMS de un bloque PCM en escala 0-1 (de -60 dBFS a 0 dBFS)"""
+        rms = frame_rms(data, sample_width)
+        if rms <= 0:
+            return 0.0
+        full_scale = float(1 << (8 * sample_width - 1))
+        dbfs = 20 * math.log10(rms / full_scale)
+        return min(1.0, max(0.0, (dbfs + 60) / 60))
+    
+    def publish(self, level, now=None):
+        """Emite el nivel solo si cambió lo suficiente y no se emitió hace muy poco"""
+        now = time.time() if now is None else now
+        if abs(level - self.last_level) < self.min_change:
+            return False
+        if level != 0.0 and now - self.last_emit_time < self.min_interval:
+            return False
+        self.last_level = level
+        self.last_emit_time = now
+        self.level_updated.emit(level)
+        return True
     
     def run(self):
         """Método que se ejecuta cuando se inicia el hilo"""
         try:
-            # Generar valores aleatorios para simular nivel de audio
             self.running = True
-            
-            if self.has_numpy:
-                # Usar numpy para generar valores aleatorios más eficientemente
-                while self.running:
-                    level = np.random.random() * 0.5  # Valor entre 0 y 0.5
-                    self.level_updated.emit(level)       # Emitir el nivel para actualizar la interfaz
-                    time.sleep(0.1)                      # Esperar 100ms antes de actualizar de nuevo
-            else:
-                # Alternativa usando la biblioteca estándar si numpy no está disponible
-                while self.running:
-                    level = random.random() * 0.5
-                    self.level_updated.emit(level)
-                    time.sleep(0.1)
-                    
+            while self.running:
+                data = self.source.read(timeout=0.3)
+                if data is None:
+                    # Sin audio (escucha pausada): bajar el medidor una vez y esperar
+                    self.publish(0.0)
+                    continue
+                if data == b"":
+                    break  # La fuente terminó
+                self.publish(self.compute_level(data, self.source.sample_width))
+            self.publish(0.0)
         except Exception as e:
             print(f"Error en hilo de audio: {e}")
     
     def stop(self):
         """Detiene la ejecución del hilo"""
         self.running = False
-        self.wait(200)  # Espera hasta 200ms para que el hilo termine
+        self.wait(500)  # Espera hasta que termine la lectura en curso
+
+
+# Motores de reconocimiento intercambiables. Todos exponen recognize(audio)
+# con un sr.AudioData y devuelven el texto o lanzan sr.UnknownValueError /
+# sr.RequestError, igual que speech_recognition.
+class GoogleRecognitionBackend:
+    """Reconocimiento en línea con la API web de Google"""
+    name = "google"
+    
+    def __init__(self, language="es-ES", operation_timeout=10):
+        self.recognizer = sr.Recognizer()
+        # Limita la petición HTTP para que una conexión colgada no retenga el hilo
+        self.recognizer.operation_timeout = operation_timeout
+        self.language = language
+    
+    def recognize(self, audio):
+        return self.recognize_alternatives(audio)[0][0]
+    
+    def recognize_alternatives(self, audio):
+        # show_all=True devuelve la lista n-best; solo la primera suele traer confianza.
+        # A las demás se les da un 90 % de la anterior: nunca superan a una mejor situada
+        resultado = self.recognizer.recognize_google(audio, language=self.language, show_all=True)
+        alternativas = resultado.get("alternative", []) if isinstance(resultado, dict) else []
+        lista = []
+        anterior = 0.8 / 0.9  # Sin ninguna confianza real, la primera vale 0.8
+        for alt in alternativas:
+            if not alt.get("transcript"):
+                continue
+            confianza = alt.get("confidence", anterior * 0.9)
+            lista.append((alt["transcript"], confianza))
+            anterior = confianza
+        if not lista:
+            raise sr.UnknownValueError()
+        return lista
+
+
+class VoskRecognitionBackend:
+    """Reconocimiento local sin conexión con Vosk, opcionalmente limitado a la gramática de comandos"""
+    name = "vosk"
+    
+    def __init__(self, model_path=None, grammar=False, sample_rate=16000, max_alternatives=5):
+        if vosk is None:
+            raise RuntimeError("El paquete 'vosk' no está instalado")
+        vosk.SetLogLevel(-1)
+        # Sin ruta se descarga/usa el modelo pequeño de español
+        self.model = vosk.Model(model_path) if model_path else vosk.Model(lang="es")
+        self.sample_rate = sample_rate
+        # Con gramática solo se reconocen frases de comandos (más rápido y preciso,
+        # pero sin argumentos libres como nombres de carpeta)
+        self.grammar = json.dumps(command_grammar(), ensure_ascii=False) if grammar else None
+        self.max_alternatives = max_alternatives
+    
+    def recognize(self, audio):
+        return self.recognize_alternatives(audio)[0][0]
+    
+    def recognize_alternatives(self, audio):
+        if self.grammar:
+            recognizer = vosk.KaldiRecognizer(self.model, self.sample_rate, self.grammar)
+        else:
+            recognizer = vosk.KaldiRecognizer(self.model, self.sample_rate)
+        recognizer.SetMaxAlternatives(self.max_alternatives)
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        resultado = json.loads(recognizer.FinalResult())
+        # Vosk da la confianza como log-verosimilitud; se normaliza respecto a la mejor
+        alternativas = resultado.get("alternatives", [{"text": resultado.get("text", ""), "confidence": 0.0}])
+        lista = []
+        referencia = None
+        for alt in alternativas:
+            texto = alt.get("text", "").replace("[unk]", "").strip()
+            if not texto:
+                continue
+            if referencia is None:
+                referencia = alt.get("confidence", 0.0)
+            lista.append((texto, math.exp(min(0.0, alt.get("confidence", 0.0) - referencia) / 10.0)))
+        if not lista:
+            raise sr.UnknownValueError()
+        return lista
+
+
+class WhisperRecognitionBackend:
+    """Reconocimiento local sin conexión con Whisper en CPU"""
+    name = "whisper"
+    
+    def __init__(self, model="base", language="spanish"):
+        import whisper  # noqa: F401  Solo para fallar al configurar si no está instalado
+        self.recognizer = sr.Recognizer()
+        self.model = model
+        self.language = language
+    
+    def recognize(self, audio):
+        texto = self.recognizer.recognize_whisper(audio, model=self.model, language=self.language).strip()
+        if not texto:
+            raise sr.UnknownValueError()
+        return texto
+    
+    def recognize_alternatives(self, audio):
+        # Whisper solo devuelve una transcripción
+        return [(self.recognize(audio), 1.0)]
+
+
+class FakeRecognitionBackend:
+    """Motor de pruebas: devuelve respuestas predefinidas sin audio real"""
+    name = "fake"
+    
+    def __init__(self, responses=None, latency=0.0):
+        # responses puede ser una lista (se consume en orden) o una función audio -> texto;
+        # cada respuesta es un texto o una lista de alternativas [(texto, confianza), ...]
+        self.responses = list(responses) if isinstance(responses, (list, tuple)) else responses
+        self.latency = latency
+        self.calls = 0
+    
+    def recognize(self, audio):
+        return self.recognize_alternatives(audio)[0][0]
+    
+    def recognize_alternatives(self, audio):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if callable(self.responses):
+            respuesta = self.responses(audio)
+        elif self.responses:
+            respuesta = self.responses.pop(0)
+        else:
+            respuesta = None
+        if not respuesta:
+            raise sr.UnknownValueError()
+        if isinstance(respuesta, str):
+            return [(respuesta, 1.0)]
+        return [(texto, confianza) for texto, confianza in respuesta]
+
+
+RECOGNITION_BACKENDS = {
+    "google": GoogleRecognitionBackend,
+    "vosk": VoskRecognitionBackend,
+    "whisper": WhisperRecognitionBackend,
+    "fake": FakeRecognitionBackend,
+}
+
+
+def command_grammar(intents=None):
+    """Lista de frases de comando para restringir un motor local"""
+    intents = intents if intents is not None else COMMAND_INTENTS
+    frases = sorted({frase for definicion in intents for frase in definicion["frases"]})
+    return frases + ["[unk]"]
+
+
+def recognize_alternatives(backend, audio):
+    """Lista n-best [(texto, confianza), ...] de cualquier motor, tenga o no alternativas"""
+    if hasattr(backend, "recognize_alternatives"):
+        return backend.recognize_alternatives(audio)
+    return [(backend.recognize(audio), 1.0)]
+
+
+def create_recognition_backend(nombre, opciones=None):
+    """Crea el motor de reconocimiento indicado en la configuración"""
+    if nombre not in RECOGNITION_BACKENDS:
+        raise ValueError(f"Motor de reconocimiento desconocido: {nombre}")
+    return RECOGNITION_BACKENDS[nombre](**(opciones or {}))
+
+
+# Órdenes que la caché solo responde con la misma huella exacta: servir por
+# parecido un "salir", un "ejecutar ..." o una orden con argumento
+# ("crear carpeta fotos" a quien dijo "crear carpeta videos") haría algo que no se pidió
+NEAR_MATCH_EXCLUDED_INTENTS = {"salir", "ejecutar"} | {d["intent"] for d in COMMAND_INTENTS if d["argumento"]}
+
+
+# Caché de resultados delante del motor: los comandos cortos se repiten mucho
+class RecognitionCache:
+    """Caché LRU de transcripciones indexada por una huella acústica del audio"""
+    VERSION = 3
+    
+    def __init__(self, capacity=128, threshold=0.8, max_duration_ratio=0.2, path=None,
+                 time_bins=16, bands=12, intent_matcher=None, normalizer=None, fuzzy_index=None,
+                 fuzzy_threshold=0.5):
+        self.capacity = capacity                      # Entradas máximas antes de expulsar la menos usada
+        self.threshold = threshold                    # Similitud mínima para aceptar una coincidencia cercana
+        self.max_duration_ratio = max_duration_ratio  # Diferencia de duración tolerada
+        self.path = path                              # Archivo donde persiste entre sesiones
+        self.time_bins = time_bins
+        self.bands = bands
+        # El texto en caché se comprueba igual que lo procesa la aplicación: normalizado,
+        # con la tabla de intenciones y, si no hay frase exacta, con el índice difuso
+        self.intent_matcher = intent_matcher if intent_matcher is not None else IntentMatcher()
+        self.normalizer = normalizer if normalizer is not None else TextNormalizer()
+        self.fuzzy_index = fuzzy_index if fuzzy_index is not None else FuzzyCommandIndex()
+        self.fuzzy_threshold = fuzzy_threshold        # Confianza a partir de la cual la aplicación sugiere
+        self.entries = collections.OrderedDict()      # clave -> (huella, duración, alternativas)
+        self.lock = threading.Lock()
+        self.stats = {"aciertos": 0, "aproximados": 0, "fallos": 0, "expulsados": 0}
+        if path:
+            self.load()
+    
+    def fingerprint(self, audio):
+        """Devuelve (clave, huella, duración) o None si no se puede calcular"""
+        if np is None:
+            return None
+        rate = audio.sample_rate
+        samples = np.frombuffer(audio.get_raw_data(convert_width=2), dtype=np.int16).astype(np.float32)
+        ventana = 512
+        paso = 256
+        n_frames = (len(samples) - ventana) // paso + 1
+        if n_frames < self.time_bins:
+            return None
+        
+        # Espectrograma por ventanas y energía en bandas logarítmicas de 100 Hz a 4 kHz
+        indices = np.arange(ventana)[None, :] + paso * np.arange(n_frames)[:, None]
+        espectro = np.abs(np.fft.rfft(samples[indices] * np.hanning(ventana), axis=1)) ** 2
+        frecuencias = np.fft.rfftfreq(ventana, 1.0 / rate)
+        bordes = np.geomspace(100, min(4000, rate / 2), self.bands + 1)
+        bandas = np.stack([espectro[:, (frecuencias >= bordes[i]) & (frecuencias < bordes[i + 1])].sum(axis=1)
+                           for i in range(self.bands)], axis=1)
+        
+        # Recortar el silencio y el ruido de los extremos (20 dB por debajo del pico) para alinear
+        # las frases; el suelo de 30 dB evita que el ruido de fondo cuente como evolución de la banda
+        energia = bandas.sum(axis=1)
+        voz_activa = np.flatnonzero(energia > energia.max() * 1e-2)
+        if len(voz_activa) < self.time_bins:
+            return None
+        bandas = bandas[voz_activa[0]:voz_activa[-1] + 1]
+        log_bandas = np.log(bandas + bandas.max() * 1e-3 + 1e-6)
+        
+        # CMVN por banda: sin media ni varianza propias de cada banda, la forma global
+        # del espectro (voz, micrófono, volumen) deja de dominar y queda la evolución de cada banda
+        log_bandas = (log_bandas - log_bandas.mean(axis=0)) / (log_bandas.std(axis=0) + 1e-3)
+        
+        # Resumir el tiempo en time_bins tramos y añadir las derivadas entre tramos
+        tramos = np.stack([tramo.mean(axis=0) for tramo in np.array_split(log_bandas, self.time_bins)])
+        huella = np.hstack([tramos, np.gradient(tramos, axis=0)])
+        
+        # Cada tramo se normaliza por separado: la similitud es la media de los cosenos tramo a tramo
+        normas = np.linalg.norm(huella, axis=1, keepdims=True)
+        if not normas.all():
+            return None
+        huella = (huella / normas).ravel()
+        clave = np.round(huella * 16).astype(np.int8).tobytes().hex()
+        return clave, huella, len(samples) / rate
+    
+    def similarity(self, huella, otra):
+        """Media de la similitud coseno entre los tramos alineados de dos huellas"""
+        return float(np.dot(huella, otra)) / self.time_bins
+    
+    def lookup(self, huella_info):
+        """Devuelve las alternativas en caché para la huella o None"""
+        clave, huella, duracion = huella_info
+        with self.lock:
+            if clave in self.entries:
+                self.entries.move_to_end(clave)
+                self.stats["aciertos"] += 1
+                return self.entries[clave][2]
+            
+            # Coincidencia cercana: mayor similitud coseno con duración parecida
+            mejor, mejor_clave = self.threshold, None
+            for otra_clave, (otra, otra_duracion, alternativas) in self.entries.items():
+                if abs(otra_duracion - duracion) > self.max_duration_ratio * max(duracion, otra_duracion):
+                    continue
+                similitud = self.similarity(huella, otra)
+                if similitud >= mejor and not self.exact_only(alternativas):
+                    mejor, mejor_clave = similitud, otra_clave
+            if mejor_clave is not None:
+                self.entries.move_to_end(mejor_clave)
+                self.stats["aproximados"] += 1
+                return self.entries[mejor_clave][2]
+            
+            self.stats["fallos"] += 1
+            return None
+    
+    def exact_only(self, alternativas):
+        """Indica si alguna alternativa puede acabar en una orden que nunca se sirve por parecido"""
+        for texto, _ in alternativas:
+            normalizado = self.normalizer.normalize(texto)
+            # Todas las frases del texto cuentan: una orden compuesta se ejecuta entera
+            intents = {self.intent_matcher.frases[c.group(0)][0]
+                       for c in self.intent_matcher.patron.finditer(normalizado)}
+            if not intents:
+                # Sin frase exacta la aplicación busca la orden más parecida ("cerar" -> "cerrar")
+                intents = {intent for confianza, intent, _, _ in self.fuzzy_index.search(normalizado)
+                           if confianza >= self.fuzzy_threshold}
+            if intents & NEAR_MATCH_EXCLUDED_INTENTS:
+                return True
+        return False
+    
+    def store(self, huella_info, alternativas):
+        """Guarda las alternativas y expulsa la entrada menos usada si se llena"""
+        clave, huella, duracion = huella_info
+        with self.lock:
+            self.entries[clave] = (huella, duracion, list(alternativas))
+            self.entries.move_to_end(clave)
+            while len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+                self.stats["expulsados"] += 1
+    
+    def load(self):
+        """Carga la caché guardada; se ignora si no existe o es de otra versión"""
+        if np is None or not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                datos = json.load(f)
+            if datos.get("version") != self.VERSION or datos.get("forma") != [self.time_bins, self.bands]:
+                return
+            with self.lock:
+                for entrada in datos.get("entradas", [])[-self.capacity:]:
+                    huella = np.asarray(entrada["huella"], dtype=np.float64)
+                    alternativas = [tuple(alt) for alt in entrada["alternativas"]]
+                    self.entries[entrada["clave"]] = (huella, entrada["duracion"], alternativas)
+        except Exception as e:
+            print(f"Error al cargar la caché de reconocimiento: {e}")
+    
+    def save(self):
+        """Escribe la caché en disco de forma atómica"""
+        if not self.path:
+            return
+        with self.lock:
+            entradas = [{"clave": clave, "huella": [round(float(v), 5) for v in huella],
+                         "duracion": round(duracion, 3), "alternativas": alternativas}
+                        for clave, (huella, duracion, alternativas) in self.entries.items()]
+        datos = {"version": self.VERSION, "forma": [self.time_bins, self.bands], "entradas": entradas}
+        temporal = self.path + ".tmp"
+        try:
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temporal, self.path)
+        except Exception as e:
+            print(f"Error al guardar la caché de reconocimiento: {e}")
+    
+    def metrics(self):
+        """Devuelve una copia de los contadores y el tamaño actual"""
+        with self.lock:
+            metricas = dict(self.stats)
+            metricas["entradas"] = len(self.entries)
+        consultas = metricas["aciertos"] + metricas["aproximados"] + metricas["fallos"]
+        metricas["tasa_aciertos"] = (metricas["aciertos"] + metricas["aproximados"]) / consultas if consultas else 0.0
+        return metricas
+
+
+class CachedRecognitionBackend:
+    """Envuelve un motor y responde desde la caché cuando el audio ya se reconoció"""
+    def __init__(self, backend, cache):
+        self.backend = backend
+        self.cache = cache
+        self.name = backend.name
+    
+    def recognize(self, audio):
+        return self.recognize_alternatives(audio)[0][0]
+    
+    def recognize_alternatives(self, audio):
+        huella = self.cache.fingerprint(audio)
+        if huella is not None:
+            alternativas = self.cache.lookup(huella)
+            if alternativas is not None:
+                return alternativas
+        alternativas = recognize_alternatives(self.backend, audio)
+        # Solo se guardan transcripciones válidas; los errores se propagan sin cachear
+        if huella is not None and alternativas:
+            self.cache.store(huella, alternativas)
+        return alternativas
+
+
+# Detector de actividad de voz previo al reconocimiento
+class VoiceActivityDetector:
+    """Descarta segmentos sin voz y recorta el silencio con energía y tasa de cruces por cero"""
+    def __init__(self, frame_ms=20, min_speech_ms=200, padding_ms=150, max_zcr=0.4):
+        self.frame_ms = frame_ms            # Duración de cada ventana de análisis
+        self.min_speech_ms = min_speech_ms  # Voz mínima para aceptar el segmento (descarta clics)
+        self.padding_ms = padding_ms        # Margen que se conserva antes y después de la voz
+        self.max_zcr = max_zcr              # Por encima, la ventana se parece más a ruido que a voz
+        self.stats = {"aceptados": 0, "rechazados": 0, "sin_analizar": 0,
+                      "ms_recortados": 0, "ultima_decision": None}
+    
+    def process(self, audio, energy_threshold):
+        """Devuelve el AudioData recortado o None si el segmento no contiene voz"""
+        if np is None:
+            # Sin numpy no se analiza: todo pasa al reconocedor
+            self.stats["sin_analizar"] += 1
+            self.stats["ultima_decision"] = "sin_analizar"
+            return audio
+        
+        raw = audio.get_raw_data(convert_width=2)
+        rate = audio.sample_rate
+        frame_len = max(1, int(rate * self.frame_ms / 1000))
+        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32)
+        n_frames = len(samples) // frame_len
+        if n_frames == 0:
+            return self._reject()
+        
+        # Energía RMS y tasa de cruces por cero de cada ventana en una sola operación
+        frames = samples[:n_frames * frame_len].reshape(n_frames, frame_len)
+        energia = np.sqrt(np.mean(frames * frames, axis=1))
+        signos = np.signbit(frames)
+        zcr = np.mean(signos[:, 1:] != signos[:, :-1], axis=1)
+        es_voz = (energia > energy_threshold) & (zcr < self.max_zcr)
+        
+        indices = np.flatnonzero(es_voz)
+        if len(indices) * self.frame_ms < self.min_speech_ms:
+            return self._reject()
+        
+        # Recortar el silencio inicial y final dejando un pequeño margen
+        margen = int(math.ceil(self.padding_ms / self.frame_ms))
+        inicio = max(0, int(indices[0]) - margen) * frame_len
+        fin = min(n_frames, int(indices[-1]) + 1 + margen) * frame_len
+        if fin >= n_frames * frame_len:
+            fin = len(samples)  # Conservar la cola que no llena una ventana
+        self.stats["aceptados"] += 1
+        self.stats["ms_recortados"] += int((len(samples) - (fin - inicio)) * 1000 / rate)
+        self.stats["ultima_decision"] = "voz"
+        return sr.AudioData(raw[inicio * 2:fin * 2], rate, 2)
+    
+    def _reject(self):
+        self.stats["rechazados"] += 1
+        self.stats["ultima_decision"] = "ruido"
+        return None
+    
+    def metrics(self):
+        """Devuelve una copia de las métricas de decisiones"""
+        return dict(self.stats)
+
+
+# Excepciones del trabajador de reconocimiento
+class RecognitionTimeout(Exception):
+    """La petición de reconocimiento superó su plazo"""
+
+
+class RecognitionBusy(Exception):
+    """Hay demasiadas peticiones de reconocimiento pendientes"""
+
+
+# Trabajador persistente que atiende las peticiones de reconocimiento
+class RecognitionWorker:
+    """Pool persistente de hilos de reconocimiento alimentado por una cola"""
+    def __init__(self, backend, max_workers=2, max_pending=4):
+        self.backend = backend
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reconocimiento")
+        self.max_pending = max_pending    # Peticiones en cola o en curso como máximo
+        self.lock = threading.Lock()
+        self.pendientes = set()           # Futures aún no resueltos
+        self.stats = {"en_curso": 0, "completadas": 0, "abandonadas": 0,
+                      "caducadas": 0, "canceladas": 0, "rechazadas": 0}
+    
+    def recognize(self, audio, timeout=10):
+        """Devuelve las alternativas [(texto, confianza), ...] esperando como máximo timeout segundos"""
+        deadline = time.time() + timeout
+        with self.lock:
+            if self.stats["en_curso"] >= self.max_pending:
+                self.stats["rechazadas"] += 1
+                raise RecognitionBusy()
+            self.stats["en_curso"] += 1
+            future = self.pool.submit(self._recognize, audio, deadline)
+            self.pendientes.add(future)
+        
+        try:
+            return future.result(timeout=max(0.0, deadline - time.time()))
+        except FutureTimeoutError:
+            with self.lock:
+                self.pendientes.discard(future)
+                if future.cancel():
+                    # No llegó a empezar: se libera sin ocupar ningún hilo
+                    self.stats["en_curso"] -= 1
+                    self.stats["canceladas"] += 1
+                else:
+                    # Sigue en curso; su resultado se descartará al terminar
+                    self.stats["abandonadas"] += 1
+            raise RecognitionTimeout()
+    
+    def _recognize(self, audio, deadline):
+        """Cuerpo de cada hilo del pool"""
+        try:
+            if time.time() > deadline:
+                # Se quedó esperando en la cola más que su plazo: no gastar una petición
+                with self.lock:
+                    self.stats["caducadas"] += 1
+                raise RecognitionTimeout()
+            resultado = recognize_alternatives(self.backend, audio)
+            with self.lock:
+                self.stats["completadas"] += 1
+            return resultado
+        finally:
+            with self.lock:
+                self.stats["en_curso"] -= 1
+    
+    def cancel_pending(self):
+        """Cancela las peticiones que aún no han empezado"""
+        with self.lock:
+            for future in list(self.pendientes):
+                if future.cancel():
+                    self.stats["en_curso"] -= 1
+                    self.stats["canceladas"] += 1
+            self.pendientes = {f for f in self.pendientes if not f.done()}
+    
+    def metrics(self):
+        """Devuelve una copia de los contadores"""
+        with self.lock:
+            return dict(self.stats)
+    
+    def shutdown(self):
+        """Cancela lo pendiente y libera el pool sin bloquear"""
+        self.cancel_pending()
+        self.pool.shutdown(wait=False)
+
+
+# Excepción interna para abandonar la captura al pausar o detener la escucha
+class CaptureInterrupted(Exception):
+    """La captura de una frase se interrumpió"""
 
 
 # Clase que maneja el reconocimiento de voz en un hilo separado
@@ -138,13 +1480,39 @@ class SpeechRecognitionThread(QThread):
     # Señales para comunicar resultados y estado
     command_recognized = pyqtSignal(str)  # Se emite cuando se reconoce un comando
     status_message = pyqtSignal(str)      # Se emite para mostrar mensajes de estado
+    calibration_finished = pyqtSignal(float, float)  # Se emite con (ruido de fondo, umbral) al calibrar
     
-    def __init__(self, energy_threshold=3000, parent=None):
+    def __init__(self, energy_threshold=3000, normalizer=None, audio_tap=None, frame_source=None,
+                 backend=None, intent_matcher=None, parent=None):
         super().__init__(parent)
         self.running = False
         
+        # Motor que convierte el audio en texto (Google por defecto) y
+        # trabajador persistente que lo ejecuta con plazos por petición
+        self.backend = backend if backend is not None else GoogleRecognitionBackend()
+        self.recognition_worker = RecognitionWorker(self.backend)
+        
+        # Filtro de actividad de voz: evita enviar toses, clics o ruido al motor
+        self.vad = VoiceActivityDetector()
+        
+        # Copia del audio capturado para el medidor de nivel (mismo stream)
+        self.audio_tap = audio_tap
+        
+        # Captura continua: la fuente escribe en un buffer circular de buffer_seconds
+        self.buffer_seconds = 10
+        self.ring_buffer = None
+        self.read_seq = 0                                    # Siguiente trama a leer del buffer
+        self.capture_thread = None
+        
+        # Normalizador compartido con los comandos escritos
+        self.normalizer = normalizer if normalizer is not None else TextNormalizer()
+        
+        # Resolutor de intenciones para elegir entre las alternativas del motor
+        self.intent_matcher = intent_matcher if intent_matcher is not None else IntentMatcher()
+        
         # Configurar reconocedor de voz con parámetros optimizados
         self.recognizer = sr.Recognizer()
+        self.user_energy_threshold = energy_threshold        # Sensibilidad elegida: el umbral nunca baja de ella
         self.recognizer.energy_threshold = energy_threshold  # Sensibilidad del micrófono
         self.recognizer.dynamic_energy_threshold = True      # Ajuste automático de sensibilidad
         self.recognizer.dynamic_energy_adjustment_damping = 0.15  # Ajuste más suave
@@ -155,23 +1523,30 @@ class SpeechRecognitionThread(QThread):
         self.recognizer.non_speaking_duration = 0.8          # Duración de silencio para completar frase
         
         self.pause_processing = False                        # Bandera para pausar procesamiento
-        self.last_adjustment_time = 0                        # Control de ajustes de ruido ambiente
+        
+        # Estimación continua del ruido de fondo (media móvil exponencial sobre
+        # las tramas sin voz); el umbral se deriva de ella sin pausar la escucha,
+        # pero solo puede subir por encima de la sensibilidad elegida por el usuario
+        self.noise_floor = None
+        self.noise_frames = 0                                # Tramas de ruido acumuladas
+        self.noise_time_constant = 2.0                       # Segundos de memoria de la media
+        self.noise_max_speech = 10.0                         # Voz continua que se reinterpreta como ruido
+        self.speech_run = 0                                  # Tramas seguidas por encima del umbral
+        self.min_energy_threshold = 100                      # Umbral mínimo para no disparar con silencio
+        self.calibration_remaining = None                    # Segundos pendientes de una calibración manual
+        self.calibration_energies = []
         self.consecutive_errors = 0                          # Contador de errores consecutivos
         self.max_consecutive_errors = 5                      # Máximo de errores antes de reset
         
         # Configurar micrófono con el mejor dispositivo disponible
         self.microphone = None
-        self.setup_microphone()
+        if frame_source is None:
+            self.setup_microphone()
+            frame_source = MicrophoneFrameSource(self.microphone)
+        self.frame_source = frame_source
         
         # Lista de frases alternativas para mejor reconocimiento
-        self.alternate_phrases = {
-            'ejecutar': ['ejecutar', 'correr', 'lanzar', 'iniciar'],
-            'listar': ['listar', 'mostrar', 'ver', 'enseñar'],
-            'crear': ['crear', 'hacer', 'generar', 'nuevo'],
-            'eliminar': ['eliminar', 'borrar', 'quitar', 'suprimir'],
-            'abrir': ['abrir', 'ejecutar', 'lanzar'],
-            'salir': ['salir', 'cerrar', 'terminar', 'finalizar', 'adiós', 'adios']
-        }
+        self.alternate_phrases = COMMAND_SYNONYMS
     
     def setup_microphone(self):
         """Configura el micrófono con el mejor dispositivo disponible"""
@@ -202,8 +1577,10 @@ class SpeechRecognitionThread(QThread):
             self.microphone = sr.Microphone()
     
     def set_energy_threshold(self, value):
-        """Actualiza el umbral de energía (sensibilidad) del reconocedor"""
+        """Actualiza la sensibilidad elegida; el ruido de fondo solo puede subir el umbral por encima de ella"""
+        self.user_energy_threshold = value
         self.recognizer.energy_threshold = value
+        self._apply_noise_floor()
     
     def pause(self):
         """Pausa temporalmente el procesamiento de comandos"""
@@ -219,7 +1596,7 @@ class SpeechRecognitionThread(QThread):
         try:
             # Reconfigurar el reconocedor con valores seguros
             self.recognizer = sr.Recognizer()
-            self.recognizer.energy_threshold = 3000
+            self.recognizer.energy_threshold = self.user_energy_threshold
             self.recognizer.dynamic_energy_threshold = True
             self.recognizer.dynamic_energy_adjustment_damping = 0.15
             self.recognizer.dynamic_energy_ratio = 1.5
@@ -227,345 +1604,2342 @@ class SpeechRecognitionThread(QThread):
             self.recognizer.phrase_threshold = 0.3
             self.recognizer.non_speaking_duration = 0.8
             self.consecutive_errors = 0
+            self.noise_floor = None  # Volver a estimar el ruido desde cero
+            self.noise_frames = 0
+            self.speech_run = 0
             self.status_message.emit("Reconocedor reiniciado")
         except Exception as e:
             self.status_message.emit(f"Error al reiniciar reconocedor: {e}")
     
     def process_recognized_text(self, texto):
         """Procesa y mejora el texto reconocido"""
-        texto_limpio = texto.lower().strip()
-        
-        # Reemplazar palabras mal reconocidas con alternativas comunes
-        replacements = {
-            'ejecuta': 'ejecutar',
-            'ejecutate': 'ejecutar',
-            'lista': 'listar',
-            'listado': 'listar',
-            'muestra': 'mostrar',
-            'muestrame': 'mostrar',
-            'crea': 'crear',
-            'elimina': 'eliminar',
-            'borra': 'borrar',
-            'abre': 'abrir',
-            'sal': 'salir',
-            'sierra': 'cerrar',
-            'correr': 'ejecutar',
-            'enseñar': 'mostrar',
-            'enseña': 'mostrar',
-            'hora actual': 'hora',
-            'que hora es': 'qué hora es',
-            'fecha actual': 'fecha',
-            'que dia es': 'qué día es',
-            'que fecha es': 'qué fecha es',
-            'informacion': 'información',
-            'informacion del sistema': 'información del sistema',
-            'carpetas': 'carpeta',
-            'archivos': 'archivo',
-            'directorio actual': 'directorio actual',
-            'donde estoy': 'dónde estoy',
-            'navegar': 'abrir navegador',
-            'browser': 'navegador',
-            'internet': 'abrir navegador',
-            'web': 'abrir navegador',
-            'busca': 'buscar',
-            'buscame': 'buscar',
-            'procesos': 'mostrar procesos',
-            'ram': 'memoria',
-            'memoria ram': 'memoria',
-            'espacio': 'uso de disco',
-            'red': 'conexiones de red',
-            'conexión': 'conexiones de red',
-            'ayudar': 'ayuda',
-            'auxilio': 'ayuda',
-            'comandos disponibles': 'comandos',
-            'que puedo hacer': 'qué puedo hacer',
-            'que comandos': 'comandos'
-        }
-        
-        for wrong, correct in replacements.items():
-            texto_limpio = texto_limpio.replace(wrong, correct)
-        
-        return texto_limpio
+        return self.normalizer.normalize(texto)
     
-    def run(self):
-        """Método principal que ejecuta el reconocimiento de voz"""
-        self.running = True
-        self.consecutive_errors = 0
-        calibration_needed = True
-        
+    def choose_alternative(self, alternativas):
+        """Normaliza todas las alternativas y devuelve (texto, índice) de la que mejor encaja con un comando"""
+        normalizadas = [(self.process_recognized_text(texto), confianza) for texto, confianza in alternativas]
+        texto, _, _, indice = self.intent_matcher.select(normalizadas)
+        return texto, indice
+    
+    def _capture_loop(self):
+        """Lee la fuente sin interrupciones y escribe en el buffer circular"""
+        ring_buffer = self.ring_buffer
         while self.running:
-            # Si está pausado, esperar un momento y continuar
-            if self.pause_processing:
+            try:
+                data = self.frame_source.read()
+            except Exception as e:
+                # Errores al acceder al micrófono: cerrar y reabrir en la siguiente lectura
+                self.status_message.emit(f"Error de micrófono: {str(e)[:50]}")
+                try:
+                    self.frame_source.close()
+                except Exception:
+                    pass
+                time.sleep(1)
+                continue
+            if not data:
+                break  # La fuente terminó (por ejemplo, fin del archivo WAV)
+            ring_buffer.write(data)
+            self._track_noise(data)
+            if self.audio_tap is not None:
+                self.audio_tap.push(data, self.frame_source.sample_rate, self.frame_source.sample_width)
+        ring_buffer.close()
+        try:
+            self.frame_source.close()
+        except Exception as e:
+            print(f"Error al cerrar la fuente de audio: {e}")
+    
+    def _next_frame(self):
+        """Devuelve la siguiente trama del buffer o lanza CaptureInterrupted"""
+        while True:
+            if not self.running or self.pause_processing:
+                raise CaptureInterrupted()
+            trama, self.read_seq = self.ring_buffer.read(self.read_seq, timeout=0.2)
+            if trama is None:
+                continue
+            if trama == b"":
+                self.running = False  # No habrá más audio
+                raise CaptureInterrupted()
+            return trama
+    
+    def _apply_noise_floor(self):
+        """Deriva el umbral de energía del ruido de fondo estimado, sin bajar de la sensibilidad del usuario"""
+        if self.noise_floor is not None and self.recognizer.dynamic_energy_threshold:
+            self.recognizer.energy_threshold = max(self.min_energy_threshold, self.user_energy_threshold,
+                                                   self.noise_floor * self.recognizer.dynamic_energy_ratio)
+    
+    def _track_noise(self, data):
+        """Actualiza el ruido de fondo con cada trama capturada (hilo de captura)"""
+        fuente = self.frame_source
+        seconds_per_frame = fuente.chunk_size / fuente.sample_rate
+        energia = frame_rms(data, fuente.sample_width)
+        
+        # Calibración manual: medir el silencio solicitado y fijar el ruido directamente
+        if self.calibration_remaining is not None:
+            self.calibration_energies.append(energia)
+            self.calibration_remaining -= seconds_per_frame
+            if self.calibration_remaining <= 0:
+                energias = self.calibration_energies
+                self.noise_floor = sum(energias) / len(energias)
+                self.noise_frames = len(energias)
+                self.speech_run = 0
+                self.calibration_remaining = None
+                self.calibration_energies = []
+                self._apply_noise_floor()
+                self.calibration_finished.emit(self.noise_floor, self.recognizer.energy_threshold)
+            return
+        
+        # Las tramas con voz no cuentan, salvo que la "voz" dure demasiado:
+        # entonces es un cambio de ruido ambiente y el umbral debe subir
+        if self.noise_floor is not None and energia > self.recognizer.energy_threshold:
+            self.speech_run += 1
+            if self.speech_run * seconds_per_frame < self.noise_max_speech:
+                return
+        else:
+            self.speech_run = 0
+        
+        # Al arrancar se usa la media simple para converger rápido
+        self.noise_frames += 1
+        alpha = max(1 - math.exp(-seconds_per_frame / self.noise_time_constant), 1.0 / self.noise_frames)
+        if self.noise_floor is None:
+            self.noise_floor = energia
+        else:
+            self.noise_floor += alpha * (energia - self.noise_floor)
+        self._apply_noise_floor()
+    
+    def request_calibration(self, duration=1.5):
+        """Mide el ruido de fondo durante duration segundos sin dejar de escuchar"""
+        self.calibration_energies = []
+        self.calibration_remaining = duration
+    
+    def capture_utterance(self, timeout=3, phrase_time_limit=8):
+        """Extrae la siguiente frase del buffer circular (equivalente a Recognizer.listen)"""
+        r = self.recognizer
+        fuente = self.frame_source
+        ancho = fuente.sample_width
+        seconds_per_frame = fuente.chunk_size / fuente.sample_rate
+        pause_frames = int(math.ceil(r.pause_threshold / seconds_per_frame))
+        phrase_frames = int(math.ceil(r.phrase_threshold / seconds_per_frame))
+        non_speaking_frames = int(math.ceil(r.non_speaking_duration / seconds_per_frame))
+        limite_frames = int(math.ceil(phrase_time_limit / seconds_per_frame)) if phrase_time_limit else None
+        esperado = 0.0
+        
+        while True:
+            # Esperar el inicio de la voz conservando el audio previo
+            previas = collections.deque(maxlen=non_speaking_frames)
+            while True:
+                trama = self._next_frame()
+                esperado += seconds_per_frame
+                if timeout and esperado > timeout:
+                    raise sr.WaitTimeoutError("listening timed out while waiting for phrase to start")
+                previas.append(trama)
+                # El umbral lo mantiene actualizado el hilo de captura
+                if frame_rms(trama, ancho) > r.energy_threshold:
+                    break
+            
+            # Acumular hasta una pausa suficientemente larga o el límite de la frase
+            tramas = list(previas)
+            con_voz = 1
+            pausa = 0
+            while True:
+                trama = self._next_frame()
+                tramas.append(trama)
+                if frame_rms(trama, ancho) > r.energy_threshold:
+                    pausa = 0
+                    con_voz += 1
+                else:
+                    pausa += 1
+                if pausa > pause_frames:
+                    break
+                if limite_frames and len(tramas) - len(previas) >= limite_frames:
+                    break
+            
+            # Ruidos demasiado cortos no cuentan como frase
+            if con_voz >= phrase_frames:
+                break
+        
+        # Conservar solo non_speaking_duration de silencio al final
+        sobrante = max(0, pausa - non_speaking_frames)
+        if sobrante:
+            tramas = tramas[:-sobrante]
+        return sr.AudioData(b"".join(tramas), fuente.sample_rate, ancho)
+    
+    def run(self):
+        """Método principal que ejecuta el reconocimiento de voz"""
+        self.running = True
+        self.consecutive_errors = 0
+        self.calibration_remaining = None
+        
+        # El micrófono queda abierto y escribe en el buffer circular sin huecos
+        self.status_message.emit("Preparando micrófono...")
+        fuente = self.frame_source
+        frame_bytes = fuente.chunk_size * fuente.sample_width * fuente.channels
+        capacidad = int(math.ceil(self.buffer_seconds * fuente.sample_rate / fuente.chunk_size))
+        self.ring_buffer = AudioRingBuffer(frame_bytes, capacidad)
+        self.read_seq = 0
+        self.capture_thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.capture_thread.start()
+        
+        while self.running:
+            # Si está pausado, descartar el audio acumulado y esperar
+            if self.pause_processing:
+                self.read_seq = self.ring_buffer.write_seq
                 time.sleep(0.2)
                 continue
                 
             try:
-                # Usar el micrófono configurado
-                with self.microphone as source:
-                    self.status_message.emit("Preparando micrófono...")
+                self.status_message.emit("Escuchando...")
+                
+                try:
+                    # Configurar timeouts más robustos
+                    audio = self.capture_utterance(
+                        timeout=3,          # Timeout para comenzar a hablar (reducido)
+                        phrase_time_limit=8  # Tiempo máximo para una frase (aumentado)
+                    )
                     
-                    # Calibración inicial o después de errores
-                    current_time = time.time()
-                    if (calibration_needed or 
-                        current_time - self.last_adjustment_time > 30 or 
-                        self.consecutive_errors >= 3):
-                        
-                        self.status_message.emit("Calibrando micrófono...")
-                        try:
-                            # Ajuste más agresivo para ruido ambiente
-                            self.recognizer.adjust_for_ambient_noise(source, duration=1.5)
-                            self.last_adjustment_time = current_time
-                            calibration_needed = False
-                            self.status_message.emit("Calibración completada")
-                        except Exception as e:
-                            self.status_message.emit(f"Error en calibración: {e}")
+                    # Verificar si se debe pausar el procesamiento
+                    if self.pause_processing or not self.running:
+                        continue
                     
-                    self.status_message.emit("Escuchando...")
+                    # Descartar segmentos sin voz y recortar silencios antes de reconocer
+                    audio = self.vad.process(audio, self.recognizer.energy_threshold)
+                    if audio is None:
+                        self.status_message.emit("Ruido descartado")
+                        continue
+                        
+                    # Reconocer el texto del audio con timeout
+                    self.status_message.emit("Procesando...")
                     
+                    # El trabajador persistente aplica el plazo de 10 segundos
                     try:
-                        # Configurar timeouts más robustos
-                        audio = self.recognizer.listen(
-                            source, 
-                            timeout=3,          # Timeout para comenzar a hablar (reducido)
-                            phrase_time_limit=8  # Tiempo máximo para una frase (aumentado)
-                        )
-                        
-                        # Verificar si se debe pausar el procesamiento
-                        if self.pause_processing or not self.running:
-                            continue
-                            
-                        # Reconocer el texto del audio con timeout
-                        self.status_message.emit("Procesando...")
-                        
-                        # Usar threading para evitar bloqueos en el reconocimiento
-                        import threading
-                        recognition_result = [None]
-                        recognition_error = [None]
-                        
-                        def recognize_audio():
-                            try:
-                                texto = self.recognizer.recognize_google(
-                                    audio, 
-                                    language="es-ES",
-                                    show_all=False  # Solo el mejor resultado
-                                )
-                                recognition_result[0] = texto
-                            except Exception as e:
-                                recognition_error[0] = e
-                        
-                        # Ejecutar reconocimiento en hilo separado con timeout
-                        recognition_thread = threading.Thread(target=recognize_audio)
-                        recognition_thread.daemon = True
-                        recognition_thread.start()
-                        recognition_thread.join(timeout=10)  # Timeout de 10 segundos para reconocimiento
-                        
-                        if recognition_thread.is_alive():
-                            # Si el hilo sigue vivo, hay un timeout
-                            self.status_message.emit("Timeout en reconocimiento")
-                            self.consecutive_errors += 1
-                            continue
-                        
-                        if recognition_error[0]:
-                            raise recognition_error[0]
-                        
-                        if recognition_result[0]:
-                            # Procesar y limpiar el texto reconocido
-                            texto_procesado = self.process_recognized_text(recognition_result[0])
-                            
-                            # Verificar nuevamente antes de emitir el comando
-                            if not self.pause_processing and self.running and texto_procesado.strip():
-                                self.command_recognized.emit(texto_procesado)
-                                self.consecutive_errors = 0  # Reset contador tras éxito
-                                self.status_message.emit("Comando reconocido")
-                            
-                    except sr.WaitTimeoutError:
-                        # Timeout normal al esperar audio - no es un error
-                        self.status_message.emit("Esperando comando...")
-                        time.sleep(0.1)
-                        
-                    except sr.UnknownValueError:
-                        # No se pudo entender lo que se dijo
+                        alternativas = self.recognition_worker.recognize(audio, timeout=10)
+                    except RecognitionTimeout:
+                        self.status_message.emit("Timeout en reconocimiento")
                         self.consecutive_errors += 1
-                        if self.consecutive_errors <= 2:
-                            self.status_message.emit("No se entendió - intenta de nuevo")
-                        else:
-                            self.status_message.emit("Habla más claro y despacio")
-                        time.sleep(0.5)
-                        
-                    except sr.RequestError as e:
-                        # Error de conexión al servicio de reconocimiento
-                        self.consecutive_errors += 1
-                        self.status_message.emit(f"Error de conexión: Verifique internet")
-                        time.sleep(2)  # Esperar más tiempo en errores de red
+                        continue
+                    except RecognitionBusy:
+                        self.status_message.emit("Reconocedor ocupado - intenta de nuevo")
+                        continue
+                    
+                    if alternativas:
+                        # Elegir entre las transcripciones la que corresponde a un comando
+                        texto_procesado, indice = self.choose_alternative(alternativas)
                         
-                    except Exception as e:
-                        # Otros errores durante el reconocimiento
-                        self.consecutive_errors += 1
-                        self.status_message.emit(f"Error en reconocimiento: {str(e)[:50]}")
-                        time.sleep(1)
+                        # Verificar nuevamente antes de emitir el comando
+                        if not self.pause_processing and self.running and texto_procesado.strip():
+                            self.command_recognized.emit(texto_procesado)
+                            self.consecutive_errors = 0  # Reset contador tras éxito
+                            if indice > 0:
+                                self.status_message.emit(f"Comando reconocido (alternativa {indice + 1})")
+                            else:
+                                self.status_message.emit("Comando reconocido")
                         
+                except CaptureInterrupted:
+                    # Escucha pausada o detenida mientras se esperaba una frase
+                    continue
+                    
+                except sr.WaitTimeoutError:
+                    # Timeout normal al esperar audio - no es un error
+                    self.status_message.emit("Esperando comando...")
+                    
+                except sr.UnknownValueError:
+                    # No se pudo entender lo que se dijo
+                    self.consecutive_errors += 1
+                    if self.consecutive_errors <= 2:
+                        self.status_message.emit("No se entendió - intenta de nuevo")
+                    else:
+                        self.status_message.emit("Habla más claro y despacio")
+                    time.sleep(0.5)
+                    
+                except sr.RequestError as e:
+                    # Error de conexión al servicio de reconocimiento
+                    self.consecutive_errors += 1
+                    self.status_message.emit(f"Error de conexión: Verifique internet")
+                    time.sleep(2)  # Esperar más tiempo en errores de red
+                    
+                except Exception as e:
+                    # Otros errores durante el reconocimiento
+                    self.consecutive_errors += 1
+                    self.status_message.emit(f"Error en reconocimiento: {str(e)[:50]}")
+                    time.sleep(1)
+                    
             except Exception as e:
-                # Errores al acceder al micrófono
+                # Errores inesperados en el ciclo de escucha
                 self.consecutive_errors += 1
-                self.status_message.emit(f"Error de micrófono: {str(e)[:50]}")
+                self.status_message.emit(f"Error de escucha: {str(e)[:50]}")
                 time.sleep(1)
             
             # Reiniciar reconocedor si hay demasiados errores consecutivos
             if self.consecutive_errors >= self.max_consecutive_errors:
                 self.status_message.emit("Demasiados errores - reiniciando...")
                 self.reset_recognizer()
-                calibration_needed = True
                 time.sleep(2)
-                
-            # Pequeña pausa entre ciclos para no sobrecargar el sistema
-            if self.running:
-                time.sleep(0.1) 
+        
+        # Al salir, esperar a que la captura libere el micrófono
+        self.running = False
+        if self.capture_thread is not None:
+            self.capture_thread.join(timeout=1)
     
     def stop(self):
         """Detiene el hilo de reconocimiento de voz"""
         self.running = False
+        self.recognition_worker.cancel_pending()
         self.wait(1000)  # Esperar hasta 1 segundo para terminar
 
 
+# Consultas del sistema resueltas dentro del proceso, sin lanzar un shell.
+# Usan psutil si está instalado; si no, /proc en Linux o la API de Windows.
+# Lanzan NativeQueryUnavailable cuando no hay forma nativa y se debe usar el comando.
+class NativeQueryUnavailable(Exception):
+    """La consulta no se puede resolver en Python en este sistema"""
+
+
+def format_bytes(cantidad):
+    """Tamaño en unidades legibles, como free -h o df -h"""
+    for unidad in ("B", "K", "M", "G", "T"):
+        if abs(cantidad) < 1024 or unidad == "T":
+            return f"{cantidad:.0f}{unidad}" if unidad == "B" else f"{cantidad:.1f}{unidad}"
+        cantidad /= 1024
+
+
+def format_table(columnas, filas):
+    """Tabla compacta: columnas es una lista de (título, alineación '<' o '>')"""
+    anchos = [len(titulo) for titulo, _ in columnas]
+    filas = [[str(valor) for valor in fila] for fila in filas]
+    for fila in filas:
+        for i, valor in enumerate(fila):
+            anchos[i] = max(anchos[i], len(valor))
+    
+    def linea(valores):
+        return "  ".join(f"{valor:{alineacion}{ancho}}" for valor, (_, alineacion), ancho
+                         in zip(valores, columnas, anchos)).rstrip()
+    return "\n".join([linea([titulo for titulo, _ in columnas])] + [linea(fila) for fila in filas])
+
+
+def format_metrics(grupos):
+    """Tabla de métricas a partir de [(componente, {métrica: valor}), ...]"""
+    filas = []
+    for componente, metricas in grupos:
+        for i, (clave, valor) in enumerate(metricas.items()):
+            if isinstance(valor, float):
+                valor = f"{valor:.2f}"
+            elif valor is None:
+                valor = "-"
+            filas.append([componente if i == 0 else "", clave, valor])
+    return format_table([("Componente", "<"), ("Métrica", "<"), ("Valor", ">")], filas)
+
+
+def parse_meminfo(texto):
+    """Memoria a partir del contenido de /proc/meminfo (valores en kB)"""
+    valores = {}
+    for linea in texto.splitlines():
+        clave, _, resto = linea.partition(":")
+        if resto.split():
+            valores[clave] = int(resto.split()[0]) * 1024
+    disponible = valores.get("MemAvailable",
+                             valores["MemFree"] + valores.get("Buffers", 0) + valores.get("Cached", 0))
+    return {"total": valores["MemTotal"], "usada": valores["MemTotal"] - disponible,
+            "disponible": disponible, "swap_total": valores.get("SwapTotal", 0),
+            "swap_usada": valores.get("SwapTotal", 0) - valores.get("SwapFree", 0)}
+
+
+def collect_memory():
+    """Devuelve total, usada, disponible, swap_total y swap_usada en bytes"""
+    if psutil is not None:
+        memoria = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        return {"total": memoria.total, "usada": memoria.total - memoria.available,
+                "disponible": memoria.available, "swap_total": swap.total, "swap_usada": swap.used}
+    if os.path.exists("/proc/meminfo"):
+        with open("/proc/meminfo") as f:
+            return parse_meminfo(f.read())
+    if platform.system() == "Windows":
+        import ctypes
+        
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+        
+        estado = MEMORYSTATUSEX()
+        estado.dwLength = ctypes.sizeof(estado)
+        if not ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(estado)):
+            raise NativeQueryUnavailable()
+        # El archivo de paginación incluye la memoria física
+        swap_total = max(0, estado.ullTotalPageFile - estado.ullTotalPhys)
+        swap_usada = max(0, (estado.ullTotalPageFile - estado.ullAvailPageFile)
+                         - (estado.ullTotalPhys - estado.ullAvailPhys))
+        return {"total": estado.ullTotalPhys, "usada": estado.ullTotalPhys - estado.ullAvailPhys,
+                "disponible": estado.ullAvailPhys, "swap_total": swap_total, "swap_usada": swap_usada}
+    raise NativeQueryUnavailable()
+
+
+# Sistemas de archivos de /proc/mounts que se muestran aunque no vengan de /dev
+DISK_FILESYSTEMS = {"overlay", "zfs", "btrfs", "nfs", "nfs4", "cifs", "smbfs", "fuseblk", "9p", "drvfs"}
+
+
+def parse_mounts(texto):
+    """Puntos de montaje de unidades reales a partir de /proc/mounts, uno por dispositivo"""
+    puntos = []
+    dispositivos = set()
+    for linea in texto.splitlines():
+        dispositivo, punto, tipo = linea.split()[:3]
+        if (dispositivo.startswith("/dev/") or tipo in DISK_FILESYSTEMS) and dispositivo not in dispositivos:
+            dispositivos.add(dispositivo)
+            puntos.append(punto.replace("\\040", " "))  # /proc/mounts escapa los espacios
+    return puntos
+
+
+def collect_disks():
+    """Devuelve una lista de unidades con punto, total, usado y libre en bytes"""
+    puntos = []
+    if psutil is not None:
+        puntos = [particion.mountpoint for particion in psutil.disk_partitions(all=False)]
+    elif os.path.exists("/proc/mounts"):
+        with open("/proc/mounts") as f:
+            puntos = parse_mounts(f.read())
+    elif platform.system() == "Windows":
+        puntos = [f"{letra}:\\" for letra in "ABCDEFGHIJKLMNOPQRSTUVWXYZ" if os.path.exists(f"{letra}:\\")]
+    else:
+        puntos = ["/"]
+    
+    unidades = []
+    for punto in puntos:
+        try:
+            uso = shutil.disk_usage(punto)
+        except OSError:
+            continue  # Unidad sin medio o sin permisos
+        if uso.total:
+            unidades.append({"punto": punto, "total": uso.total, "usado": uso.used, "libre": uso.free})
+    return unidades
+
+
+def parse_proc_stat(datos, tick, pagina):
+    """pid, nombre, rss y tiempo de CPU de una línea de /proc/<pid>/stat"""
+    # El nombre va entre paréntesis y puede contener espacios y paréntesis
+    nombre = datos[datos.index("(") + 1:datos.rindex(")")]
+    campos = datos[datos.rindex(")") + 2:].split()
+    return {"pid": int(datos[:datos.index("(")]), "rss": int(campos[21]) * pagina,
+            "cpu": (int(campos[11]) + int(campos[12])) / tick, "nombre": nombre}
+
+
+def collect_processes(limite=30):
+    """Devuelve (total, procesos) con los limite procesos que más memoria usan"""
+    procesos = []
+    if psutil is not None:
+        for proceso in psutil.process_iter(["pid", "name", "username", "memory_info", "cpu_times"]):
+            info = proceso.info
+            memoria = info["memory_info"].rss if info["memory_info"] else 0
+            tiempos = info["cpu_times"]
+            procesos.append({"pid": info["pid"], "usuario": info["username"] or "?", "rss": memoria,
+                             "cpu": (tiempos.user + tiempos.system) if tiempos else 0.0,
+                             "nombre": info["name"] or "?"})
+    elif os.path.isdir("/proc") and os.path.exists("/proc/self/stat"):
+        import pwd
+        tick = os.sysconf("SC_CLK_TCK")
+        pagina = os.sysconf("SC_PAGE_SIZE")
+        usuarios = {}
+        for entrada in os.scandir("/proc"):
+            if not entrada.name.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entrada.name}/stat", "rb") as f:
+                    datos = f.read().decode("utf-8", "replace")
+                uid = entrada.stat().st_uid
+            except OSError:
+                continue  # El proceso terminó mientras se leía
+            if uid not in usuarios:
+                try:
+                    usuarios[uid] = pwd.getpwuid(uid).pw_name
+                except KeyError:
+                    usuarios[uid] = str(uid)
+            proceso = parse_proc_stat(datos, tick, pagina)
+            proceso["usuario"] = usuarios[uid]
+            procesos.append(proceso)
+    else:
+        raise NativeQueryUnavailable()
+    procesos.sort(key=lambda p: p["rss"], reverse=True)
+    return len(procesos), procesos[:limite]
+
+
+# Estados TCP tal como aparecen en /proc/net/tcp
+TCP_STATES = {"01": "ESTABLISHED", "02": "SYN_SENT", "03": "SYN_RECV", "04": "FIN_WAIT1",
+              "05": "FIN_WAIT2", "06": "TIME_WAIT", "07": "CLOSE", "08": "CLOSE_WAIT",
+              "09": "LAST_ACK", "0A": "LISTEN", "0B": "CLOSING"}
+
+
+def _proc_net_address(texto):
+    """Convierte una dirección hexadecimal de /proc/net ("0100007F:0035") en "127.0.0.1:53" """
+    direccion, puerto = texto.split(":")
+    crudo = bytes.fromhex(direccion)
+    # Cada palabra de 32 bits está en el orden de bytes del host (little endian)
+    crudo = b"".join(crudo[i:i + 4][::-1] for i in range(0, len(crudo), 4))
+    familia = socket.AF_INET if len(crudo) == 4 else socket.AF_INET6
+    ip = socket.inet_ntop(familia, crudo)
+    return f"[{ip}]:{int(puerto, 16)}" if familia == socket.AF_INET6 else f"{ip}:{int(puerto, 16)}"
+
+
+def parse_proc_net(texto, proto):
+    """Conexiones de una tabla de /proc/net ("tcp", "tcp6", "udp" o "udp6")"""
+    conexiones = []
+    for linea in texto.splitlines()[1:]:  # La primera es la cabecera
+        campos = linea.split()
+        if len(campos) < 4:
+            continue
+        estado = TCP_STATES.get(campos[3], "") if proto.startswith("tcp") else ""
+        conexiones.append({"proto": proto, "local": _proc_net_address(campos[1]),
+                           "remoto": _proc_net_address(campos[2]), "estado": estado})
+    return conexiones
+
+
+def collect_connections():
+    """Devuelve las conexiones TCP/UDP con protocolo, local, remoto y estado"""
+    conexiones = []
+    if psutil is not None:
+        try:
+            lista = psutil.net_connections(kind="inet")
+        except psutil.AccessDenied:
+            raise NativeQueryUnavailable()  # macOS necesita privilegios: usar netstat
+        for c in lista:
+            proto = ("tcp" if c.type == socket.SOCK_STREAM else "udp") + ("6" if c.family == socket.AF_INET6 else "")
+            local = f"{c.laddr.ip}:{c.laddr.port}" if c.laddr else ""
+            remoto = f"{c.raddr.ip}:{c.raddr.port}" if c.raddr else ""
+            conexiones.append({"proto": proto, "local": local, "remoto": remoto,
+                               "estado": c.status if c.status != "NONE" else ""})
+        return conexiones
+    if os.path.exists("/proc/net/tcp"):
+        for proto in ("tcp", "tcp6", "udp", "udp6"):
+            try:
+                with open(f"/proc/net/{proto}") as f:
+                    conexiones.extend(parse_proc_net(f.read(), proto))
+            except OSError:
+                continue  # Sin IPv6, por ejemplo
+        return conexiones
+    raise NativeQueryUnavailable()
+
+
+def system_report(consulta):
+    """Texto con la tabla de la consulta "memoria", "disco", "procesos" o "red" """
+    if consulta == "memoria":
+        datos = collect_memory()
+        filas = [["Memoria", format_bytes(datos["total"]), format_bytes(datos["usada"]),
+                  format_bytes(datos["disponible"]), f"{datos['usada'] / datos['total']:.0%}"]]
+        if datos["swap_total"]:
+            filas.append(["Swap", format_bytes(datos["swap_total"]), format_bytes(datos["swap_usada"]),
+                          format_bytes(datos["swap_total"] - datos["swap_usada"]),
+                          f"{datos['swap_usada'] / datos['swap_total']:.0%}"])
+        return format_table([("", "<"), ("Total", ">"), ("Usada", ">"), ("Libre", ">"), ("Uso", ">")], filas)
+    if consulta == "disco":
+        filas = [[u["punto"], format_bytes(u["total"]), format_bytes(u["usado"]), format_bytes(u["libre"]),
+                  f"{u['usado'] / u['total']:.0%}"] for u in collect_disks()]
+        return format_table([("Unidad", "<"), ("Total", ">"), ("Usado", ">"), ("Libre", ">"), ("Uso", ">")], filas)
+    if consulta == "procesos":
+        total, procesos = collect_processes()
+        filas = [[p["pid"], p["usuario"], format_bytes(p["rss"]), f"{p['cpu']:.1f}s", p["nombre"]] for p in procesos]
+        tabla = format_table([("PID", ">"), ("Usuario", "<"), ("Memoria", ">"), ("CPU", ">"), ("Nombre", "<")], filas)
+        return f"{tabla}\n{len(procesos)} de {total} procesos (ordenados por memoria)"
+    if consulta == "red":
+        conexiones = collect_connections()
+        # Primero las conexiones activas y al final los puertos a la escucha
+        orden = {"ESTABLISHED": 0, "LISTEN": 2}
+        conexiones.sort(key=lambda c: (orden.get(c["estado"], 1), c["proto"], c["local"]))
+        limite = 50
+        filas = [[c["proto"], c["local"], c["remoto"], c["estado"]] for c in conexiones[:limite]]
+        tabla = format_table([("Proto", "<"), ("Local", "<"), ("Remoto", "<"), ("Estado", "<")], filas)
+        if len(conexiones) > limite:
+            tabla += f"\n... y {len(conexiones) - limite} conexiones más"
+        return tabla or "Sin conexiones"
+    raise ValueError(f"Consulta desconocida: {consulta}")
+
+
+# Shell persistente que conserva cd, export y variables entre comandos
+class ShellSession:
+    """Un único bash (o cmd en Windows) alimentado por stdin. Cada comando termina con
+    una línea centinela en stdout (con el código de salida y el directorio del shell)
+    y otra en stderr"""
+    
+    def __init__(self, shell=None, startup_timeout=5):
+        self.windows = platform.system() == "Windows"
+        if shell is None:
+            if self.windows:
+                shell = ["cmd.exe", "/Q", "/D", "/K", "echo off"]  # Sin eco ni prompt
+            else:
+                bash = shutil.which("bash")
+                shell = [bash, "--noprofile", "--norc"] if bash else ["/bin/sh"]
+        self.shell = shell
+        self.startup_timeout = startup_timeout
+        self.sentinel = f"__VOZ_FIN_{os.urandom(8).hex()}__"
+        
+        # El llamador toma lock durante todo el comando: el shell ejecuta uno a la vez
+        self.lock = threading.Lock()
+        self.proceso = None
+        self.destino = None      # Cola del comando en curso
+        self.returncode = None   # Código leído de la centinela de stdout
+        self.cwd = None          # Última ruta de trabajo pedida
+        self.pwd = None          # Directorio real del shell tras el último comando (cd lo cambia)
+        self.spawns = 0          # Veces que se ha (re)iniciado el shell
+    
+    def alive(self):
+        return self.proceso is not None and self.proceso.poll() is None
+    
+    def spawn(self, cwd):
+        """Arranca el shell y espera a que responda para descartar su cabecera"""
+        self.close()
+        self.proceso = subprocess.Popen(
+            self.shell,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+            bufsize=1,
+            cwd=cwd,
+            creationflags=subprocess.CREATE_NO_WINDOW if self.windows else 0,
+            start_new_session=not self.windows  # Grupo propio para poder matar sus hijos
+        )
+        self.cwd = cwd
+        self.pwd = cwd
+        self.spawns += 1
+        for tuberia, tipo in ((self.proceso.stdout, "normal"), (self.proceso.stderr, "error")):
+            lector = threading.Thread(target=self._read_pipe, args=(tuberia, tipo, self.spawns), daemon=True)
+            lector.start()
+        
+        cola = queue.Queue()
+        self._send(None, cola)
+        try:
+            for _ in range(2):
+                cola.get(timeout=self.startup_timeout)
+        except queue.Empty:
+            self.close()
+            raise RuntimeError(f"El shell {self.shell[0]} no responde")
+        finally:
+            self.destino = None
+    
+    def start(self, comando_str, cwd, cola):
+        """Envía un comando y devuelve el proceso del shell. La salida llega a cola como
+        (tipo, línea) y con un None por cada tubería al terminar o si el shell muere"""
+        if not self.alive():
+            self.spawn(cwd)
+        self._send(comando_str, cola, cwd if cwd != self.cwd else None)
+        self.cwd = cwd
+        return self.proceso
+    
+    def finish(self):
+        """Devuelve el código de salida del último comando y libera la cola"""
+        self.destino = None
+        if self.returncode is not None:
+            return self.returncode
+        # El shell terminó antes de la centinela (exit, timeout o cancelación)
+        try:
+            return self.proceso.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            return -1
+    
+    def close(self):
+        """Termina el shell si sigue vivo"""
+        if self.alive():
+            try:
+                self.proceso.stdin.close()
+                self.proceso.wait(timeout=1)
+            except (OSError, subprocess.TimeoutExpired):
+                self.proceso.kill()
+        elif self.proceso is not None:
+            try:
+                self.proceso.stdin.close()  # Ya murió: solo queda liberar la tubería
+            except OSError:
+                pass
+        self.proceso = None
+    
+    def _send(self, comando_str, cola, cwd=None):
+        """Escribe el comando seguido de las centinelas de fin"""
+        self.destino = cola
+        self.returncode = None
+        lineas = []
+        if self.windows:
+            if cwd:
+                lineas.append(f'cd /d "{cwd}"')
+            if comando_str:
+                lineas.append(f"{comando_str} <NUL")
+            lineas.append(f"echo.& echo {self.sentinel} %ERRORLEVEL% %CD%")
+            lineas.append(f"(echo.& echo {self.sentinel}) 1>&2")
+        else:
+            if cwd:
+                lineas.append(f"cd -- {shlex.quote(cwd)}")
+            # eval mantiene cd y export en este shell; un error de sintaxis no rompe el marco
+            lineas.append(f"eval {shlex.quote(comando_str or ':')} </dev/null")
+            lineas.append(f"printf '\\n%s %d %s\\n' {self.sentinel} $? \"$PWD\"")
+            lineas.append(f"printf '\\n%s\\n' {self.sentinel} >&2")
+        try:
+            self.proceso.stdin.write("\n".join(lineas) + "\n")
+            self.proceso.stdin.flush()
+        except OSError:
+            pass  # El shell murió; los lectores ya avisaron con None
+    
+    def _read_pipe(self, tuberia, tipo, generacion):
+        """Reparte la salida al comando en curso hasta la centinela"""
+        # Se retiene una línea vacía: puede ser el salto que precede a la centinela
+        vacia_pendiente = False
+        try:
+            for linea in iter(tuberia.readline, ''):
+                linea = linea.rstrip("\r\n")
+                if linea.startswith(self.sentinel):
+                    if tipo == "normal":
+                        codigo, _, directorio = linea[len(self.sentinel):].strip().partition(" ")
+                        self.returncode = int(codigo) if codigo.lstrip("-").isdigit() else 0
+                        if directorio and generacion == self.spawns:
+                            self.pwd = directorio
+                    vacia_pendiente = False
+                    self._deliver(None, generacion)
+                    continue
+                if vacia_pendiente:
+                    self._deliver((tipo, ""), generacion)
+                vacia_pendiente = linea == ""
+                if not vacia_pendiente:
+                    self._deliver((tipo, linea), generacion)
+        except Exception as e:
+            print(f"Error al leer la salida del shell: {e}")
+        finally:
+            tuberia.close()
+            self._deliver(None, generacion)
+    
+    def _deliver(self, elemento, generacion):
+        """Pasa un elemento al comando en curso; los lectores de un shell anterior se ignoran"""
+        destino = self.destino
+        if destino is not None and generacion == self.spawns:
+            destino.put(elemento)
+
+
+# Clase que ejecuta comandos de terminal fuera del hilo de la interfaz
+class CommandExecutor(QObject):
+    """Pool acotado de hilos para ejecutar comandos de terminal"""
+    # Señales para comunicar el progreso de cada comando (id, ...)
+    command_started = pyqtSignal(int, str)        # Se emite al empezar a ejecutar
+    command_output = pyqtSignal(int, str, str)    # Se emite con cada bloque de líneas (texto, tipo)
+    command_finished = pyqtSignal(int, str, str)  # Se emite con (mensaje, tipo_mensaje)
+    directory_changed = pyqtSignal(int, str)      # El comando cambió el directorio del shell persistente
+    shell_restarted = pyqtSignal(int)             # El shell persistente murió y se abrió otro sin su estado
+    
+    def __init__(self, max_workers=2, max_pending=8, timeout=15, streaming=True,
+                 max_output_lines=5000, chunk_lines=50, max_chunks_in_flight=16,
+                 persistent_shell=True, parent=None):
+        super().__init__(parent)
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="comando")
+        self.max_pending = max_pending    # Máximo de comandos en cola o en ejecución
+        self.timeout = timeout            # Segundos antes de cancelar un comando
+        
+        # Parámetros del modo streaming
+        self.streaming = streaming                # Enviar la salida por bloques mientras llega
+        self.max_output_lines = max_output_lines  # Líneas conservadas por comando; el resto se descarta
+        self.chunk_lines = chunk_lines            # Líneas máximas por bloque emitido
+        self.flush_interval = 0.1                 # Segundos antes de emitir un bloque incompleto
+        # Bloques emitidos que la interfaz aún no ha consumido. Si se llena, los
+        # lectores se bloquean, la tubería se llena y el proceso hijo espera.
+        self.chunks_in_flight = threading.Semaphore(max_chunks_in_flight)
+        
+        self.lock = threading.Lock()
+        self.next_id = 1
+        self.futures = {}                 # id -> Future de los comandos en curso
+        self.procesos = {}                # id -> Popen de los comandos en ejecución
+        self.cancelados = set()           # ids marcados para cancelar
+        # Shell compartido por los comandos; None lanza un shell nuevo por comando.
+        # Si está ocupado, el comando se ejecuta en un proceso aparte en lugar de esperar turno.
+        self.shell = ShellSession() if persistent_shell else None
+    
+    def pending_count(self):
+        """Número de comandos en cola o en ejecución"""
+        with self.lock:
+            return len(self.futures)
+    
+    def submit(self, comando_str, cwd, streaming=None):
+        """Encola un comando y devuelve su id, o None si el pool está lleno"""
+        streaming = self.streaming if streaming is None else streaming
+        with self.lock:
+            if len(self.futures) >= self.max_pending:
+                return None
+            id_comando = self.next_id
+            self.next_id += 1
+            # El lock sigue tomado, así que el hilo no puede terminar antes de registrar el Future
+            self.futures[id_comando] = self.pool.submit(self._run, id_comando, comando_str, cwd, streaming)
+        return id_comando
+    
+    def submit_task(self, descripcion, funcion, respaldo=None, cwd=None):
+        """Encola una consulta en Python que devuelve texto. Si lanza NativeQueryUnavailable
+        se ejecuta el comando de respaldo. Devuelve su id, o None si el pool está lleno"""
+        with self.lock:
+            if len(self.futures) >= self.max_pending:
+                return None
+            id_comando = self.next_id
+            self.next_id += 1
+            self.futures[id_comando] = self.pool.submit(
+                self._run_task, id_comando, descripcion, funcion, respaldo, cwd)
+        return id_comando
+    
+    def chunk_consumed(self):
+        """La interfaz avisa de que ya mostró un bloque de salida"""
+        self.chunks_in_flight.release()
+    
+    def cancel(self, id_comando):
+        """Cancela un comando en cola o mata su proceso si ya se está ejecutando"""
+        with self.lock:
+            future = self.futures.get(id_comando)
+            if future is None:
+                return False
+            self.cancelados.add(id_comando)
+            proceso = self.procesos.get(id_comando)
+            if future.cancel():
+                # Nunca llegó a ejecutarse: no habrá emisión desde el hilo
+                del self.futures[id_comando]
+                self.cancelados.discard(id_comando)
+                proceso = None
+                cancelado_en_cola = True
+            else:
+                cancelado_en_cola = False
+        
+        if cancelado_en_cola:
+            self.command_finished.emit(id_comando, "Comando cancelado.", "sistema")
+        elif proceso is not None:
+            self.kill_process_tree(proceso)
+        return True
+    
+    def kill_process_tree(self, proceso):
+        """Mata el shell y los procesos que lanzó, que mantienen abiertas las tuberías"""
+        try:
+            if platform.system() == "Windows":
+                subprocess.run(
+                    ["taskkill", "/F", "/T", "/PID", str(proceso.pid)],
+                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                    creationflags=subprocess.CREATE_NO_WINDOW
+                )
+            else:
+                os.killpg(proceso.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass  # El proceso ya terminó
+        except Exception as e:
+            print(f"Error al matar proceso {proceso.pid}: {e}")
+            proceso.kill()
+    
+    def cancel_all(self):
+        """Cancela todos los comandos en curso y devuelve cuántos eran"""
+        with self.lock:
+            ids = list(self.futures)
+        for id_comando in ids:
+            self.cancel(id_comando)
+        return len(ids)
+    
+    def shutdown(self):
+        """Cancela lo pendiente y libera el pool sin bloquear"""
+        self.cancel_all()
+        self.pool.shutdown(wait=False)
+        if self.shell is not None:
+            self.shell.close()
+    
+    def _run(self, id_comando, comando_str, cwd, streaming):
+        """Cuerpo que ejecuta cada hilo del pool"""
+        self.command_started.emit(id_comando, comando_str)
+        try:
+            if streaming:
+                mensaje, tipo = self.stream_command(comando_str, cwd, id_comando)
+            else:
+                mensaje, tipo = self.run_command(comando_str, cwd, id_comando)
+        except Exception as e:
+            mensaje, tipo = f"Excepción al ejecutar: {str(e)}", "error"
+        finally:
+            with self.lock:
+                self.futures.pop(id_comando, None)
+                self.procesos.pop(id_comando, None)
+                cancelado = id_comando in self.cancelados
+                self.cancelados.discard(id_comando)
+        
+        if cancelado:
+            mensaje, tipo = "Comando cancelado.", "sistema"
+        self.command_finished.emit(id_comando, mensaje, tipo)
+    
+    def _run_task(self, id_comando, descripcion, funcion, respaldo, cwd):
+        """Cuerpo de las consultas en Python; usa el comando de respaldo si no hay implementación nativa"""
+        self.command_started.emit(id_comando, descripcion)
+        try:
+            try:
+                mensaje, tipo = self.limit_lines(funcion()), "respuesta"
+            except NativeQueryUnavailable:
+                if respaldo is None:
+                    raise
+                mensaje, tipo = self.run_command(respaldo, cwd, id_comando)
+        except Exception as e:
+            mensaje, tipo = f"Excepción al ejecutar: {str(e)}", "error"
+        finally:
+            with self.lock:
+                self.futures.pop(id_comando, None)
+                self.procesos.pop(id_comando, None)
+                cancelado = id_comando in self.cancelados
+                self.cancelados.discard(id_comando)
+        
+        if cancelado:
+            mensaje, tipo = "Comando cancelado.", "sistema"
+        self.command_finished.emit(id_comando, mensaje, tipo)
+    
+    def start_process(self, comando_str, cwd, id_comando=None):
+        """Lanza el shell con tuberías y lo registra para poder cancelarlo"""
+        proceso = subprocess.Popen(
+            comando_str, 
+            shell=True, 
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+            cwd=cwd, 
+            creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0,
+            start_new_session=platform.system() != "Windows"  # Grupo propio para poder matar sus hijos
+        )
+        self.register_process(id_comando, proceso)
+        return proceso
+    
+    def register_process(self, id_comando, proceso):
+        """Asocia el proceso al comando para poder cancelarlo"""
+        if id_comando is not None:
+            with self.lock:
+                self.procesos[id_comando] = proceso
+                if id_comando in self.cancelados:
+                    self.kill_process_tree(proceso)
+    
+    def acquire_shell(self, id_comando):
+        """Toma el lock del shell persistente si está libre. Si otro comando lo ocupa
+        devuelve False: el comando se ejecuta en un proceso aparte, sin el estado del shell"""
+        if self.shell is None:
+            return False
+        if self.shell.lock.acquire(blocking=False):
+            return True
+        self._emit_chunk(id_comando, ["El shell persistente está ocupado: el comando se ejecuta en un proceso aparte."],
+                         "sistema")
+        return False
+    
+    def start_in_shell(self, comando_str, cwd, id_comando, cola):
+        """Envía el comando al shell persistente (con su lock tomado) y devuelve su proceso,
+        o None si el comando se canceló antes de empezar"""
+        with self.lock:
+            if id_comando in self.cancelados:
+                return None
+        # Un timeout, una cancelación o un "exit" mataron el shell anterior: el nuevo
+        # arranca en la ruta de trabajo pero sin sus variables ni alias
+        reinicio = self.shell.spawns > 0 and not self.shell.alive()
+        proceso = self.shell.start(comando_str, cwd, cola)
+        if reinicio:
+            self.shell_restarted.emit(id_comando if id_comando is not None else 0)
+        self.register_process(id_comando, proceso)
+        return proceso
+    
+    def check_shell_directory(self, id_comando, cwd):
+        """Avisa si el comando dejó el shell persistente en otro directorio ("cd", "pushd"...)
+        para que la ruta de trabajo lo siga; se llama con el lock del shell tomado"""
+        pwd = self.shell.pwd
+        if pwd and cwd and os.path.normcase(os.path.abspath(pwd)) != os.path.normcase(os.path.abspath(cwd)):
+            self.directory_changed.emit(id_comando if id_comando is not None else 0, pwd)
+    
+    def limit_lines(self, texto):
+        """Recorta el texto a max_output_lines indicando cuántas líneas se omitieron"""
+        lineas = texto.splitlines()
+        if len(lineas) <= self.max_output_lines:
+            return texto
+        omitidas = len(lineas) - self.max_output_lines
+        return "\n".join(lineas[:self.max_output_lines]) + f"\n... {omitidas} líneas omitidas"
+    
+    def run_command(self, comando_str, cwd, id_comando=None):
+        """Ejecuta un comando en la terminal del sistema y devuelve (mensaje, tipo_mensaje)"""
+        if self.acquire_shell(id_comando):
+            try:
+                return self.run_in_shell(comando_str, cwd, id_comando)
+            finally:
+                self.shell.lock.release()
+        try:
+            proceso = self.start_process(comando_str, cwd, id_comando)
+            try:
+                stdout, stderr = proceso.communicate(timeout=self.timeout) 
+                
+                if proceso.returncode == 0:
+                    return self.limit_lines(stdout), "respuesta"
+                else:
+                    return self.limit_lines(stderr), "error"
+            except subprocess.TimeoutExpired:
+                self.kill_process_tree(proceso)
+                proceso.communicate() 
+                return f"Error: Comando cancelado (timeout > {self.timeout}s).", "error"
+                
+        except PermissionError:
+            return "Error: Permisos insuficientes.", "error"
+        except FileNotFoundError:
+            return f"Error: Comando '{comando_str.split()[0]}' no encontrado.", "error"
+        except Exception as e:
+            return f"Excepción al ejecutar: {str(e)}", "error"
+    
+    def run_in_shell(self, comando_str, cwd, id_comando=None):
+        """Como run_command, pero en el shell persistente; se llama con su lock tomado"""
+        cola = queue.Queue()
+        salida = {"normal": [], "error": []}
+        try:
+            proceso = self.start_in_shell(comando_str, cwd, id_comando, cola)
+        except Exception as e:
+            return f"Excepción al ejecutar: {str(e)}", "error"
+        if proceso is None:
+            return "Comando cancelado.", "sistema"
+        
+        abiertas = 2
+        timeout_expirado = False
+        limite = time.time() + self.timeout
+        while abiertas:
+            try:
+                elemento = cola.get(timeout=max(0.01, limite - time.time()))
+            except queue.Empty:
+                # Matar el shell cierra las tuberías; se reinicia en el próximo comando
+                timeout_expirado = True
+                self.kill_process_tree(proceso)
+                limite = time.time() + 5
+                continue
+            if elemento is None:
+                abiertas -= 1
+            else:
+                salida[elemento[0]].append(elemento[1])
+        codigo = self.shell.finish()
+        self.check_shell_directory(id_comando, cwd)
+        
+        if timeout_expirado:
+            return f"Error: Comando cancelado (timeout > {self.timeout}s).", "error"
+        if codigo == 0:
+            return self.limit_lines("\n".join(salida["normal"])), "respuesta"
+        return self.limit_lines("\n".join(salida["error"]) or f"El comando terminó con código {codigo}"), "error"
+    
+    def stream_command(self, comando_str, cwd, id_comando):
+        """Ejecuta un comando emitiendo su salida por bloques de líneas a medida que llega"""
+        if not self.acquire_shell(id_comando):
+            return self._stream(comando_str, cwd, id_comando, False)
+        try:
+            return self._stream(comando_str, cwd, id_comando, True)
+        finally:
+            self.shell.lock.release()
+    
+    def _stream(self, comando_str, cwd, id_comando, en_shell):
+        """Cuerpo de stream_command; en_shell indica si se usa el shell persistente"""
+        # Un hilo lector por tubería; la cola acotada frena a los lectores
+        cola = queue.Queue(maxsize=self.chunk_lines * 4)
+        try:
+            if en_shell:
+                proceso = self.start_in_shell(comando_str, cwd, id_comando, cola)
+                if proceso is None:
+                    return "Comando cancelado.", "sistema"
+            else:
+                proceso = self.start_process(comando_str, cwd, id_comando)
+                for tuberia, tipo in ((proceso.stdout, "normal"), (proceso.stderr, "error")):
+                    lector = threading.Thread(target=self._read_pipe, args=(tuberia, tipo, cola), daemon=True)
+                    lector.start()
+        except PermissionError:
+            return "Error: Permisos insuficientes.", "error"
+        except Exception as e:
+            return f"Excepción al ejecutar: {str(e)}", "error"
+        
+        abiertas = 2
+        lineas = 0
+        omitidas = 0
+        lote = []
+        tipo_lote = None
+        timeout_expirado = False
+        inicio = time.time()
+        
+        while abiertas:
+            if not timeout_expirado and time.time() - inicio > self.timeout:
+                # Al matar el proceso se cierran las tuberías y los lectores terminan
+                timeout_expirado = True
+                self.kill_process_tree(proceso)
+            try:
+                elemento = cola.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._emit_chunk(id_comando, lote, tipo_lote)
+                lote = []
+                continue
+            
+            if elemento is None:
+                abiertas -= 1
+                continue
+            tipo, linea = elemento
+            if lineas >= self.max_output_lines:
+                omitidas += 1  # Se sigue drenando la tubería para no bloquear al proceso
+                continue
+            lineas += 1
+            if tipo != tipo_lote:
+                self._emit_chunk(id_comando, lote, tipo_lote)
+                lote = []
+                tipo_lote = tipo
+            lote.append(linea)
+            if len(lote) >= self.chunk_lines:
+                self._emit_chunk(id_comando, lote, tipo_lote)
+                lote = []
+        
+        self._emit_chunk(id_comando, lote, tipo_lote)
+        if en_shell:
+            codigo = self.shell.finish()
+            self.check_shell_directory(id_comando, cwd)
+        else:
+            proceso.wait()
+            codigo = proceso.returncode
+        
+        if timeout_expirado:
+            return f"Error: Comando cancelado (timeout > {self.timeout}s).", "error"
+        if omitidas:
+            self._emit_chunk(id_comando, [f"... {omitidas} líneas omitidas"], "sistema")
+        if codigo != 0:
+            return f"El comando terminó con código {codigo}", "error"
+        return f"Comando finalizado: {comando_str} ({lineas} líneas)", "respuesta"
+    
+    def _read_pipe(self, tuberia, tipo, cola):
+        """Lee una tubería línea a línea y la pasa a la cola; None indica fin"""
+        try:
+            for linea in iter(tuberia.readline, ''):
+                cola.put((tipo, linea.rstrip("\r\n")))
+        except Exception as e:
+            print(f"Error al leer salida del comando: {e}")
+        finally:
+            tuberia.close()
+            cola.put(None)
+    
+    def _emit_chunk(self, id_comando, lote, tipo):
+        """Emite un bloque de líneas respetando la contrapresión de la interfaz"""
+        if not lote:
+            return
+        while not self.chunks_in_flight.acquire(timeout=0.2):
+            with self.lock:
+                if id_comando in self.cancelados:
+                    return  # No esperar a la interfaz si el comando se canceló
+        self.command_output.emit(id_comando, "\n".join(lote), tipo)
+
+
 # Clase personalizada para mostrar mensajes en la consola con colores
-class ConsoleTextEdit(QTextEdit):
+class ConsoleTextEdit(QPlainTextEdit):
     """Widget personalizado para la consola con colores"""
-    def __init__(self, parent_window, parent=None): # Añadido parent_window
+    # Emojis y prompt de cada tipo de mensaje
+    EMOJIS = {"comando": "🗣️", "respuesta": "✔️", "error": "❌", "sistema": "⚙️", "normal": ""}
+    PROMPT = "PS>"
+    # Colores de cada tema; en negro y blanco todo el texto es blanco
+    THEME_COLORS = {
+        "black_and_white": dict.fromkeys(("prompt", "comando_text", "respuesta", "error",
+                                          "sistema", "normal", "timestamp"), "#FFFFFF"),
+        "light": {
+            "prompt": "#5d6972",
+            "comando_text": "#98c379",
+            "respuesta": "#98c379",
+            "error": "#e06c75",
+            "sistema": "#c678dd",
+            "normal": "#646566",      # Default for light theme console
+            "timestamp": "#5c6370"    # Un gris para el timestamp en tema claro
+        },
+    }
+    PREFIXES = {"respuesta": "Respuesta: ", "error": "Error: ", "sistema": "Sistema: "}
+    
+    def __init__(self, parent_window, max_lines=200, parent=None): # Añadido parent_window
         super().__init__(parent)
         self.parent_window = parent_window # Guardar referencia a la ventana principal
         self.setup_ui()
         
-        self.buffer = []              
-        self.max_buffer = 200         
+        self.max_buffer = max_lines   # Líneas conservadas en la consola
+        # Mensajes pendientes (hora, texto, tipo, instante de llegada); más de
+        # max_lines mensajes nunca llegarían a verse, así que se descartan los más antiguos
+        self.buffer = collections.deque(maxlen=max_lines)
+        # Historial circular de líneas ya formateadas (hora, tipo, texto, primera línea del
+        # mensaje); permite volver a pintar la consola al cambiar de tema
+        self.records = collections.deque(maxlen=max_lines)
+        # El documento descarta por sí mismo los bloques más antiguos: recortar cuesta O(1) por línea
+        self.setMaximumBlockCount(max_lines)
         # No inicializar el timer aquí, se hará desde el hilo principal
         self.buffer_timer = None
         
+        # Planificador de pintado: un disparo solo cuando hay mensajes pendientes.
+        # Tras un periodo inactivo se pinta en la siguiente vuelta del bucle de
+        # eventos; durante una ráfaga, como mucho una vez por fotograma
+        self.frame_interval = 1 / 60     # Segundos entre pintados durante una ráfaga
+        self.flush_budget = 0.008        # Tiempo máximo de un pintado antes de partir el lote
+        self.max_batch = 500             # Mensajes por pintado; se adapta al coste medido
+        self._ultimo_flush = 0.0
+        self._duracion_flush = 0.0
+        self.stats = {"pintados": 0, "mensajes": 0, "descartados": 0, "lote_max": 0,
+                      "latencia_ultima_ms": 0.0, "latencia_media_ms": 0.0, "latencia_max_ms": 0.0}
+        
+        # Hora en texto reutilizada mientras no cambie el segundo
+        self._segundo = None
+        self._hora = ""
+        
+        # Formatos de caracteres del tema activo, precalculados por set_theme
+        self.palettes = {}
+        self.formats = {}
+        self.prefixes = {}
+        self.set_theme(getattr(parent_window, 'current_theme', "black_and_white"))
+        
     def setup_timer(self):
-        """Configura el timer desde el hilo principal"""
+        """Configura el timer de un solo disparo desde el hilo principal"""
         if self.buffer_timer is None:
             self.buffer_timer = QTimer(self)
-            self.buffer_timer.timeout.connect(self.flush_buffer)
-            self.buffer_timer.start(100)  
+            self.buffer_timer.setSingleShot(True)
+            self.buffer_timer.setTimerType(Qt.PreciseTimer)
+            self.buffer_timer.timeout.connect(self.flush_scheduled)
+    
+    def schedule_flush(self):
+        """Arma el pintado si no lo está, alineado con el siguiente fotograma"""
+        if self.buffer_timer is None:
+            self.setup_timer()
+        if self.buffer_timer.isActive():
+            return  # Ya hay un pintado pendiente que recogerá este mensaje
+        # Si pintar resulta caro se espaciará más para no bloquear la interfaz
+        intervalo = max(self.frame_interval, 2 * self._duracion_flush)
+        transcurrido = time.perf_counter() - self._ultimo_flush
+        espera = 0.0 if transcurrido >= intervalo else intervalo - transcurrido
+        self.buffer_timer.start(int(espera * 1000))
+    
+    def flush_scheduled(self):
+        """Pinta un lote acotado y vuelve a armarse si quedan mensajes"""
+        self.flush_buffer(limite=self.max_batch)
+        if self.buffer:
+            self.schedule_flush()
             
     def setup_ui(self):
         """Configura la apariencia de la consola"""
         self.setReadOnly(True) 
         self.setFont(QFont("Consolas", 10))
+        self.setLineWrapMode(QPlainTextEdit.WidgetWidth)
+        self.setUndoRedoEnabled(False)  # Sin historial de deshacer: solo crecería con cada lote
         # El estilo principal se aplicará desde AsistenteVozQT.apply_theme
         # Este es un fallback o estilo base muy simple.
         self.setStyleSheet("background-color: black; color: white;")
 
     def append_message(self, message, message_type="normal"):
         """Añade un mensaje al buffer para mostrarlo en la consola"""
-        self.buffer.append((message, message_type))
+        # La hora se toma al recibir el mensaje, no al pintarlo
+        segundo = int(time.time())
+        if segundo != self._segundo:
+            self._segundo = segundo
+            self._hora = time.strftime("%H:%M:%S", time.localtime(segundo))
+        if len(self.buffer) == self.buffer.maxlen:
+            self.stats["descartados"] += 1
+        self.buffer.append((self._hora, message, message_type, time.perf_counter()))
+        self.schedule_flush()
+    
+    def set_theme(self, theme):
+        """Precalcula los formatos de caracteres y prefijos del tema indicado"""
+        black_and_white = theme == "black_and_white"
+        clave = "black_and_white" if black_and_white else "light"
+        if clave not in self.palettes:
+            formatos = {}
+            for nombre, color in self.THEME_COLORS[clave].items():
+                formato = QTextCharFormat()
+                formato.setForeground(QColor(color))
+                formatos[nombre] = formato
+            self.palettes[clave] = formatos
+        self.formats = self.palettes[clave]
+        # Sin prefijo textual en B&W para mantener limpieza
+        self.prefixes = {} if black_and_white else self.PREFIXES
+    
+    def record_segments(self, record):
+        """Divide una línea del historial en fragmentos (texto, clave de color)"""
+        hora, message_type, texto, primera = record
+        if not primera:
+            # Continuación de un mensaje de varias líneas: solo el texto
+            color = "comando_text" if message_type == "comando" else message_type
+            return [(texto, color)]
         
-        # Asegurar que el timer esté configurado
-        if self.buffer_timer is None:
-            self.setup_timer()
+        segmentos = [(f"[{hora}] ", "timestamp")]
+        emoji = self.EMOJIS.get(message_type, "")
+        if emoji:
+            # Los emojis no tienen color de texto, usan el de la fuente
+            segmentos.append((f"{emoji} ", "normal"))
+        if message_type == "comando":
+            segmentos.append((f"{self.PROMPT} ", "prompt"))
+            segmentos.append((texto, "comando_text"))
+        else:
+            segmentos.append((self.prefixes.get(message_type, "") + texto, message_type))
+        return segmentos
+    
+    def insert_records(self, records):
+        """Escribe líneas del historial al final del documento en una sola edición"""
+        formatos = self.formats
+        normal = formatos["normal"]
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        vacio = self.document().isEmpty()
+        # Un único bloque de edición: el documento se relayouta una vez por lote
+        cursor.beginEditBlock()
+        try:
+            for record in records:
+                if not vacio:
+                    cursor.insertBlock()
+                vacio = False
+                for texto, clave in self.record_segments(record):
+                    cursor.insertText(texto, formatos.get(clave, normal))
+        finally:
+            cursor.endEditBlock()
+    
+    def flush_buffer(self, limite=None):
+        """Procesa los mensajes pendientes en el buffer (todos o como mucho limite)"""
+        if not self.buffer:
+            return
+            
+        try:
+            inicio = time.perf_counter()
+            # Mantener la vista al final solo si el usuario no se ha desplazado hacia arriba
+            barra = self.verticalScrollBar()
+            al_final = barra.value() >= barra.maximum()
+            
+            cantidad = len(self.buffer) if limite is None else min(limite, len(self.buffer))
+            lote = [self.buffer.popleft() for _ in range(cantidad)]
+            nuevos = []
+            for hora, message, message_type, _ in lote:
+                # Cada línea física es un registro; solo la primera lleva cabecera
+                for indice, linea in enumerate(str(message).split("\n")):
+                    nuevos.append((hora, message_type, linea, indice == 0))
+            
+            # Solo las últimas max_buffer líneas llegarían a verse
+            nuevos = nuevos[-self.max_buffer:]
+            self.records.extend(nuevos)
+            self.insert_records(nuevos)
+            
+            if al_final:
+                barra.setValue(barra.maximum())
+            
+            fin = time.perf_counter()
+            self._ultimo_flush = fin
+            self._duracion_flush = fin - inicio
+            # Ajustar el lote para que un pintado quepa en flush_budget; los lotes
+            # pequeños no sirven de medida porque domina el coste fijo
+            por_mensaje = self._duracion_flush / cantidad
+            if cantidad >= 50 and por_mensaje > 0:
+                self.max_batch = int(min(5000, max(50, self.flush_budget / por_mensaje)))
             
-        # Forzar flush si hay muchos mensajes o si no hay timer
-        if len(self.buffer) >= 10 or self.buffer_timer is None:
-            self.flush_buffer()
+            # Latencia de pintado: desde que llegó el mensaje más antiguo del lote
+            latencia = (fin - lote[0][3]) * 1000
+            self.stats["pintados"] += 1
+            self.stats["mensajes"] += cantidad
+            self.stats["lote_max"] = max(self.stats["lote_max"], cantidad)
+            self.stats["latencia_ultima_ms"] = latencia
+            self.stats["latencia_max_ms"] = max(self.stats["latencia_max_ms"], latencia)
+            media = self.stats["latencia_media_ms"]
+            self.stats["latencia_media_ms"] = latencia if self.stats["pintados"] == 1 else media * 0.9 + latencia * 0.1
+            
+        except Exception as e:
+            print(f"Error en flush_buffer: {e}")
+            self.buffer.clear()  # Limpiar buffer para evitar bucles infinitos
+    
+    def refresh_theme(self):
+        """Vuelve a pintar el historial con los colores del tema actual"""
+        self.flush_buffer()
+        self.clear()
+        self.insert_records(self.records)
+        self.verticalScrollBar().setValue(self.verticalScrollBar().maximum())
+    
+    def metrics(self):
+        """Devuelve una copia de las métricas de pintado"""
+        metricas = dict(self.stats)
+        metricas["pendientes"] = len(self.buffer)
+        metricas["lote_actual"] = self.max_batch
+        return metricas
+
+
+# Almacén de configuración en memoria con guardado atómico en segundo plano
+class ConfigStore(QObject):
+    """Configuración persistente con escrituras agrupadas, atómicas y recarga en caliente"""
+    changed = pyqtSignal(dict)   # Se emite con las claves modificadas desde fuera de la aplicación
+    written = pyqtSignal()       # Se emite desde el hilo escritor tras cada guardado
+    
+    SCHEMA_VERSION = 2
+    DEFAULTS = {
+        "ruta_trabajo": os.path.expanduser("~"),
+        "theme": "black_and_white",
+        "tts_enabled": True,
+        "energy_threshold": 3000,
+        "recognition_backend": "google",
+        "recognition_options": {},
+        "recognition_cache": True,
+        "directory_threshold": 0.75,
+        "directory_bookmarks": [],
+    }
+    
+    def __init__(self, path, debounce=0.5, max_delay=2.0, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.debounce = debounce      # Silencio necesario antes de escribir
+        self.max_delay = max_delay    # Espera máxima aunque sigan llegando cambios
+        self.lock = threading.Lock()
+        self.data = dict(self.DEFAULTS)
+        self._ultimo_guardado = None  # Contenido de la última escritura propia
+        self._ultimo_cambio = 0.0
+        self._sucio = threading.Event()
+        self._activo = True
+        self.load()
+        
+        self._escritor = threading.Thread(target=self._write_loop, daemon=True)
+        self._escritor.start()
+        
+        # Cambios hechos a mano en el archivo se aplican sin reiniciar
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.fileChanged.connect(self._on_file_changed)
+        self.written.connect(self._watch)  # El archivo puede no existir hasta el primer guardado
+        self._watch()
+    
+    @classmethod
+    def migrate(cls, datos):
+        """Convierte un archivo de un esquema anterior al actual"""
+        version = datos.get("version", 1)
+        if version < 2:
+            # La versión 1 no tenía número de versión ni umbral de energía guardado
+            datos.setdefault("energy_threshold", cls.DEFAULTS["energy_threshold"])
+        datos["version"] = cls.SCHEMA_VERSION
+        return datos
+    
+    def _read_file(self):
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return self.migrate(json.load(f))
+    
+    def load(self):
+        """Carga el archivo si existe; las claves ausentes toman su valor por defecto"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            datos = self._read_file()
+        except Exception as e:
+            print(f"Error al cargar configuración: {e}")
+            return
+        with self.lock:
+            self.data.update(datos)
+            self._ultimo_guardado = dict(self.data)
+    
+    def get(self, clave, default=None):
+        with self.lock:
+            return self.data.get(clave, default)
+    
+    def set(self, clave, valor):
+        """Actualiza una clave en memoria y programa el guardado"""
+        self.update({clave: valor})
+    
+    def update(self, valores):
+        """Actualiza varias claves en memoria y programa un único guardado"""
+        with self.lock:
+            cambios = {k: v for k, v in valores.items() if self.data.get(k) != v}
+            if not cambios:
+                return
+            self.data.update(cambios)
+            self._ultimo_cambio = time.monotonic()
+        self._sucio.set()
+    
+    def _write_loop(self):
+        """Hilo escritor: agrupa los cambios y escribe cuando dejan de llegar"""
+        while self._activo:
+            self._sucio.wait()
+            if not self._activo:
+                break
+            inicio = time.monotonic()
+            while self._activo:
+                with self.lock:
+                    silencio = time.monotonic() - self._ultimo_cambio
+                if silencio >= self.debounce or time.monotonic() - inicio >= self.max_delay:
+                    break
+                time.sleep(min(self.debounce - silencio, 0.1) if silencio < self.debounce else 0.05)
+            self._sucio.clear()
+            self._write()
+    
+    def _write(self):
+        """Escribe en un temporal, lo sincroniza con el disco y lo renombra"""
+        with self.lock:
+            datos = dict(self.data)
+        datos["version"] = self.SCHEMA_VERSION
+        temporal = self.path + ".tmp"
+        try:
+            with open(temporal, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            # El renombrado es atómico: el archivo queda completo o sin cambios
+            os.replace(temporal, self.path)
+            with self.lock:
+                self._ultimo_guardado = datos
+            self.written.emit()
+        except Exception as e:
+            print(f"Error al guardar configuración: {e}")
+    
+    def flush(self):
+        """Escribe de inmediato los cambios pendientes y detiene el hilo escritor"""
+        self._activo = False
+        self._sucio.set()
+        self._escritor.join(timeout=2)
+        with self.lock:
+            pendiente = self._ultimo_guardado is None or any(
+                self._ultimo_guardado.get(k) != v for k, v in self.data.items())
+        if pendiente:
+            self._write()
+    
+    def _watch(self):
+        if os.path.exists(self.path) and self.path not in self.watcher.files():
+            self.watcher.addPath(self.path)
+    
+    def _on_file_changed(self, _):
+        """Recarga el archivo cuando otro programa lo modifica"""
+        # Al reemplazar el archivo por renombrado el vigilante lo pierde: volver a añadirlo
+        self._watch()
+        if not os.path.exists(self.path):
+            # Puede ser el instante entre borrar y renombrar: reintentar en breve
+            QTimer.singleShot(200, self._watch)
+            return
+        try:
+            datos = self._read_file()
+        except Exception:
+            return  # Archivo a medio escribir por un editor: se recargará en el siguiente cambio
+        with self.lock:
+            if datos == self._ultimo_guardado:
+                return  # Es nuestra propia escritura
+            cambios = {k: v for k, v in datos.items() if k != "version" and self.data.get(k) != v}
+            self.data.update(cambios)
+            self._ultimo_guardado = datos
+        if cambios:
+            self.changed.emit(cambios)
+
+
+# Listado de directorios con os.scandir, cacheado por carpeta
+class DirectoryLister(QObject):
+    """Entradas de directorio ordenadas y cacheadas. La caché se invalida con un
+    QFileSystemWatcher y se valida con la fecha de modificación del directorio.
+    Solo se hace stat de las entradas de la página que se muestra, cada vez que se muestra."""
+    scanned = pyqtSignal(str, object)   # (ruta, mtime_ns) tras leer un directorio en cualquier hilo
+    
+    # Fila estructurada de un listado
+    Entry = collections.namedtuple("Entry", "nombre tipo tamano mtime")
+    
+    def __init__(self, capacity=32, page_size=200, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity       # Directorios cacheados
+        self.page_size = page_size     # Entradas por página en la consola
+        self.cache = collections.OrderedDict()   # ruta -> (mtime_ns, [os.DirEntry ordenadas])
+        self.lock = threading.Lock()
+        self.stats = {"aciertos": 0, "fallos": 0, "invalidaciones": 0}
+        
+        # El watcher solo se toca desde el hilo de la interfaz
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.invalidate)
+        self.scanned.connect(self._watch)
+    
+    def entries(self, ruta):
+        """Devuelve las os.DirEntry de ruta: primero carpetas y luego archivos, por nombre"""
+        ruta = os.path.abspath(ruta)
+        mtime = os.stat(ruta).st_mtime_ns
+        with self.lock:
+            cacheado = self.cache.get(ruta)
+            if cacheado is not None and cacheado[0] == mtime:
+                self.cache.move_to_end(ruta)
+                self.stats["aciertos"] += 1
+                return cacheado[1]
+            self.stats["fallos"] += 1
+        
+        carpetas, archivos = [], []
+        with os.scandir(ruta) as iterador:
+            for entrada in iterador:
+                # is_dir usa el tipo que devuelve scandir, sin stat en Linux y Windows
+                (carpetas if entrada.is_dir() else archivos).append(entrada)
+        # Ordenar por separado con clave de texto es el doble de rápido que con tuplas
+        carpetas.sort(key=lambda e: e.name.casefold())
+        archivos.sort(key=lambda e: e.name.casefold())
+        entradas = carpetas + archivos
+        with self.lock:
+            self.cache[ruta] = (mtime, entradas)
+            self.cache.move_to_end(ruta)
+            while len(self.cache) > self.capacity:
+                self.cache.popitem(last=False)
+        self.scanned.emit(ruta, mtime)
+        return entradas
+    
+    def count(self, ruta):
+        """Número de entradas cacheadas de ruta, o None si no está en caché"""
+        with self.lock:
+            cacheado = self.cache.get(os.path.abspath(ruta))
+        return len(cacheado[1]) if cacheado is not None else None
+    
+    def page(self, ruta, inicio=0, cantidad=None):
+        """Devuelve (entradas estructuradas de la página, total)"""
+        entradas = self.entries(ruta)
+        cantidad = cantidad or self.page_size
+        pagina = []
+        for entrada in entradas[inicio:inicio + cantidad]:
+            try:
+                # Sin la caché de DirEntry: un archivo reescrito no cambia la fecha del directorio
+                info = os.lstat(entrada.path)
+            except OSError:
+                pagina.append(self.Entry(entrada.name, "?", 0, 0.0))
+                continue
+            if entrada.is_symlink():
+                tipo = "enlace"
+            elif entrada.is_dir():
+                tipo = "carpeta"
+            else:
+                tipo = "archivo"
+            pagina.append(self.Entry(entrada.name, tipo, info.st_size, info.st_mtime))
+        return pagina, len(entradas)
+    
+    def page_text(self, ruta, inicio=0):
+        """Página de ruta como tabla para la consola"""
+        pagina, total = self.page(ruta, inicio)
+        if not total:
+            return f"{ruta} está vacío"
+        filas = [[e.tipo, format_bytes(e.tamano) if e.tipo == "archivo" else "",
+                  datetime.datetime.fromtimestamp(e.mtime).strftime("%Y-%m-%d %H:%M"), e.nombre]
+                 for e in pagina]
+        tabla = format_table([("Tipo", "<"), ("Tamaño", ">"), ("Modificado", "<"), ("Nombre", "<")], filas)
+        fin = inicio + len(pagina)
+        texto = f"{ruta}: {total} entradas ({inicio + 1}-{fin})\n{tabla}"
+        if fin < total:
+            texto += f"\nQuedan {total - fin}. Di 'más archivos' para ver las siguientes {min(self.page_size, total - fin)}."
+        return texto
+    
+    @pyqtSlot(str)
+    def invalidate(self, ruta):
+        """Descarta el listado cacheado de ruta"""
+        with self.lock:
+            if self.cache.pop(ruta, None) is not None:
+                self.stats["invalidaciones"] += 1
+    
+    @pyqtSlot(str, object)
+    def _watch(self, ruta, mtime):
+        """Vigila los directorios cacheados y deja de vigilar los expulsados"""
+        with self.lock:
+            cacheados = set(self.cache)
+        vigilados = set(self.watcher.directories())
+        obsoletos = vigilados - cacheados
+        if obsoletos:
+            self.watcher.removePaths(list(obsoletos))
+        if ruta in cacheados and ruta not in vigilados:
+            self.watcher.addPath(ruta)
+            # Un cambio entre la lectura y el alta del watcher no se habría notificado
+            try:
+                if os.stat(ruta).st_mtime_ns != mtime:
+                    self.invalidate(ruta)
+            except OSError:
+                self.invalidate(ruta)
+    
+    def metrics(self):
+        """Devuelve una copia de las estadísticas de la caché"""
+        metricas = dict(self.stats)
+        metricas["directorios"] = len(self.cache)
+        return metricas
+
+
+# Resolución de nombres de carpeta dichos en voz alta
+class DirectoryResolver:
+    """Encuentra la carpeta existente más parecida a un nombre hablado entre las hijas
+    de la carpeta actual, sus hermanas, las de la carpeta personal y las favoritas.
+    
+    Las listas de carpetas salen de DirectoryLister, así que comparten su caché e
+    invalidación. Por cada listado se guardan una vez las claves plegadas y
+    fonéticas de los nombres y un índice de trigramas; cada consulta solo puntúa
+    con distancia de edición los pocos nombres que comparten más trigramas. Las
+    claves de las consultas (con sus alias) y el último resultado de cada una se
+    guardan mientras no cambie ninguna de las carpetas raíz.
+    """
+    
+    def __init__(self, lister, bookmarks=(), max_candidates=8, max_queries=256):
+        self.lister = lister
+        self.bookmarks = list(bookmarks)       # Carpetas raíz adicionales
+        self.max_candidates = max_candidates   # Nombres puntuados por carpeta raíz
+        self.max_queries = max_queries         # Consultas recordadas
+        self.keys = {}                         # ruta -> (lista de entradas, índice de sus subcarpetas)
+        self.query_keys = collections.OrderedDict()  # consulta -> (claves con alias, trigramas)
+        self.results = collections.OrderedDict()     # (consulta, cwd, límite) -> (índices usados, resultado)
+        self._roots = (None, None, None)             # (cwd, favoritas, raíces)
+    
+    @staticmethod
+    def trigrams(texto):
+        marcado = f" {texto} "
+        return {marcado[i:i + 3] for i in range(len(marcado) - 2)}
+    
+    def roots(self, cwd):
+        """Carpetas donde buscar con su penalización por lejanía"""
+        anterior_cwd, favoritas, raices = self._roots
+        if anterior_cwd == cwd and favoritas == self.bookmarks:
+            return raices
+        raices = self._make_roots(cwd)
+        self._roots = (cwd, list(self.bookmarks), raices)
+        return raices
+    
+    def _make_roots(self, cwd):
+        raices = [(cwd, 0.0), (os.path.dirname(cwd), 0.03), (os.path.expanduser("~"), 0.05)]
+        raices += [(os.path.expanduser(ruta), 0.05) for ruta in self.bookmarks]
+        vistas = set()
+        resultado = []
+        for ruta, penalizacion in raices:
+            ruta = os.path.abspath(ruta)
+            if ruta not in vistas:
+                vistas.add(ruta)
+                resultado.append((ruta, penalizacion))
+        return resultado
+    
+    def subdirectories(self, ruta):
+        """Índice de las subcarpetas de ruta: nombres con sus claves, trigramas y palabras"""
+        try:
+            entradas = self.lister.entries(ruta)
+        except OSError:
+            return None
+        cacheado = self.keys.get(ruta)
+        if cacheado is not None and cacheado[0] is entradas:
+            return cacheado[1]  # El listado no ha cambiado desde la última vez
+        
+        indice = {"claves": [], "trigramas": collections.defaultdict(list), "palabras": collections.defaultdict(list)}
+        for entrada in entradas:
+            if not entrada.is_dir():
+                break  # Las carpetas van primero en el listado
+            plegado = " ".join(fold_name(entrada.name).split())
+            fonetico = phonetic_key(entrada.name)
+            posicion = len(indice["claves"])
+            indice["claves"].append((entrada.name, plegado, fonetico))
+            for trigrama in self.trigrams(plegado) | self.trigrams(fonetico):
+                indice["trigramas"][trigrama].append(posicion)
+            for palabra in set(plegado.split()) | set(fonetico.split()):
+                indice["palabras"][palabra].append(posicion)
+        self.keys[ruta] = (entradas, indice)
+        return indice
+    
+    def query(self, consulta):
+        """Claves plegadas y fonéticas de la consulta y sus alias, con todos sus trigramas"""
+        cacheado = self.query_keys.get(consulta)
+        if cacheado is not None:
+            self.query_keys.move_to_end(consulta)
+            return cacheado
+        consultas = [(c, phonetic_key(c)) for c in [consulta] + FOLDER_ALIASES.get(consulta, [])]
+        trigramas = set()
+        for c, f in consultas:
+            trigramas |= self.trigrams(c) | self.trigrams(f)
+        self.query_keys[consulta] = (consultas, trigramas)
+        if len(self.query_keys) > self.max_queries:
+            self.query_keys.popitem(last=False)
+        return consultas, trigramas
+    
+    def resolve(self, texto, cwd, limite=3):
+        """Devuelve [(confianza, ruta)] de las carpetas más parecidas, de mayor a menor"""
+        consulta = " ".join(fold_name(texto).split())
+        if not consulta:
+            return []
+        raices = [(raiz, penalizacion, self.subdirectories(raiz)) for raiz, penalizacion in self.roots(cwd)]
+        
+        # Misma consulta sobre los mismos listados: el resultado no puede haber cambiado
+        clave = (consulta, cwd, limite)
+        usados = tuple(id(indice) for _, _, indice in raices)
+        cacheado = self.results.get(clave)
+        if cacheado is not None and cacheado[0] == usados:
+            self.results.move_to_end(clave)
+            return cacheado[1]
+        
+        consultas, trigramas = self.query(consulta)
+        candidatos = {}
+        for raiz, penalizacion, indice in raices:
+            if not indice:
+                continue
+            votos = collections.Counter()
+            listas = sorted((indice["trigramas"].get(t, ()) for t in trigramas), key=len)
+            for lista in listas:
+                # Un trigrama que comparten la mitad de los nombres no distingue entre ellos
+                if votos and len(lista) * 2 > len(indice["claves"]):
+                    break
+                votos.update(lista)
+            for c, f in consultas:
+                # Una palabra completa del nombre siempre entra ("documentos" -> "Mis Documentos")
+                for posicion in indice["palabras"].get(c, []) + indice["palabras"].get(f, []):
+                    votos[posicion] += len(trigramas)
+            mas_votado = 0
+            for posicion, cantidad in votos.most_common(self.max_candidates):
+                # Con menos de la mitad de los votos del primero no llegaría a parecerse tanto
+                mas_votado = mas_votado or cantidad
+                if cantidad * 2 < mas_votado:
+                    break
+                nombre, plegado, fonetico = indice["claves"][posicion]
+                confianza = max(self._score(c, f, plegado, fonetico) for c, f in consultas) - penalizacion
+                ruta = os.path.join(raiz, nombre)
+                if confianza > candidatos.get(ruta, 0.0):
+                    candidatos[ruta] = confianza
+        mejores = heapq.nlargest(limite, candidatos.items(), key=lambda item: item[1])
+        resultado = [(round(confianza, 3), ruta) for ruta, confianza in mejores if confianza > 0]
+        
+        # Los índices deben seguir vivos para que su id() no se reutilice
+        self.results[clave] = (usados, resultado, [indice for _, _, indice in raices])
+        if len(self.results) > self.max_queries:
+            self.results.popitem(last=False)
+        return resultado
+    
+    def _score(self, consulta, consulta_fonetica, plegado, fonetico):
+        """Parecido entre 0 y 1 de una consulta con el nombre de una carpeta"""
+        if consulta == plegado:
+            return 1.0
+        if consulta_fonetica == fonetico:
+            return 0.95
+        if consulta in plegado.split() or (" " in consulta and consulta in plegado):
+            return 0.9
+        if consulta_fonetica in fonetico.split():
+            return 0.85
+        mejor = 0.0
+        for a, b, factor in ((consulta, plegado, 1.0), (consulta_fonetica, fonetico, 0.95)):
+            largo = max(len(a), len(b))
+            # Con más diferencia de longitud que esta la confianza no pasaría de 0.5
+            if abs(len(a) - len(b)) * 2 > largo:
+                continue
+            mejor = max(mejor, (1 - edit_distance(a, b) / largo) * factor)
+        return mejor
+
+
+# Índice de nombres de archivo de la ruta de trabajo, construido en segundo plano
+class FileIndex(QObject):
+    """Índice de archivos y carpetas bajo una raíz para "buscar archivo".
+    
+    Un hilo propio recorre el árbol con os.scandir en paralelo y después atiende
+    los cambios que avisa el QFileSystemWatcher volviendo a leer solo esa carpeta.
+    Las búsquedas usan una instantánea inmutable: prefijo por bisección sobre las
+    claves ordenadas, palabras en cualquier orden con un vocabulario invertido,
+    subcadena con str.find sobre un único texto y, si nada coincide, palabras
+    parecidas del vocabulario por trigramas y distancia de edición.
+    
+    Los cambios no rehacen la instantánea grande: las carpetas cambiadas forman una
+    capa pequeña que se busca junto a ella y oculta sus carpetas antiguas. Solo se
+    funden en una instantánea nueva cuando la capa crece demasiado.
+    """
+    progress = pyqtSignal(int, int)        # (archivos, carpetas) mientras se indexa
+    ready = pyqtSignal(int, float)         # (entradas, segundos) al terminar de indexar
+    scanned = pyqtSignal(list)             # Carpetas nuevas que conviene vigilar
+    
+    # Carpetas que no se indexan además de las ocultas
+    EXCLUDED_DIRS = {"node_modules", "__pycache__", "venv", "$RECYCLE.BIN", "System Volume Information"}
+    
+    def __init__(self, workers=8, max_watches=4000, max_overlay=50000, parent=None):
+        super().__init__(parent)
+        self.workers = workers            # Hilos de os.scandir durante el recorrido
+        self.max_watches = max_watches    # inotify y Windows limitan las carpetas vigiladas
+        self.max_overlay = max_overlay    # Entradas de la capa de cambios antes de fundirla
+        self.raiz = None
+        self.generacion = 0               # Cambia con cada raíz nueva para abandonar recorridos viejos
+        self.carpetas = {}                # ruta -> (archivos, subcarpetas); solo lo toca el hilo del índice
+        self.snapshot = None              # Instantánea de búsqueda; se reemplaza entera
+        self.capa = None                  # (instantánea base, cambios, carpetas ocultas de la base, entradas)
+        self.cambiadas = set()            # Carpetas releídas desde la última instantánea
+        self.eliminadas = set()           # Carpetas de la instantánea que ya no existen
+        self.indexando = False
+        
+        self.trabajos = queue.Queue()     # ("construir", raíz, generación) o ("actualizar", ruta, generación)
+        self.hilo = threading.Thread(target=self._loop, name="indice-archivos", daemon=True)
+        self.hilo.start()
+        
+        # El watcher solo se toca desde el hilo de la interfaz
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self._on_directory_changed)
+        self.scanned.connect(self._watch)
+    
+    def build(self, raiz):
+        """Indexa raiz en segundo plano; no hace nada si ya es la raíz actual"""
+        raiz = os.path.abspath(raiz)
+        if raiz == self.raiz:
+            return
+        self.raiz = raiz
+        self.generacion += 1
+        self.indexando = True
+        if self.watcher.directories():
+            self.watcher.removePaths(self.watcher.directories())
+        self.trabajos.put(("construir", raiz, self.generacion))
+    
+    def close(self):
+        """Detiene el hilo del índice"""
+        self.generacion += 1
+        self.trabajos.put(None)
+    
+    def _loop(self):
+        """Hilo del índice: recorridos completos y actualizaciones de carpetas sueltas"""
+        while True:
+            trabajo = self.trabajos.get()
+            if trabajo is None:
+                return
+            tipo, ruta, generacion = trabajo
+            if generacion != self.generacion:
+                continue  # La raíz cambió mientras el trabajo esperaba
+            try:
+                if tipo == "construir":
+                    self._build(ruta, generacion)
+                else:
+                    # Agrupar los avisos seguidos en una sola reconstrucción
+                    rutas = {ruta}
+                    time.sleep(0.3)
+                    while not self.trabajos.empty():
+                        siguiente = self.trabajos.get()
+                        if siguiente is None or siguiente[0] != "actualizar":
+                            self.trabajos.put(siguiente)
+                            break
+                        rutas.add(siguiente[1])
+                    self._update(rutas, generacion)
+            except Exception as e:
+                print(f"Error en el índice de archivos: {e}")
+    
+    def _build(self, raiz, generacion):
+        inicio = time.time()
+        self.carpetas = {}
+        self.snapshot = None
+        self.capa = None
+        self.cambiadas, self.eliminadas = set(), set()
+        if not self._walk([raiz], generacion, informar=True):
+            return
+        self.snapshot = self._make_snapshot(self.carpetas)
+        self.indexando = False
+        self.ready.emit(len(self.snapshot["nombres"]), time.time() - inicio)
+        # Vigilar primero las carpetas menos profundas
+        self.scanned.emit(sorted(self.carpetas, key=lambda r: r.count(os.sep))[:self.max_watches])
+    
+    def _walk(self, inicio, generacion, informar=False, visitadas=None):
+        """Recorre en paralelo los árboles de inicio y guarda su contenido en self.carpetas
+        (y sus rutas en visitadas si se pasa). Devuelve False si la raíz cambió antes de terminar"""
+        resultados = queue.Queue()
+        pendientes = 0
+        archivos = 0
+        ultimo_aviso = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scandir") as pool:
+            for ruta in inicio:
+                pool.submit(self._scan_dir, ruta, resultados)
+                pendientes += 1
+            while pendientes:
+                ruta, nombres_archivos, subcarpetas = resultados.get()
+                pendientes -= 1
+                if generacion != self.generacion:
+                    continue  # Drenar lo que ya está en marcha sin encolar más
+                self.carpetas[ruta] = (nombres_archivos, subcarpetas)
+                if visitadas is not None:
+                    visitadas.append(ruta)
+                archivos += len(nombres_archivos)
+                for nombre in subcarpetas:
+                    pool.submit(self._scan_dir, os.path.join(ruta, nombre), resultados)
+                    pendientes += 1
+                if informar and time.time() - ultimo_aviso > 0.25:
+                    ultimo_aviso = time.time()
+                    self.progress.emit(archivos, len(self.carpetas))
+        return generacion == self.generacion
+    
+    def _scan_dir(self, ruta, resultados):
+        """Lee una carpeta sin seguir enlaces y devuelve (ruta, archivos, subcarpetas) por la cola"""
+        archivos, subcarpetas = [], []
+        try:
+            with os.scandir(ruta) as iterador:
+                for entrada in iterador:
+                    nombre = entrada.name
+                    if nombre.startswith("."):
+                        continue
+                    try:
+                        es_carpeta = entrada.is_dir(follow_symlinks=False)
+                    except OSError:
+                        es_carpeta = False
+                    if not es_carpeta:
+                        archivos.append(nombre)
+                    elif nombre not in self.EXCLUDED_DIRS:
+                        subcarpetas.append(nombre)
+        except OSError:
+            pass  # Sin permisos o borrada durante el recorrido
+        finally:
+            resultados.put((ruta, archivos, subcarpetas))
+    
+    def _update(self, rutas, generacion):
+        """Vuelve a leer las carpetas cambiadas, recorre las subcarpetas nuevas, quita las
+        borradas y rehace solo la capa de cambios"""
+        nuevas = []
+        for ruta in rutas:
+            anterior = self.carpetas.get(ruta)
+            if anterior is None:
+                continue
+            resultados = queue.Queue()
+            self._scan_dir(ruta, resultados)
+            _, archivos, subcarpetas = resultados.get()
+            if not os.path.isdir(ruta):
+                subcarpetas = []
+            borradas = set(anterior[1]) - set(subcarpetas)
+            for nombre in borradas:
+                prefijo = os.path.join(ruta, nombre)
+                for otra in [r for r in self.carpetas if r == prefijo or r.startswith(prefijo + os.sep)]:
+                    del self.carpetas[otra]
+                    self.cambiadas.discard(otra)
+                    self.eliminadas.add(otra)
+            self.carpetas[ruta] = (archivos, subcarpetas)
+            self.cambiadas.add(ruta)
+            nuevas.extend(os.path.join(ruta, nombre) for nombre in set(subcarpetas) - set(anterior[1]))
+        visitadas = []
+        if nuevas and not self._walk(nuevas, generacion, visitadas=visitadas):
+            return
+        self.cambiadas.update(visitadas)
+        self._make_overlay()
+        if visitadas:
+            self.scanned.emit(visitadas)
     
-    def flush_buffer(self):
-        """Procesa todos los mensajes pendientes en el buffer"""
-        if not self.buffer:
+    def _make_overlay(self):
+        """Instantánea pequeña de las carpetas cambiadas; si crece demasiado se funde con la base"""
+        base = self.snapshot
+        cambios = self._make_snapshot({r: self.carpetas[r] for r in self.cambiadas if r in self.carpetas})
+        if len(cambios["nombres"]) > max(self.max_overlay, len(base["nombres"]) // 4):
+            self.snapshot = self._make_snapshot(self.carpetas)
+            self.cambiadas, self.eliminadas = set(), set()
+            self.capa = None
             return
+        indice_rutas = base["indice_rutas"]
+        ocultas = frozenset(indice_rutas[r] for r in self.cambiadas | self.eliminadas if r in indice_rutas)
+        inicios = base["inicios"]
+        entradas = (len(base["nombres"]) + len(cambios["nombres"])
+                    - sum(inicios[i + 1] - inicios[i] for i in ocultas))
+        self.capa = (base, cambios, ocultas, entradas)
+    
+    def _make_snapshot(self, carpetas):
+        """Estructuras de búsqueda a partir de {ruta: (archivos, subcarpetas)}"""
+        rutas = []
+        nombres = []
+        carpeta = array.array("I")
+        inicios = array.array("L")        # Las entradas de cada carpeta son contiguas
+        es_carpeta = bytearray()
+        for indice, (ruta, (archivos, subcarpetas)) in enumerate(carpetas.items()):
+            rutas.append(ruta)
+            inicios.append(len(nombres))
+            nombres += subcarpetas
+            nombres += archivos
+            carpeta.extend([indice] * (len(subcarpetas) + len(archivos)))
+            es_carpeta += b"\x01" * len(subcarpetas) + b"\x00" * len(archivos)
+        inicios.append(len(nombres))
+        claves = [fold_name(nombre) for nombre in nombres]
+        
+        # Todas las claves en un solo texto separado por saltos de línea para str.find
+        texto = "\n".join(claves)
+        posiciones = array.array("L", [0]) * len(claves)
+        posicion = 0
+        for i, clave in enumerate(claves):
+            posiciones[i] = posicion
+            posicion += len(clave) + 1
+        orden = sorted(range(len(claves)), key=claves.__getitem__)
+        
+        # Vocabulario de palabras (sin números, que casi siempre son únicos) con las
+        # entradas que las contienen, y trigramas del vocabulario para la búsqueda aproximada
+        vocabulario = {}
+        for i, clave in enumerate(claves):
+            for palabra in set(clave.split()):
+                if len(palabra) > 1 and not palabra.isdigit():
+                    lista = vocabulario.get(palabra)
+                    if lista is None:
+                        vocabulario[palabra] = lista = []
+                    lista.append(i)
+        for palabra, lista in vocabulario.items():
+            vocabulario[palabra] = array.array("I", lista)
+        trigramas = collections.defaultdict(list)
+        for palabra in vocabulario:
+            marcada = f" {palabra} "
+            for j in range(len(marcada) - 2):
+                trigramas[marcada[j:j + 3]].append(palabra)
+        
+        return {"rutas": rutas, "indice_rutas": {ruta: i for i, ruta in enumerate(rutas)}, "inicios": inicios,
+                "nombres": nombres, "carpeta": carpeta, "es_carpeta": es_carpeta,
+                "claves": claves, "texto": texto, "posiciones": posiciones,
+                "orden": orden, "ordenadas": [claves[i] for i in orden],
+                "vocabulario": vocabulario, "palabras": sorted(vocabulario),
+                "texto_palabras": "\n".join(vocabulario), "trigramas": dict(trigramas)}
+    
+    def search(self, texto, limite=10):
+        """Devuelve [(ruta, es_carpeta, coincidencia)] con coincidencia "prefijo", "palabras",
+        "subcadena" o "aproximada". Busca en la instantánea y en la capa de cambios"""
+        snapshot = self.snapshot
+        consulta = " ".join(fold_name(texto).split())
+        if snapshot is None or not consulta:
+            return []
+        capas = [(snapshot, frozenset())]
+        capa = self.capa
+        if capa is not None and capa[0] is snapshot:
+            capas = [(snapshot, capa[2]), (capa[1], frozenset())]
+        
+        resultados = []
+        for datos, ocultas in capas:
+            resultados += self._search_snapshot(datos, consulta, limite, ocultas)
+        # Aproximada, solo si no hay nada mejor en ninguna capa
+        if not resultados:
+            for datos, ocultas in capas:
+                resultados += self._search_snapshot(datos, consulta, limite, ocultas, aproximada=True)
+        orden = {"prefijo": 0, "palabras": 1, "subcadena": 2, "aproximada": 3}
+        resultados.sort(key=lambda resultado: orden[resultado[2]])
+        return resultados[:limite]
+    
+    def _search_snapshot(self, snapshot, consulta, limite, ocultas, aproximada=False):
+        """Búsqueda en una instantánea sin las entradas de las carpetas ocultas.
+        Cada paso solo se ejecuta si los anteriores no llenaron el límite"""
+        claves = snapshot["claves"]
+        carpeta = snapshot["carpeta"]
+        encontrados = {}
+        
+        def agregar(indices, coincidencia):
+            for i in indices:
+                if len(encontrados) >= limite:
+                    break
+                if not ocultas or carpeta[i] not in ocultas:
+                    encontrados.setdefault(i, coincidencia)
+        
+        palabras = consulta.split()
+        if aproximada:
+            # Palabras del vocabulario parecidas a cada palabra de la consulta
+            # (errores de letras o abreviaturas sin vocales)
+            candidatos = {palabra: self._similar_words(snapshot, palabra) for palabra in palabras if not palabra.isdigit()}
+            agregar(self._combine(snapshot, palabras, candidatos), "aproximada")
+        else:
+            # Prefijo del nombre completo: bisección sobre las claves ordenadas
+            ordenadas = snapshot["ordenadas"]
+            posicion = bisect.bisect_left(ordenadas, consulta)
+            while len(encontrados) < limite and posicion < len(ordenadas) and ordenadas[posicion].startswith(consulta):
+                agregar((snapshot["orden"][posicion],), "prefijo")
+                posicion += 1
             
-        try:
-            self.setUpdatesEnabled(False)
-            
-            is_black_and_white_theme = (hasattr(self.parent_window, 'current_theme') and 
-                                        self.parent_window.current_theme == "black_and_white")
-
-            # Colores base (para tema claro o si no es B&W)
-            text_color = "#646566" # Default for light theme console
-            prompt_color = "#5d6972"
-            command_text_color = "#98c379"
-            respuesta_color = "#98c379"
-            error_color = "#e06c75"
-            sistema_color = "#c678dd"
-            timestamp_color = "#5c6370" # Un gris para el timestamp en tema claro
-            
-            if is_black_and_white_theme:
-                # Todo el texto es blanco en el tema negro y blanco
-                text_color = "#FFFFFF"
-                prompt_color = "#FFFFFF"
-                command_text_color = "#FFFFFF"
-                respuesta_color = "#FFFFFF"
-                error_color = "#FFFFFF"
-                sistema_color = "#FFFFFF"
-                timestamp_color = "#FFFFFF" # Timestamp también blanco
-
-            colors = {
-                "prompt": prompt_color,
-                "comando_text": command_text_color,
-                "respuesta": respuesta_color,
-                "error": error_color,
-                "sistema": sistema_color,
-                "normal": text_color, 
-                "timestamp": timestamp_color
-            }
-            
-            # Emojis (se mantienen)
-            emojis = {
-                "comando": "🗣️", "respuesta": "✔️", "error": "❌", "sistema": "⚙️", "normal": ""
-            }
-            
-            prompt_text = "PS>" # Se mantiene el prompt visualmente
+            # Palabras en cualquier orden ("final informe" -> "informe_final.pdf"), por prefijo de palabra
+            if len(encontrados) < limite:
+                candidatos = {palabra: self._word_prefixes(snapshot, palabra) for palabra in palabras if not palabra.isdigit()}
+                agregar(self._combine(snapshot, palabras, candidatos), "palabras")
             
-            for message, message_type in self.buffer:
+            # Subcadena: str.find sobre todas las claves; las más cortas se parecen más
+            if len(encontrados) < limite:
+                indices = [i for i in self._find_all(snapshot, consulta, limite * 10) if i not in encontrados]
+                agregar(sorted(indices, key=lambda i: len(claves[i])), "subcadena")
+        
+        return [(os.path.join(snapshot["rutas"][carpeta[i]], snapshot["nombres"][i]),
+                 bool(snapshot["es_carpeta"][i]), coincidencia) for i, coincidencia in encontrados.items()]
+    
+    def _word_prefixes(self, snapshot, palabra, maximo=50):
+        """{palabra del vocabulario: 0} para las que empiezan por palabra"""
+        ordenadas = snapshot["palabras"]
+        posicion = bisect.bisect_left(ordenadas, palabra)
+        resultado = {}
+        while posicion < len(ordenadas) and ordenadas[posicion].startswith(palabra) and len(resultado) < maximo:
+            resultado[ordenadas[posicion]] = 0
+            posicion += 1
+        return resultado
+    
+    def _similar_words(self, snapshot, palabra, maximo=20):
+        """{palabra del vocabulario: distancia} para las parecidas a palabra"""
+        vocabulario = snapshot["vocabulario"]
+        limite_distancia = max(1, (len(palabra) + 1) // 3)
+        # Trigramas compartidos (con los bordes marcados) para errores de letras
+        votos = collections.Counter()
+        marcada = f" {palabra} "
+        for j in range(len(marcada) - 2):
+            votos.update(snapshot["trigramas"].get(marcada[j:j + 3], ()))
+        resultado = {}
+        for candidata, _ in votos.most_common(maximo * 5):
+            if abs(len(candidata) - len(palabra)) <= limite_distancia:
+                distancia = edit_distance(palabra, candidata)
+                if distancia <= limite_distancia:
+                    resultado[candidata] = distancia
+        # Letras en orden y cerca unas de otras para abreviaturas ("rsmn" -> "resumen")
+        if len(palabra) >= 3:
+            patron = re.compile("[^\n]{0,3}?".join(re.escape(c) for c in palabra))
+            for coincidencia in patron.finditer(snapshot["texto_palabras"]):
+                inicio = snapshot["texto_palabras"].rfind("\n", 0, coincidencia.start()) + 1
+                fin = snapshot["texto_palabras"].find("\n", coincidencia.end())
+                candidata = snapshot["texto_palabras"][inicio:fin if fin != -1 else None]
+                if candidata in vocabulario and candidata not in resultado:
+                    resultado[candidata] = len(candidata) - len(palabra)
+                if len(resultado) >= maximo * 2:
+                    break
+        return dict(sorted(resultado.items(), key=lambda item: item[1])[:maximo])
+    
+    def _combine(self, snapshot, palabras, candidatos, maximo=2000):
+        """Entradas que contienen una palabra candidata por cada palabra de la consulta y
+        los números tal cual, de la más parecida a la menos"""
+        if not candidatos or any(not opciones for opciones in candidatos.values()):
+            return []
+        vocabulario = snapshot["vocabulario"]
+        claves = snapshot["claves"]
+        numeros = [palabra for palabra in palabras if palabra.isdigit()]
+        if numeros:
+            # Un número suele ser casi único: empezar por las entradas que lo contienen
+            posibles = self._find_all(snapshot, max(numeros, key=len), maximo)
+        else:
+            # Recorrer solo las entradas de la palabra más rara y comprobar las demás en su clave
+            rara = min(candidatos, key=lambda p: sum(len(vocabulario[c]) for c in candidatos[p]))
+            posibles = (i for candidata in candidatos[rara] for i in vocabulario[candidata])
+        
+        puntuados = []
+        vistos = set()
+        for i in posibles:
+            if i in vistos:
+                continue
+            vistos.add(i)
+            if len(vistos) > maximo:
+                break
+            tokens = claves[i].split()
+            total = 0
+            for opciones in candidatos.values():
+                distancias = [opciones[t] for t in tokens if t in opciones]
+                if not distancias:
+                    break
+                total += min(distancias)
+            else:
+                if all(numero in claves[i] for numero in numeros):
+                    puntuados.append((total, len(claves[i]), i))
+        puntuados.sort()
+        return [i for _, _, i in puntuados]
+    
+    def _find_all(self, snapshot, subcadena, maximo):
+        """Índices de las claves que contienen subcadena, como mucho maximo"""
+        texto = snapshot["texto"]
+        posiciones = snapshot["posiciones"]
+        indices = []
+        posicion = texto.find(subcadena)
+        while posicion != -1 and len(indices) < maximo:
+            i = bisect.bisect_right(posiciones, posicion) - 1
+            indices.append(i)
+            # Saltar al final de esta clave para no repetirla
+            fin = texto.find("\n", posicion)
+            if fin == -1:
+                break
+            posicion = texto.find(subcadena, fin + 1)
+        return indices
+    
+    def stats(self):
+        """Entradas y carpetas indexadas y carpetas vigiladas"""
+        snapshot, capa = self.snapshot, self.capa
+        if capa is not None and capa[0] is snapshot:
+            entradas = capa[3]
+        else:
+            entradas = len(snapshot["nombres"]) if snapshot else 0
+        return {"entradas": entradas, "carpetas": len(self.carpetas),
+                "vigiladas": len(self.watcher.directories()), "indexando": self.indexando}
+    
+    @pyqtSlot(list)
+    def _watch(self, rutas):
+        """Vigila carpetas hasta max_watches"""
+        libres = self.max_watches - len(self.watcher.directories())
+        if libres > 0 and rutas:
+            self.watcher.addPaths(rutas[:libres])
+    
+    @pyqtSlot(str)
+    def _on_directory_changed(self, ruta):
+        self.trabajos.put(("actualizar", ruta, self.generacion))
+
+
+# Historial de comandos persistente con búsqueda
+class CommandHistory:
+    """Historial en SQLite con escritura en segundo plano y búsqueda por prefijo, subcadena y difusa"""
+    def __init__(self, path, memoria=500):
+        self.path = path
+        self.memoria = memoria        # Entradas recientes que se conservan en memoria
+        self._recientes = None        # Se cargan la primera vez que se navega
+        self._lector = None           # Conexión de lectura del hilo de la interfaz
+        self.cola = queue.Queue()
+        self._escritor = threading.Thread(target=self._write_loop, daemon=True)
+        self._escritor.start()
+    
+    def _conectar(self):
+        """Abre una conexión y crea el esquema si hace falta"""
+        conexion = sqlite3.connect(self.path, timeout=5)
+        # WAL permite leer desde la interfaz mientras el escritor inserta
+        conexion.execute("PRAGMA journal_mode=WAL")
+        conexion.execute("PRAGMA synchronous=NORMAL")
+        conexion.execute("CREATE TABLE IF NOT EXISTS historial ("
+                         "id INTEGER PRIMARY KEY, comando TEXT NOT NULL, momento REAL NOT NULL, origen TEXT)")
+        # Una fila por comando distinto: la clave primaria sirve de índice para los prefijos
+        conexion.execute("CREATE TABLE IF NOT EXISTS frecuencias ("
+                         "comando TEXT PRIMARY KEY, veces INTEGER NOT NULL, ultimo REAL NOT NULL)")
+        # Índice de ranking que incluye el comando: las búsquedas LIKE no tocan la tabla
+        conexion.execute("CREATE INDEX IF NOT EXISTS frecuencias_ranking ON frecuencias(veces DESC, ultimo DESC, comando)")
+        conexion.commit()
+        return conexion
+    
+    @property
+    def lector(self):
+        if self._lector is None:
+            self._lector = self._conectar()
+        return self._lector
+    
+    @property
+    def recientes(self):
+        """Últimas entradas en orden cronológico (carga perezosa)"""
+        if self._recientes is None:
+            filas = self.lector.execute("SELECT comando FROM historial ORDER BY id DESC LIMIT ?",
+                                        (self.memoria,)).fetchall()
+            self._recientes = collections.deque((fila[0] for fila in reversed(filas)), maxlen=self.memoria)
+        return self._recientes
+    
+    def add(self, comando, origen="texto"):
+        """Añade un comando; la escritura en disco se hace en segundo plano"""
+        comando = comando.strip()
+        if not comando:
+            return
+        if self._recientes is not None:
+            self._recientes.append(comando)
+        self.cola.put((comando, time.time(), origen))
+    
+    def _write_loop(self):
+        """Hilo escritor: inserta en lotes lo que se acumula en la cola"""
+        conexion = self._conectar()
+        activo = True
+        while activo:
+            lote = [self.cola.get()]
+            while len(lote) < 200:
                 try:
-                    current_timestamp = datetime.datetime.now().strftime("[%H:%M:%S] ")
-                    self.setTextColor(QColor(colors["timestamp"]))
-                    self.insertPlainText(current_timestamp)
-
-                    emoji = emojis.get(message_type, "")
-                    if emoji:
-                        # Los emojis no tienen color de texto, usan el de la fuente
-                        self.insertPlainText(f"{emoji} ") 
-
-                    if message_type == "comando":
-                        self.setTextColor(QColor(colors["prompt"]))
-                        self.insertPlainText(f"{prompt_text} ")
-                        self.setTextColor(QColor(colors["comando_text"]))
-                        self.append(message) 
-                    else:
-                        prefix_map = {
-                            "respuesta": "Respuesta: " if not is_black_and_white_theme else "", # Sin prefijo textual en B&W
-                            "error": "Error: " if not is_black_and_white_theme else "",
-                            "sistema": "Sistema: " if not is_black_and_white_theme else "",
-                            "normal": ""
-                        }
-                        prefix = prefix_map.get(message_type, "")
-                        
-                        self.setTextColor(QColor(colors.get(message_type, colors["normal"])))
-                        if prefix: # Solo añadir prefijo si no es tema B&W (para mantener limpieza)
-                            self.insertPlainText(prefix)
-                        self.append(message)
-                except Exception as e:
-                    print(f"Error al procesar mensaje individual: {e}")
-                    continue
-            
-            self.buffer.clear()
-            
-            cursor = self.textCursor()
-            cursor.movePosition(QTextCursor.End)
-            self.setTextCursor(cursor)
-            
-            if self.document().blockCount() > self.max_buffer:
-                cursor = self.textCursor()
-                cursor.movePosition(QTextCursor.Start)
-                blocks_to_remove = self.document().blockCount() - self.max_buffer
-                if blocks_to_remove > 0:
-                     cursor.movePosition(QTextCursor.Down, QTextCursor.KeepAnchor, blocks_to_remove)
-                     cursor.removeSelectedText()
-            
-            self.setUpdatesEnabled(True)
-            
-        except Exception as e:
-            print(f"Error en flush_buffer: {e}")
-            self.buffer.clear()  # Limpiar buffer para evitar bucles infinitos
+                    lote.append(self.cola.get_nowait())
+                except queue.Empty:
+                    break
+            if None in lote:
+                activo = False
+                lote = [entrada for entrada in lote if entrada is not None]
+            if not lote:
+                continue
+            try:
+                conexion.executemany("INSERT INTO historial (comando, momento, origen) VALUES (?, ?, ?)", lote)
+                conexion.executemany(
+                    "INSERT INTO frecuencias (comando, veces, ultimo) VALUES (?, 1, ?) "
+                    "ON CONFLICT(comando) DO UPDATE SET veces = veces + 1, ultimo = excluded.ultimo",
+                    [(comando, momento) for comando, momento, _ in lote])
+                conexion.commit()
+            except Exception as e:
+                print(f"Error al guardar el historial: {e}")
+        conexion.close()
+    
+    @staticmethod
+    def _escapar_like(texto):
+        return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    
+    def search(self, texto, limite=10):
+        """Comandos que coinciden con texto: prefijo, luego subcadena y luego subsecuencia
+        
+        Dentro de cada grupo se ordenan por frecuencia de uso y después por el más reciente.
+        """
+        texto = texto.strip()
+        orden = " ORDER BY veces DESC, ultimo DESC LIMIT ?"
+        if not texto:
+            filas = self.lector.execute("SELECT comando FROM frecuencias" + orden, (limite,)).fetchall()
+            return [fila[0] for fila in filas]
+        
+        escapado = self._escapar_like(texto)
+        consultas = [
+            # Prefijo exacto: rango sobre la clave primaria, usa el índice
+            ("SELECT comando FROM frecuencias WHERE comando >= ? AND comando < ?" + orden,
+             (texto, texto + "\U0010ffff")),
+            # Subcadena y subsecuencia recorren el índice de ranking ya ordenado, así
+            # que la consulta termina en cuanto encuentra limite coincidencias
+            ("SELECT comando FROM frecuencias INDEXED BY frecuencias_ranking "
+             "WHERE comando LIKE ? ESCAPE '\\'" + orden,
+             (f"%{escapado}%",)),
+            # Subsecuencia al estilo Ctrl+R: "gst" encuentra "git status"
+            ("SELECT comando FROM frecuencias INDEXED BY frecuencias_ranking "
+             "WHERE comando LIKE ? ESCAPE '\\'" + orden,
+             ("%" + "%".join(self._escapar_like(c) for c in texto) + "%",)),
+        ]
+        resultados = []
+        vistos = set()
+        for consulta, parametros in consultas:
+            for (comando,) in self.lector.execute(consulta, parametros + (limite,)):
+                if comando not in vistos:
+                    vistos.add(comando)
+                    resultados.append(comando)
+            if len(resultados) >= limite:
+                break
+        return resultados[:limite]
+    
+    def frequency(self, comando):
+        """Veces que se ha usado un comando"""
+        fila = self.lector.execute("SELECT veces FROM frecuencias WHERE comando = ?", (comando,)).fetchone()
+        return fila[0] if fila else 0
+    
+    def close(self):
+        """Escribe lo pendiente y cierra las conexiones"""
+        self.cola.put(None)
+        self._escritor.join(timeout=2)
+        if self._lector is not None:
+            self._lector.close()
+            self._lector = None
 
 
 # Clase principal que implementa la ventana del asistente de voz
@@ -576,15 +3950,51 @@ class AsistenteVozQT(QMainWindow):
         self.sistema_operativo = platform.system() 
         self.escuchando = False                    
         self.prefijo_comando = "ejecutar"          
-        self.historial_comandos = []               
-        self.indice_historial = 0                  
+        # Historial persistente; indice_historial es None cuando no se está navegando
+        historial_path = os.path.join(os.path.expanduser("~"), ".asistente_voz_qt_historial.sqlite3")
+        self.historial = CommandHistory(historial_path)
+        self.indice_historial = None
+        self.busqueda_historial = None             # (consulta, resultados, posición) de Ctrl+R
         
         self.ruta_trabajo = os.path.expanduser("~") 
+        # Listados cacheados; listado_actual es (ruta, inicio de la página siguiente)
+        self.lister = DirectoryLister(parent=self)
+        self.listado_actual = None
+        self.recognition_backend = "google"         # Motor de reconocimiento configurado
+        self.recognition_options = {}               # Opciones del motor (p. ej. model_path)
+        self.recognition_cache_enabled = True       # Caché de resultados por huella acústica
+        self.directory_threshold = 0.75             # Confianza mínima de "ir a" con nombres parecidos
+        self.directory_bookmarks = []               # Carpetas favoritas donde buscar esos nombres
+        self.current_theme = "black_and_white"
+        self.tts_enabled = True                     # Síntesis de voz activada por defecto
+        self.energy_threshold = 3000                # Sensibilidad inicial del micrófono
+        
+        # Configuración en memoria; se guarda en segundo plano y se recarga si cambia el archivo
+        config_path = os.path.join(os.path.expanduser("~"), ".asistente_voz_qt_config.json")
+        self.config = ConfigStore(config_path)
+        self.config.changed.connect(self.on_config_changed)
         self.cargar_configuracion()                 
+        self.directory_resolver = DirectoryResolver(self.lister, self.directory_bookmarks)
+        
+        # Compilar las tablas de intenciones y correcciones una sola vez
+        self.intent_matcher = IntentMatcher()
+        self.normalizer = TextNormalizer()
+        
+        # Frases con varias órdenes: plan en curso, planes en espera y paso que se está lanzando
+        self.planner = CommandPlanner(self.intent_matcher)
+        self.plan_actual = None
+        self.planes_en_espera = collections.deque()
+        self.paso_actual = None
+        self.ids_paso = None
+        
+        # Índice difuso para comandos mal reconocidos: por encima de fuzzy_auto_threshold
+        # se ejecuta si es una consulta (FUZZY_AUTO_INTENTS), por encima de fuzzy_suggest_threshold se sugiere
+        self.fuzzy_index = FuzzyCommandIndex()
+        self.fuzzy_auto_threshold = 0.8
+        self.fuzzy_suggest_threshold = 0.5
         
         # Inicializar el módulo Text-to-Speech
         self.tts_manager = TextToSpeechManager()
-        self.tts_enabled = True  # Por defecto, activado
         
         self.setup_ui()
         self.setup_threads()
@@ -595,7 +4005,8 @@ class AsistenteVozQT(QMainWindow):
         
         # Mensaje de bienvenida por voz
         if self.tts_enabled and self.tts_manager.available:
-            self.tts_manager.speak("¡Bienvenido al terminal de Windows comandado por voz!")
+            self.tts_manager.speak("¡Bienvenido al terminal de Windows comandado por voz!",
+                                   TextToSpeechManager.PRIORITY_HIGH)
             
     def setup_ui(self):
         """Configura todos los elementos de la interfaz gráfica"""
@@ -639,7 +4050,7 @@ class AsistenteVozQT(QMainWindow):
         self.console_label.setObjectName("console_label_id")
         self.left_layout.addWidget(self.console_label)
         
-        self.consola = ConsoleTextEdit(parent_window=self) # Pasar referencia
+        self.consola = ConsoleTextEdit(parent_window=self, max_lines=2000) # Pasar referencia
         self.left_layout.addWidget(self.consola)
         
         # Configurar el timer de la consola desde el hilo principal
@@ -685,12 +4096,12 @@ class AsistenteVozQT(QMainWindow):
         self.audio_level.setValue(0)
         self.voice_layout.addWidget(self.audio_level)
         
-        self.sensitivity_label = QLabel("Sensibilidad: 3000")
+        self.sensitivity_label = QLabel(f"Sensibilidad: {self.energy_threshold}")
         self.voice_layout.addWidget(self.sensitivity_label)
         
         self.sensitivity_slider = QSlider(Qt.Horizontal)
         self.sensitivity_slider.setRange(1000, 6000)  # Rango más amplio y optimizado
-        self.sensitivity_slider.setValue(3000)        # Valor inicial más bajo para mejor sensibilidad
+        self.sensitivity_slider.setValue(self.energy_threshold)  # Valor guardado (3000 por defecto)
         self.sensitivity_slider.setTickPosition(QSlider.TicksBelow)
         self.sensitivity_slider.setTickInterval(500)  # Intervalos más precisos
         self.sensitivity_slider.valueChanged.connect(self.update_sensitivity)
@@ -739,7 +4150,9 @@ class AsistenteVozQT(QMainWindow):
         self.commands_list.setReadOnly(True)
         
         comandos_texto = """• "ejecutar [comando]" - Ejecuta comando de terminal
+• "cancelar comandos" - Detiene los comandos en ejecución
 • "listar" o "mostrar archivos" - Lista directorios
+• "más archivos" - Siguiente página del listado
 • "directorio actual" - Muestra ruta actual
 • "cambiar directorio a [ruta]" - Cambia de directorio
 • "establecer ruta a [ruta]" - Cambia ruta de trabajo
@@ -752,13 +4165,16 @@ class AsistenteVozQT(QMainWindow):
 • "fecha" o "qué día es" - Muestra la fecha actual
 • "abrir navegador" - Abre navegador predeterminado
 • "buscar [término]" - Busca en Google
+• "buscar archivo [nombre]" - Busca en la ruta de trabajo
 • "mostrar procesos" - Lista procesos en ejecución
 • "uso de memoria" - Muestra uso de memoria RAM
 • "uso de disco" - Muestra espacio en disco
 • "conexiones de red" - Muestra conexiones activas
 • "activar voz" - Activa la síntesis de voz
 • "desactivar voz" - Desactiva la síntesis de voz
+• "métricas" - Muestra latencias y contadores internos
 • "salir" o "terminar" - Cierra la aplicación
+• Encadena órdenes con "y", "y luego" o "después" (ej: "crear carpeta demo y luego ir a demo")
 
 CONSEJOS PARA MEJOR RECONOCIMIENTO:
 • Habla claro y despacio
@@ -784,25 +4200,62 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
     
     def setup_threads(self):
         """Configura los hilos para reconocimiento de voz y nivel de audio"""
-        self.audio_thread = AudioLevelThread()
+        # El medidor lee el mismo audio que captura el reconocedor
+        self.audio_tap = StreamTap()
+        self.audio_thread = AudioLevelThread(source=self.audio_tap)
         self.audio_thread.level_updated.connect(self.update_audio_level)
         
+        # Motor de reconocimiento configurado; si no se puede crear se usa Google
+        try:
+            backend = create_recognition_backend(self.recognition_backend, self.recognition_options)
+        except Exception as e:
+            self.agregar_mensaje(f"No se pudo iniciar el motor '{self.recognition_backend}': {e}. Usando Google.", "error")
+            backend = GoogleRecognitionBackend()
+        
+        # Las repeticiones de un mismo comando se responden desde la caché
+        self.recognition_cache = None
+        if self.recognition_cache_enabled:
+            cache_path = os.path.join(os.path.expanduser("~"), ".asistente_voz_qt_cache.json")
+            self.recognition_cache = RecognitionCache(path=cache_path, intent_matcher=self.intent_matcher,
+                                                      normalizer=self.normalizer, fuzzy_index=self.fuzzy_index)
+            backend = CachedRecognitionBackend(backend, self.recognition_cache)
+        
         # Usar un umbral inicial más bajo para mejor sensibilidad
-        self.speech_thread = SpeechRecognitionThread(energy_threshold=3000)
+        self.speech_thread = SpeechRecognitionThread(energy_threshold=self.energy_threshold, normalizer=self.normalizer,
+                                                     audio_tap=self.audio_tap, backend=backend,
+                                                     intent_matcher=self.intent_matcher)
         self.speech_thread.command_recognized.connect(self.on_command_recognized)
         self.speech_thread.status_message.connect(self.on_status_message)
+        self.speech_thread.calibration_finished.connect(self.on_calibration_finished)
+        
+        # Pool de ejecución de comandos de terminal
+        self.command_executor = CommandExecutor(max_workers=2, max_pending=8, timeout=15)
+        self.command_executor.command_output.connect(self.on_command_output)
+        self.command_executor.command_finished.connect(self.on_command_finished)
+        self.command_executor.directory_changed.connect(self.on_shell_directory_changed)
+        self.command_executor.shell_restarted.connect(self.on_shell_restarted)
+        
+        # Índice de archivos de la ruta de trabajo para "buscar archivo"
+        self.estado_indice = ""
+        self.file_index = FileIndex(parent=self)
+        self.file_index.progress.connect(self.on_index_progress)
+        self.file_index.ready.connect(self.on_index_ready)
+        self.file_index.build(self.ruta_trabajo)
     
     def toggle_tts(self):
         """Activa o desactiva la síntesis de voz"""
         self.tts_enabled = not self.tts_enabled
         self.tts_button.setText("Voz: Activada" if self.tts_enabled else "Voz: Desactivada")
         mensaje = "Síntesis de voz activada" if self.tts_enabled else "Síntesis de voz desactivada"
+        if not self.tts_enabled:
+            self.tts_manager.cancel()
+        self.config.set('tts_enabled', self.tts_enabled)
         self.agregar_mensaje(mensaje, "sistema")
         
         # Confirmación por voz si se activó
         if self.tts_enabled and self.tts_manager.available:
             # Aquí sí usamos el mensaje completo porque es relevante
-            self.tts_manager.speak(mensaje)
+            self.tts_manager.speak(mensaje, TextToSpeechManager.PRIORITY_HIGH)
     
     def toggle_theme(self):
         """Cambia entre tema claro y negro/blanco"""
@@ -810,6 +4263,7 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
             self.current_theme = "black_and_white"
         else:
             self.current_theme = "light"
+        self.config.set('theme', self.current_theme)
         self.apply_theme()
     
     def apply_theme(self):
@@ -852,7 +4306,7 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
                     padding: 5px;
                     font-size: 10pt;
                 }
-                QTextEdit { 
+                QTextEdit, QPlainTextEdit { 
                     background-color: black;
                     color: white;
                     border: 1px solid #333333; /* Borde sutil para áreas de texto */
@@ -930,7 +4384,7 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
                     border: 1px solid #C0C0C0; border-radius: 3px;
                     padding: 5px; font-size: 10pt;
                 }
-                QTextEdit { 
+                QTextEdit, QPlainTextEdit { 
                     background-color: #FFFFFF; color: #333333;
                     border: 1px solid #C0C0C0; border-radius: 3px;
                 }
@@ -959,7 +4413,7 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
                 QSplitter::handle:hover { background-color: #C0C0C0; }
             """)
             self.consola.setStyleSheet("""
-                QTextEdit {
+                QPlainTextEdit {
                     background-color: #282c34; color: #abb2bf; /* Estilo original de consola para tema claro */
                     font-family: Consolas, Courier, monospace; font-size: 10pt;
                     border-radius: 5px; padding: 5px; border: 1px solid #202328;
@@ -983,7 +4437,8 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
                  QPushButton:hover { background-color: #2980b9; }
             """)
         self.update_mic_button_style()
-        self.consola.flush_buffer() # Refrescar colores de la consola
+        self.consola.set_theme(self.current_theme) # Formatos precalculados del tema
+        self.consola.refresh_theme() # Refrescar colores de la consola
 
     def update_mic_button_style(self):
         """Actualiza el estilo del botón del micrófono según el estado de escucha y el tema."""
@@ -1024,6 +4479,9 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
             elif key == Qt.Key_Down:
                 self.navegar_historial_abajo()
                 return True
+            elif key == Qt.Key_R and event.modifiers() & Qt.ControlModifier:
+                self.buscar_en_historial()
+                return True
         return super().eventFilter(source, event)
     
     @pyqtSlot(float)
@@ -1034,10 +4492,12 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
     @pyqtSlot(str)
     def on_command_recognized(self, command):
         """Maneja un comando reconocido por voz"""
+        # Un comando nuevo interrumpe cualquier confirmación pendiente
+        self.tts_manager.cancel()
         self.agregar_mensaje(command, "comando")
         
-        self.historial_comandos.append(command)
-        self.indice_historial = len(self.historial_comandos)
+        self.historial.add(command, origen="voz")
+        self.indice_historial = None
         
         if hasattr(self, 'speech_thread'):
             self.speech_thread.pause()
@@ -1047,7 +4507,8 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
     def procesar_comando_seguro(self, comando):
         """Procesa el comando de forma segura y reanuda reconocimiento al terminar"""
         try:
-            # Ejecutar en el hilo principal para evitar problemas con QTimer
+            # Los comandos de terminal se despachan al pool, por lo que esto
+            # vuelve enseguida y el reconocimiento se reanuda sin esperar
             self.procesar_comando(comando)
         except Exception as e:
             self.agregar_mensaje(f"Error al procesar comando: {str(e)}", "error")
@@ -1064,70 +4525,146 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
     def on_status_message(self, message):
         """Actualiza la barra de estado con mensajes del reconocedor"""
         base_status = f"Sistema: {platform.system()} {platform.release()} | Ruta: {self.ruta_trabajo}"
+        if getattr(self, 'estado_indice', ""):
+            base_status += f" | {self.estado_indice}"
         self.status_bar.setText(f"{base_status} | Estado: {message}")
     
+    @pyqtSlot(int, int)
+    def on_index_progress(self, archivos, carpetas):
+        """Muestra el avance del índice de archivos en la barra de estado"""
+        self.estado_indice = f"Indexando: {archivos:,} archivos en {carpetas:,} carpetas"
+        self.on_status_message(self.status_bar.text().split("| Estado:")[-1].strip())
+    
+    @pyqtSlot(int, float)
+    def on_index_ready(self, entradas, segundos):
+        """El índice de archivos está listo para buscar"""
+        self.estado_indice = f"Índice: {entradas:,} entradas en {segundos:.1f} s"
+        self.on_status_message(self.status_bar.text().split("| Estado:")[-1].strip())
+    
     def navegar_historial_arriba(self):
         """Navega hacia arriba en el historial de comandos"""
-        if self.historial_comandos and self.indice_historial > 0:
-            self.indice_historial -= 1
-            self.command_input.setText(self.historial_comandos[self.indice_historial])
+        recientes = self.historial.recientes
+        indice = len(recientes) if self.indice_historial is None else self.indice_historial
+        if indice > 0:
+            self.indice_historial = indice - 1
+            self.command_input.setText(recientes[self.indice_historial])
     
     def navegar_historial_abajo(self):
         """Navega hacia abajo en el historial de comandos"""
-        if self.historial_comandos and self.indice_historial < len(self.historial_comandos) - 1:
+        if self.indice_historial is None:
+            return
+        recientes = self.historial.recientes
+        if self.indice_historial < len(recientes) - 1:
             self.indice_historial += 1
-            self.command_input.setText(self.historial_comandos[self.indice_historial])
-        elif self.indice_historial == len(self.historial_comandos) - 1:
-            self.indice_historial = len(self.historial_comandos)
+            self.command_input.setText(recientes[self.indice_historial])
+        else:
+            self.indice_historial = None
             self.command_input.clear()
     
+    def buscar_en_historial(self):
+        """Búsqueda estilo Ctrl+R: cada pulsación muestra la siguiente coincidencia"""
+        texto = self.command_input.text()
+        busqueda = self.busqueda_historial
+        # Si el texto es el resultado mostrado antes, continuar con la misma búsqueda
+        if busqueda and busqueda[1] and texto == busqueda[1][busqueda[2]]:
+            consulta, resultados, posicion = busqueda
+            posicion = (posicion + 1) % len(resultados)
+        else:
+            consulta = texto
+            resultados = self.historial.search(consulta, limite=20)
+            posicion = 0
+        if not resultados:
+            self.busqueda_historial = None
+            self.on_status_message(f"Sin coincidencias en el historial para '{consulta}'")
+            return
+        self.busqueda_historial = (consulta, resultados, posicion)
+        self.command_input.setText(resultados[posicion])
+        self.on_status_message(f"Historial '{consulta}': {posicion + 1}/{len(resultados)} (Ctrl+R para la siguiente)")
+    
     def cargar_configuracion(self):
-        """Carga la configuración guardada si existe"""
-        config_path = os.path.join(os.path.expanduser("~"), ".asistente_voz_qt_config.json")
-        try:
-            if os.path.exists(config_path):
-                with open(config_path, 'r') as f:
-                    config = json.load(f)
-                    if 'ruta_trabajo' in config and os.path.exists(config['ruta_trabajo']):
-                        self.ruta_trabajo = config['ruta_trabajo']
-                    # Cargar tema guardado, default a "black_and_white"
-                    self.current_theme = config.get('theme', 'black_and_white') 
-                    # Cargar configuración de síntesis de voz, activada por defecto
-                    self.tts_enabled = config.get('tts_enabled', True)
-        except Exception as e:
-            print(f"Error al cargar configuración: {e}")
-            self.current_theme = "black_and_white" # Default en caso de error
-            self.tts_enabled = True
+        """Toma la configuración del almacén en memoria"""
+        ruta = self.config.get('ruta_trabajo')
+        if ruta and os.path.exists(ruta):
+            self.ruta_trabajo = ruta
+        # Tema guardado, "black_and_white" por defecto
+        self.current_theme = self.config.get('theme', 'black_and_white')
+        # Síntesis de voz, activada por defecto
+        self.tts_enabled = self.config.get('tts_enabled', True)
+        self.energy_threshold = self.config.get('energy_threshold', 3000)
+        # Motor de reconocimiento: "google", "vosk", "whisper" o "fake"
+        self.recognition_backend = self.config.get('recognition_backend', 'google')
+        self.recognition_options = self.config.get('recognition_options', {})
+        self.recognition_cache_enabled = self.config.get('recognition_cache', True)
+        # Confianza mínima para entrar en una carpeta parecida a la nombrada y carpetas favoritas
+        self.directory_threshold = self.config.get('directory_threshold', 0.75)
+        self.directory_bookmarks = self.config.get('directory_bookmarks', [])
 
     def guardar_configuracion(self):
-        """Guarda la configuración actual"""
-        config_path = os.path.join(os.path.expanduser("~"), ".asistente_voz_qt_config.json")
-        try:
-            config = {
-                'ruta_trabajo': self.ruta_trabajo,
-                'theme': self.current_theme,
-                'tts_enabled': self.tts_enabled
-            }
-            with open(config_path, 'w') as f:
-                json.dump(config, f)
-        except Exception as e:
-            print(f"Error al guardar configuración: {e}")
+        """Actualiza la configuración en memoria; el archivo se escribe en segundo plano"""
+        self.config.update({
+            'ruta_trabajo': self.ruta_trabajo,
+            'theme': self.current_theme,
+            'tts_enabled': self.tts_enabled,
+            'energy_threshold': self.energy_threshold,
+            'recognition_backend': self.recognition_backend,
+            'recognition_options': self.recognition_options,
+            'recognition_cache': self.recognition_cache_enabled,
+            'directory_threshold': self.directory_threshold,
+            'directory_bookmarks': self.directory_bookmarks
+        })
+    
+    @pyqtSlot(dict)
+    def on_config_changed(self, cambios):
+        """Aplica en caliente los ajustes modificados a mano en el archivo"""
+        if 'theme' in cambios and cambios['theme'] != self.current_theme:
+            self.current_theme = cambios['theme']
+            self.apply_theme()
+        if 'tts_enabled' in cambios and cambios['tts_enabled'] != self.tts_enabled:
+            self.toggle_tts()
+        if 'energy_threshold' in cambios:
+            # Se aplica el valor del archivo tal cual, sin volver a guardarlo
+            self.aplicar_sensibilidad(int(cambios['energy_threshold']))
+        if 'ruta_trabajo' in cambios and cambios['ruta_trabajo'] != self.ruta_trabajo:
+            self.cambiar_ruta_trabajo(cambios['ruta_trabajo'])
+        if 'directory_threshold' in cambios:
+            self.directory_threshold = cambios['directory_threshold']
+        if 'directory_bookmarks' in cambios:
+            self.directory_bookmarks = cambios['directory_bookmarks']
+            self.directory_resolver.bookmarks = list(self.directory_bookmarks)
+        otros = set(cambios) - {'theme', 'tts_enabled', 'energy_threshold', 'ruta_trabajo',
+                                'directory_threshold', 'directory_bookmarks'}
+        if otros:
+            self.agregar_mensaje(f"Configuración recargada ({', '.join(sorted(otros))} se aplicará al reiniciar)", "sistema")
     
     def calibrate_microphone_manually(self):
         """Calibra manualmente el micrófono"""
         if hasattr(self, 'speech_thread') and self.speech_thread.isRunning():
-            # Forzar recalibración en el hilo de reconocimiento
-            self.speech_thread.last_adjustment_time = 0  # Forzar recalibración
+            # La medición se hace en el hilo de captura; el resultado llega por señal
+            self.calibrate_button.setEnabled(False)
+            self.speech_thread.request_calibration(duration=2.0)
             self.agregar_mensaje("Calibrando micrófono... Mantén silencio por 2 segundos", "sistema")
-            
-            # Programar mensaje de confirmación
-            QTimer.singleShot(3000, lambda: self.agregar_mensaje("Calibración completada", "sistema"))
         else:
             self.agregar_mensaje("Inicia la escucha primero para calibrar", "error")
     
+    @pyqtSlot(float, float)
+    def on_calibration_finished(self, ruido, umbral):
+        """Informa del ruido de fondo medido y del umbral resultante"""
+        self.calibrate_button.setEnabled(True)
+        self.agregar_mensaje(f"Calibración completada: ruido de fondo {ruido:.0f}, umbral {umbral:.0f}", "sistema")
+    
     def update_sensitivity(self, value):
-        """Actualiza el valor de sensibilidad del micrófono"""
+        """Actualiza el valor de sensibilidad del micrófono desde el slider y lo guarda"""
+        self.aplicar_sensibilidad(value)
+        self.config.set('energy_threshold', value)
+    
+    def aplicar_sensibilidad(self, value):
+        """Aplica la sensibilidad a la etiqueta, al slider y al reconocedor sin guardarla"""
         self.sensitivity_label.setText(f"Sensibilidad: {value}")
+        self.energy_threshold = value
+        # El slider recorta los valores fuera de su rango; el del archivo se respeta igualmente
+        self.sensitivity_slider.blockSignals(True)
+        self.sensitivity_slider.setValue(value)
+        self.sensitivity_slider.blockSignals(False)
         if hasattr(self, 'speech_thread'):
             self.speech_thread.set_energy_threshold(value)
     
@@ -1156,6 +4693,7 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
         self.mic_button.setText("Iniciar Escucha")
         self.agregar_mensaje("Escucha detenida", "sistema")
         self.audio_level.setValue(0)
+        self.calibrate_button.setEnabled(True)  # Una calibración en curso se abandona
         
         if self.audio_thread.isRunning():
             self.audio_thread.stop()
@@ -1181,6 +4719,7 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
                 self.on_status_message(self.status_bar.text().split("| Estado:")[-1].strip()) 
                 self.agregar_mensaje(f"Ruta de trabajo cambiada a: {self.ruta_trabajo}", "sistema")
                 self.guardar_configuracion()
+                self.file_index.build(self.ruta_trabajo)
             else:
                 self.agregar_mensaje(f"Error: La ruta '{nueva_ruta}' no existe o no es accesible", "error")
         except Exception as e:
@@ -1190,26 +4729,32 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
         """Ejecuta un comando escrito en la entrada de texto"""
         comando = self.command_input.text().strip()
         if comando:
-            self.historial_comandos.append(comando)
-            self.indice_historial = len(self.historial_comandos)
+            self.historial.add(comando)
+            self.indice_historial = None
+            self.busqueda_historial = None
             
             self.agregar_mensaje(comando, "comando")
-            self.procesar_comando_seguro(comando.lower())
+            self.procesar_comando_seguro(self.normalizer.normalize(comando))
             self.command_input.clear()
     
     def agregar_mensaje(self, mensaje, tipo="normal"):
         """Agrega un mensaje a la consola y lo habla si es apropiado"""
         self.consola.append_message(mensaje, tipo)
         
+        # Dentro de un plan solo se habla la confirmación conjunta del final
+        if self.paso_actual is not None:
+            CommandPlan.record(self.paso_actual, mensaje, tipo)
+            return
+        
         # Hablar el mensaje si corresponde y la síntesis de voz está activada
         if self.tts_enabled and self.tts_manager.available:
             # Solo hablar respuestas y mensajes del sistema, no comandos ni errores
             if tipo == "respuesta":
                 # Crear un mensaje más breve para la síntesis de voz
                 mensaje_voz = self.generar_respuesta_voz(mensaje)
-                self.tts_manager.speak(mensaje_voz)
+                self.tts_manager.speak(mensaje_voz, TextToSpeechManager.PRIORITY_NORMAL)
             elif tipo == "sistema" and len(mensaje) < 100:
-                self.tts_manager.speak(mensaje)
+                self.tts_manager.speak(mensaje, TextToSpeechManager.PRIORITY_LOW)
                 
     def generar_respuesta_voz(self, mensaje):
         """Genera una respuesta breve para la síntesis de voz"""
@@ -1249,40 +4794,73 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
         return "Comando confirmado."
     
     def ejecutar_comando_terminal(self, comando_str):
-        """Ejecuta un comando en la terminal del sistema y devuelve (mensaje, tipo_mensaje)"""
+        """Ejecuta un comando de forma síncrona y devuelve (mensaje, tipo_mensaje)"""
+        return self.command_executor.run_command(comando_str, self.ruta_trabajo)
+    
+    def despachar_comando_terminal(self, comando_str):
+        """Envía un comando al pool de ejecución sin bloquear la interfaz"""
+        id_comando = self.command_executor.submit(comando_str, self.ruta_trabajo)
+        if id_comando is None:
+            self.agregar_mensaje("Hay demasiados comandos en ejecución. Espera o di 'cancelar comandos'.", "error")
+        elif self.ids_paso is not None:
+            self.ids_paso.append(id_comando)
+        return id_comando
+    
+    def despachar_consulta_sistema(self, consulta, comando_respaldo):
+        """Resuelve una consulta del sistema en Python; el comando solo se usa si no hay alternativa nativa"""
+        id_comando = self.command_executor.submit_task(
+            consulta, lambda: system_report(consulta), comando_respaldo, self.ruta_trabajo)
+        if id_comando is None:
+            self.agregar_mensaje("Hay demasiados comandos en ejecución. Espera o di 'cancelar comandos'.", "error")
+        elif self.ids_paso is not None:
+            self.ids_paso.append(id_comando)
+        return id_comando
+    
+    @pyqtSlot(int, str, str)
+    def on_command_output(self, id_comando, texto, tipo):
+        """Muestra un bloque de salida de un comando en ejecución"""
         try:
-            proceso = subprocess.Popen(
-                comando_str, 
-                shell=True, 
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                cwd=self.ruta_trabajo, 
-                creationflags=subprocess.CREATE_NO_WINDOW if platform.system() == "Windows" else 0
-            )
-            try:
-                stdout, stderr = proceso.communicate(timeout=15) 
-                
-                if proceso.returncode == 0:
-                    if len(stdout) > 5000: 
-                        return "Comando ejecutado correctamente. La respuesta es muy extensa para mostrarla completa.", "respuesta"
-                    return stdout, "respuesta"  # Cambio de "normal" a "respuesta"
-                else:
-                    if len(stderr) > 2000:
-                        return "Error al ejecutar el comando. La salida de error es muy extensa.", "error"
-                    return stderr, "error"
-            except subprocess.TimeoutExpired:
-                proceso.kill()
-                proceso.communicate() 
-                return "Error: Comando cancelado (timeout > 15s).", "error"
-                
-        except PermissionError:
-            return "Error: Permisos insuficientes.", "error"
-        except FileNotFoundError:
-            return f"Error: Comando '{comando_str.split()[0]}' no encontrado.", "error"
-        except Exception as e:
-            return f"Excepción al ejecutar: {str(e)}", "error"
-
+            self.consola.append_message(texto, tipo)
+        finally:
+            # Liberar el hueco aunque falle la consola para no bloquear al lector
+            self.command_executor.chunk_consumed()
+    
+    @pyqtSlot(int, str)
+    def on_shell_directory_changed(self, id_comando, ruta):
+        """Un comando de terminal cambió de directorio: la ruta de trabajo lo sigue para que
+        listar, crear y buscar actúen donde está el shell"""
+        if not os.path.isdir(ruta) or os.path.normcase(ruta) == os.path.normcase(self.ruta_trabajo):
+            return
+        try:
+            os.chdir(ruta)
+        except OSError as e:
+            self.agregar_mensaje(f"Error al cambiar directorio: {str(e)}", "error")
+            return
+        self.ruta_trabajo = os.getcwd()
+        self.current_path_label.setText(self.ruta_trabajo)
+        self.file_index.build(self.ruta_trabajo)
+        self.on_status_message(self.status_bar.text().split("| Estado:")[-1].strip())
+        self.agregar_mensaje(f"Directorio cambiado a: {self.ruta_trabajo}", "sistema")
+    
+    @pyqtSlot(int)
+    def on_shell_restarted(self, id_comando):
+        """El shell persistente anterior terminó (timeout, cancelación o exit) y se abrió otro"""
+        self.consola.append_message("Se abrió un shell nuevo: las variables y alias definidos antes se perdieron.",
+                                    "sistema")
+    
+    @pyqtSlot(int, str, str)
+    def on_command_finished(self, id_comando, mensaje, tipo):
+        """Muestra el resultado de un comando ejecutado en segundo plano"""
+        plan = self.plan_actual
+        if plan is not None and id_comando in plan.pendientes:
+            paso = plan.pendientes.pop(id_comando)
+            self.consola.append_message(mensaje, tipo)
+            CommandPlan.record(paso, mensaje, tipo)
+            if not plan.pendientes:
+                self.avanzar_plan()
+            return
+        self.agregar_mensaje(mensaje, tipo)
+    
     def procesar_comando(self, texto):
         """Procesa el comando de voz y ejecuta la acción correspondiente"""
         # Limpiar y normalizar el texto de entrada
@@ -1291,259 +4869,381 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
         # Agregar debug para ver qué comando se está procesando
         print(f"DEBUG: Procesando comando: '{texto}'")
         
-        # Salir de la aplicación
-        if any(palabra in texto for palabra in ["salir", "terminar", "adiós", "adios", "cerrar", "exit"]):
-            self.agregar_mensaje("Cerrando asistente...", "sistema")
-            if self.escuchando:
-                self.detener_escucha()
-            self.guardar_configuracion()
-            QTimer.singleShot(1000, self.close) 
+        # Varias órdenes en una frase se ejecutan como un plan
+        grupos, excluidos = self.planner.plan(texto)
+        for fragmento in excluidos:
+            self.agregar_mensaje(f"'{fragmento}' no se ejecuta dentro de una orden compuesta. Dilo por separado.", "sistema")
+        pasos = [paso for grupo in grupos for paso in grupo]
+        if len(pasos) > 1:
+            self.ejecutar_plan(grupos)
             return
-        
-        # Establecer ruta de trabajo
-        elif any(frase in texto for frase in ["establecer ruta a", "cambiar ruta a", "cambiar ruta de trabajo a", "ruta a"]):
-            nueva_ruta = None
-            palabras_clave = ["establecer ruta a", "cambiar ruta a", "cambiar ruta de trabajo a", "ruta a"]
-            for palabra in palabras_clave:
-                if palabra in texto:
-                    nueva_ruta = texto.split(palabra, 1)[1].strip()
-                    break
-            
-            if nueva_ruta:
-                self.cambiar_ruta_trabajo(nueva_ruta)
+        if excluidos:
+            if pasos:
+                texto = pasos[0][0]  # Solo queda una orden: se ejecuta como si se hubiera dicho sola
             else:
-                self.agregar_mensaje("No se especificó una ruta válida.", "error")
-            return
-            
-        # Usar ruta predeterminada (carpeta del usuario)
-        elif any(frase in texto for frase in ["usar ruta predeterminada", "ruta por defecto", "ruta predeterminada", "ruta home"]):
-            ruta_predeterminada = os.path.expanduser("~")
-            self.cambiar_ruta_trabajo(ruta_predeterminada)
-            return
+                return
         
-        # Cambiar de directorio
-        elif any(frase in texto for frase in ["cambiar directorio a", "ir a directorio", "cambiar a", "ir a"]):
-            directorio_str = None
-            palabras_clave = ["cambiar directorio a", "ir a directorio", "cambiar a", "ir a"]
-            for palabra in palabras_clave:
-                if palabra in texto:
-                    directorio_str = texto.split(palabra, 1)[1].strip()
-                    break
-            
-            if directorio_str:
-                directorio_destino = os.path.join(os.getcwd(), directorio_str) if not os.path.isabs(directorio_str) else directorio_str
-                try:
-                    os.chdir(directorio_destino) 
-                    self.ruta_trabajo = os.getcwd() 
-                    self.current_path_label.setText(self.ruta_trabajo)
-                    self.on_status_message(self.status_bar.text().split("| Estado:")[-1].strip())
-                    self.agregar_mensaje(f"Directorio cambiado a: {os.getcwd()}", "respuesta")
-                except FileNotFoundError:
-                    self.agregar_mensaje(f"Directorio '{directorio_destino}' no encontrado.", "error")
-                except Exception as e:
-                    self.agregar_mensaje(f"Error al cambiar directorio: {str(e)}", "error")
-            else:
-                self.agregar_mensaje("No se especificó un directorio.", "error")
+        # Resolver la intención en una sola pasada sobre el texto
+        intent, argumento = self.intent_matcher.resolve(texto)
+        if intent is None:
+            self.comando_no_reconocido(texto)
             return
         
-        # Crear carpeta
-        elif any(frase in texto for frase in ["crear carpeta", "nueva carpeta", "hacer carpeta", "crea carpeta"]):
-            palabras_clave = ["crear carpeta", "nueva carpeta", "hacer carpeta", "crea carpeta"]
-            nombre_carpeta = None
-            for palabra in palabras_clave:
-                if palabra in texto:
-                    nombre_carpeta = texto.split(palabra, 1)[1].strip()
-                    break
-            
-            if nombre_carpeta:
+        manejador = getattr(self, f"accion_{intent}")
+        manejador(argumento)
+    
+    def ejecutar_plan(self, grupos):
+        """Ejecuta los grupos en orden; las consultas de un mismo grupo se lanzan a la vez"""
+        pasos = [paso for grupo in grupos for paso in grupo]
+        descripcion = " → ".join(
+            " + ".join(texto for texto, _, _ in grupo) if len(grupo) > 1 else grupo[0][0] for grupo in grupos)
+        self.consola.append_message(f"Plan de {len(pasos)} órdenes: {descripcion}", "sistema")
+        self.planes_en_espera.append(CommandPlan(grupos))
+        if self.plan_actual is None:
+            self.plan_actual = self.planes_en_espera.popleft()
+            self.avanzar_plan()
+    
+    def avanzar_plan(self):
+        """Lanza grupos hasta que uno deje comandos en segundo plano o se acabe el plan"""
+        plan = self.plan_actual
+        while plan.grupos and not plan.pendientes:
+            # Una orden que cambia algo y falla deja sin sentido las que dependen de ella
+            ultimo = plan.pasos[-1] if plan.pasos else None
+            if ultimo and ultimo["errores"] and ultimo["intent"] not in READ_ONLY_INTENTS:
+                plan.omitidos = sum(len(grupo) for grupo in plan.grupos)
+                plan.grupos.clear()
+                break
+            for texto, intent, argumento in plan.grupos.popleft():
+                paso = plan.new_step(texto, intent)
+                self.paso_actual = paso
+                self.ids_paso = []
                 try:
-                    ruta_completa = os.path.join(self.ruta_trabajo, nombre_carpeta)
-                    os.makedirs(ruta_completa, exist_ok=True)
-                    self.agregar_mensaje(f"Carpeta creada: {ruta_completa}", "respuesta")
+                    if intent is None:
+                        self.comando_no_reconocido(texto)
+                    else:
+                        getattr(self, f"accion_{intent}")(argumento)
                 except Exception as e:
-                    self.agregar_mensaje(f"Error al crear carpeta: {str(e)}", "error")
-            else:
-                self.agregar_mensaje("No se especificó nombre para la carpeta.", "error")
-            return
-        
-        # Ejecutar comando directo de terminal
-        elif any(prefijo in texto for prefijo in ["ejecutar", "correr", "lanzar", "ejecuta"]):
-            # Encontrar el prefijo usado y extraer el comando
-            comando_terminal_str = None
-            for prefijo in ["ejecutar", "correr", "lanzar", "ejecuta"]:
-                if prefijo in texto:
-                    comando_terminal_str = texto.split(prefijo, 1)[1].strip()
-                    break
-            
-            if comando_terminal_str:
-                self.agregar_mensaje(f"Ejecutando: {comando_terminal_str}", "sistema")
-                resultado, tipo_resultado = self.ejecutar_comando_terminal(comando_terminal_str)
-                self.agregar_mensaje(resultado, tipo_resultado)
+                    self.agregar_mensaje(f"Error al procesar comando: {str(e)}", "error")
+                finally:
+                    for id_comando in self.ids_paso:
+                        plan.pendientes[id_comando] = paso
+                    self.paso_actual = None
+                    self.ids_paso = None
+        if plan.pendientes:
+            return  # on_command_finished continúa el plan
+        self.terminar_plan(plan)
+    
+    def terminar_plan(self, plan):
+        """Muestra y habla una sola confirmación con el resultado de cada paso"""
+        confirmaciones = []
+        for paso in plan.pasos:
+            if paso["errores"]:
+                confirmaciones.append(f"falló '{paso['texto']}'")
+            elif paso["intent"] in ("hora", "fecha") and paso["respuestas"]:
+                confirmaciones.append(paso["respuestas"][0].lower())  # La respuesta es corta: se dice entera
+            elif paso["intent"] in PLAN_CONFIRMATIONS:
+                confirmaciones.append(PLAN_CONFIRMATIONS[paso["intent"]])
+            elif paso["respuestas"]:
+                confirmaciones.append(self.generar_respuesta_voz(paso["respuestas"][0]).rstrip(".").lower())
             else:
-                self.agregar_mensaje("No se especificó comando a ejecutar.", "error")
-            return
-        
-        # Listar archivos y directorios
-        elif any(palabra in texto for palabra in ["listar", "mostrar archivos", "mostrar directorio", "lista", "ls", "dir", "ver archivos"]):
-            comando_ls = "dir" if self.sistema_operativo == "Windows" else "ls -la"
-            resultado, tipo_resultado = self.ejecutar_comando_terminal(comando_ls)
-            self.agregar_mensaje(resultado, tipo_resultado)
-            return
+                confirmaciones.append(f"'{paso['texto']}' hecho")
+        resumen = ", ".join(confirmaciones[:-1]) + (" y " if len(confirmaciones) > 1 else "") + confirmaciones[-1]
+        resumen = resumen[0].upper() + resumen[1:] + "."
+        if plan.omitidos:
+            resumen += (" Se omitió 1 orden por el error." if plan.omitidos == 1
+                        else f" Se omitieron {plan.omitidos} órdenes por el error.")
+        transcurrido = (time.perf_counter() - plan.inicio) * 1000
+        ordenes = "1 orden" if len(plan.pasos) == 1 else f"{len(plan.pasos)} órdenes"
+        self.consola.append_message(f"{resumen} ({ordenes} en {transcurrido:.0f} ms)", "sistema")
+        if self.tts_enabled and self.tts_manager.available:
+            self.tts_manager.speak(resumen, TextToSpeechManager.PRIORITY_NORMAL)
         
-        # Cambiar de directorio
-        elif "cambiar directorio" in texto or "ir a directorio" in texto:
-            partes = texto.split(" a ")
-            if len(partes) > 1:
-                directorio_str = partes[1].strip()
-                directorio_destino = os.path.join(os.getcwd(), directorio_str) if not os.path.isabs(directorio_str) else directorio_str
-                try:
-                    os.chdir(directorio_destino) 
-                    self.ruta_trabajo = os.getcwd() 
-                    self.current_path_label.setText(self.ruta_trabajo)
-                    self.on_status_message(self.status_bar.text().split("| Estado:")[-1].strip())
-                    self.agregar_mensaje(f"Directorio cambiado a: {os.getcwd()}", "respuesta")
-                except FileNotFoundError:
-                    self.agregar_mensaje(f"Directorio '{directorio_destino}' no encontrado.", "error")
-                except Exception as e:
-                    self.agregar_mensaje(f"Error al cambiar directorio: {str(e)}", "error")
-            else:
-                self.agregar_mensaje("No se especificó un directorio.", "error")
+        self.plan_actual = None
+        if self.planes_en_espera:
+            self.plan_actual = self.planes_en_espera.popleft()
+            self.avanzar_plan()
+    
+    def comando_no_reconocido(self, texto):
+        """Busca el comando más parecido; si no es seguro, informa y ofrece sugerencias"""
+        elegido, candidatos = self.fuzzy_index.resolve(texto, self.fuzzy_auto_threshold, self.fuzzy_suggest_threshold)
+        if elegido:
+            confianza, intent, argumento, frase = elegido
+            self.agregar_mensaje(f"Interpretado como '{frase} {argumento}'".rstrip() + f" ({confianza:.0%})", "sistema")
+            getattr(self, f"accion_{intent}")(argumento)
             return
-        
-        # Mostrar directorio actual
-        elif any(frase in texto for frase in ["directorio actual", "dónde estoy", "donde estoy", "ruta actual", "directorio"]):
-            self.agregar_mensaje(f"Directorio CWD: {os.getcwd()}", "respuesta")
-            self.agregar_mensaje(f"Ruta de trabajo: {self.ruta_trabajo}", "respuesta")
+        if candidatos:
+            self.agregar_mensaje(f"Comando no reconocido: '{texto}'.", "error")
+            for confianza, intent, argumento, frase in candidatos:
+                propuesta = f"{frase} {argumento}".strip()
+                self.agregar_mensaje(f"• ¿Quisiste decir '{propuesta}'? ({confianza:.0%})", "sistema")
             return
         
-        # Mostrar hora actual
-        elif any(frase in texto for frase in ["hora", "qué hora es", "que hora es", "hora actual", "tiempo"]):
-            self.agregar_mensaje(f"Son las {datetime.datetime.now().strftime('%H:%M:%S')}", "respuesta")
-            return
-            
-        # Mostrar fecha actual
-        elif any(frase in texto for frase in ["fecha", "qué día es", "que dia es", "qué fecha es", "fecha actual", "hoy"]):
-            self.agregar_mensaje(f"Hoy es {datetime.datetime.now().strftime('%d/%m/%Y')}", "respuesta")
-            return
-            
-        # Abrir navegador web
-        elif any(frase in texto for frase in ["abrir navegador", "abrir web", "navegador", "abrir browser", "internet"]):
+        sugerencias = [
+            "Intenta decir: 'listar', 'hora', 'fecha', 'información del sistema'",
+            "Para ejecutar comandos: 'ejecutar [comando]'",
+            "Para crear: 'crear carpeta [nombre]' o 'crear archivo [nombre]'",
+            "Para ayuda: 'comandos' o 'ayuda'"
+        ]
+        self.agregar_mensaje(f"Comando no reconocido: '{texto}'.", "error")
+        self.agregar_mensaje("Sugerencias:", "sistema")
+        for sugerencia in sugerencias:
+            self.agregar_mensaje(f"• {sugerencia}", "sistema")
+    
+    def accion_salir(self, argumento):
+        """Cierra la aplicación"""
+        self.agregar_mensaje("Cerrando asistente...", "sistema")
+        if self.escuchando:
+            self.detener_escucha()
+        self.guardar_configuracion()
+        QTimer.singleShot(1000, self.close)
+    
+    def accion_establecer_ruta(self, argumento):
+        """Establece la ruta de trabajo"""
+        if argumento:
+            self.cambiar_ruta_trabajo(argumento)
+        else:
+            self.agregar_mensaje("No se especificó una ruta válida.", "error")
+    
+    def accion_ruta_predeterminada(self, argumento):
+        """Usa la carpeta del usuario como ruta de trabajo"""
+        self.cambiar_ruta_trabajo(os.path.expanduser("~"))
+    
+    def accion_cambiar_directorio(self, argumento):
+        """Cambia el directorio actual; un nombre que no existe se busca entre las carpetas parecidas"""
+        directorio_str = argumento
+        if directorio_str:
+            directorio_destino = os.path.join(os.getcwd(), os.path.expanduser(directorio_str))
+            if not os.path.isdir(directorio_destino):
+                # Las carpetas se crean en la ruta de trabajo: "crear carpeta x y luego ir a x"
+                directorio_destino = os.path.join(self.ruta_trabajo, os.path.expanduser(directorio_str))
+            if not os.path.isdir(directorio_destino):
+                resuelto = self.resolver_directorio(directorio_str)
+                if resuelto is None:
+                    return
+                directorio_destino = resuelto
             try:
-                webbrowser.open("https://www.google.com")
-                self.agregar_mensaje("Abriendo navegador...", "respuesta")
+                os.chdir(directorio_destino) 
+                self.ruta_trabajo = os.getcwd() 
+                self.current_path_label.setText(self.ruta_trabajo)
+                self.file_index.build(self.ruta_trabajo)
+                self.on_status_message(self.status_bar.text().split("| Estado:")[-1].strip())
+                self.agregar_mensaje(f"Directorio cambiado a: {os.getcwd()}", "respuesta")
+            except FileNotFoundError:
+                self.agregar_mensaje(f"Directorio '{directorio_destino}' no encontrado.", "error")
             except Exception as e:
-                self.agregar_mensaje(f"No se pudo abrir navegador: {e}", "error")
-            return
-            
-        # Buscar en Google
-        elif "buscar" in texto or "busca" in texto:
-            busqueda = texto.replace("buscar", "").replace("busca", "").strip()
-            if busqueda:
-                try:
-                    url = f"https://www.google.com/search?q={busqueda.replace(' ', '+')}"
-                    webbrowser.open(url)
-                    self.agregar_mensaje(f"Buscando '{busqueda}'...", "respuesta")
-                except Exception as e:
-                    self.agregar_mensaje(f"No se pudo buscar: {e}", "error")
-            else:
-                self.agregar_mensaje("No se especificó qué buscar.", "error")
-            return
-            
-        # Crear archivo
-        elif any(frase in texto for frase in ["crear archivo", "nuevo archivo", "hacer archivo", "crea archivo"]):
-            palabras_clave = ["crear archivo", "nuevo archivo", "hacer archivo", "crea archivo"]
-            nombre_archivo = None
-            for palabra in palabras_clave:
-                if palabra in texto:
-                    nombre_archivo = texto.split(palabra, 1)[1].strip()
-                    break
-            
-            if nombre_archivo:
-                try:
-                    ruta_completa = os.path.join(self.ruta_trabajo, nombre_archivo)
-                    with open(ruta_completa, 'w') as f: 
-                        pass
-                    self.agregar_mensaje(f"Archivo creado: {ruta_completa}", "respuesta")
-                except Exception as e:
-                    self.agregar_mensaje(f"Error al crear archivo: {str(e)}", "error")
-            else:
-                self.agregar_mensaje("No se especificó nombre de archivo.", "error")
-            return
-                
-        # Mostrar información del sistema
-        elif any(frase in texto for frase in ["información del sistema", "info sistema", "información", "sistema", "información de sistema"]):
-            info = f"OS: {platform.system()} {platform.release()}\nVer: {platform.version()}\nArch: {platform.machine()}\nProc: {platform.processor()}\nHost: {platform.node()}"
-            self.agregar_mensaje(info, "respuesta")
-            return
-                
-        # Mostrar procesos en ejecución
-        elif any(frase in texto for frase in ["mostrar procesos", "procesos en ejecución", "procesos", "ver procesos", "listar procesos"]):
-            comando_proc = "tasklist" if self.sistema_operativo == "Windows" else "ps aux"
-            resultado, tipo_resultado = self.ejecutar_comando_terminal(comando_proc)
-            self.agregar_mensaje(resultado, tipo_resultado)
-            return
-                
-        # Mostrar uso de memoria
-        elif any(frase in texto for frase in ["uso de memoria", "memoria", "ram", "memoria ram"]):
-            comando_mem = "wmic OS get FreePhysicalMemory,TotalVisibleMemorySize /Value" if self.sistema_operativo == "Windows" else "free -h"
-            resultado, tipo_resultado = self.ejecutar_comando_terminal(comando_mem)
-            self.agregar_mensaje(resultado, tipo_resultado)
-            return
-                
-        # Mostrar uso de disco
-        elif any(frase in texto for frase in ["uso de disco", "espacio en disco", "disco", "espacio disco"]):
-            comando_disk = "wmic logicaldisk get caption,freespace,size /format:table" if self.sistema_operativo == "Windows" else "df -h"
-            resultado, tipo_resultado = self.ejecutar_comando_terminal(comando_disk)
-            self.agregar_mensaje(resultado, tipo_resultado)
+                self.agregar_mensaje(f"Error al cambiar directorio: {str(e)}", "error")
+        else:
+            self.agregar_mensaje("No se especificó un directorio.", "error")
+    
+    def resolver_directorio(self, nombre):
+        """Carpeta existente más parecida a nombre, o None tras avisar al usuario"""
+        candidatos = self.directory_resolver.resolve(nombre, os.getcwd())
+        if candidatos and candidatos[0][0] >= self.directory_threshold:
+            return candidatos[0][1]
+        sugerencias = [ruta for confianza, ruta in candidatos if confianza >= 0.5]
+        if sugerencias:
+            nombres = " o ".join(f"'{os.path.basename(ruta)}'" for ruta in sugerencias)
+            self.agregar_mensaje(f"No encontré '{nombre}'. ¿Quisiste decir {nombres}?", "sistema")
+        else:
+            self.agregar_mensaje(f"Directorio '{nombre}' no encontrado.", "error")
+        return None
+    
+    def accion_crear_carpeta(self, argumento):
+        """Crea una carpeta en la ruta de trabajo"""
+        if argumento:
+            try:
+                ruta_completa = os.path.join(self.ruta_trabajo, argumento)
+                os.makedirs(ruta_completa, exist_ok=True)
+                self.agregar_mensaje(f"Carpeta creada: {ruta_completa}", "respuesta")
+            except Exception as e:
+                self.agregar_mensaje(f"Error al crear carpeta: {str(e)}", "error")
+        else:
+            self.agregar_mensaje("No se especificó nombre para la carpeta.", "error")
+    
+    def accion_ejecutar(self, argumento):
+        """Ejecuta un comando directo de terminal"""
+        if argumento:
+            self.agregar_mensaje(f"Ejecutando: {argumento}", "sistema")
+            self.despachar_comando_terminal(argumento)
+        else:
+            self.agregar_mensaje("No se especificó comando a ejecutar.", "error")
+    
+    def accion_listar(self, argumento):
+        """Lista archivos y directorios de la ruta de trabajo, por páginas"""
+        self.mostrar_pagina_listado(self.ruta_trabajo, 0)
+    
+    def accion_listar_mas(self, argumento):
+        """Muestra la siguiente página del último listado"""
+        if self.listado_actual is None:
+            self.agregar_mensaje("No hay ningún listado en curso. Di 'listar' primero.", "error")
             return
-                
-        # Mostrar conexiones de red
-        elif any(frase in texto for frase in ["conexiones de red", "mostrar conexiones", "red", "conexiones", "conexión"]):
-            comando_red = "netstat -an" if self.sistema_operativo == "Windows" else "netstat -tup"
-            resultado, tipo_resultado = self.ejecutar_comando_terminal(comando_red)
-            self.agregar_mensaje(resultado, tipo_resultado)
+        ruta, inicio = self.listado_actual
+        total = self.lister.count(ruta)
+        if total is not None and inicio >= total:
+            self.agregar_mensaje("No hay más entradas en el listado.", "sistema")
             return
-            
-        # Activar síntesis de voz
-        elif any(frase in texto for frase in ["activar voz", "habilitar voz", "con voz", "activa voz"]):
-            if not self.tts_enabled:
-                self.tts_enabled = True
-                self.tts_button.setText("Voz: Activada")
-                self.agregar_mensaje("Síntesis de voz activada", "respuesta")
-                if self.tts_manager.available:
-                    self.tts_manager.speak("Síntesis de voz activada")
-            else:
-                self.agregar_mensaje("La síntesis de voz ya está activada", "respuesta")
+        self.mostrar_pagina_listado(ruta, inicio)
+    
+    def mostrar_pagina_listado(self, ruta, inicio):
+        """Lee la página fuera del hilo de la interfaz; un directorio enorme no bloquea la ventana"""
+        self.listado_actual = (ruta, inicio + self.lister.page_size)
+        id_comando = self.command_executor.submit_task(
+            "listar", lambda: self.lister.page_text(ruta, inicio))
+        if id_comando is None:
+            self.agregar_mensaje("Hay demasiados comandos en ejecución. Espera o di 'cancelar comandos'.", "error")
+        elif self.ids_paso is not None:
+            self.ids_paso.append(id_comando)
+    
+    def accion_directorio_actual(self, argumento):
+        """Muestra el directorio actual"""
+        self.agregar_mensaje(f"Directorio CWD: {os.getcwd()}", "respuesta")
+        self.agregar_mensaje(f"Ruta de trabajo: {self.ruta_trabajo}", "respuesta")
+    
+    def accion_hora(self, argumento):
+        """Muestra la hora actual"""
+        self.agregar_mensaje(f"Son las {datetime.datetime.now().strftime('%H:%M:%S')}", "respuesta")
+    
+    def accion_fecha(self, argumento):
+        """Muestra la fecha actual"""
+        self.agregar_mensaje(f"Hoy es {datetime.datetime.now().strftime('%d/%m/%Y')}", "respuesta")
+    
+    def accion_abrir_navegador(self, argumento):
+        """Abre el navegador web"""
+        try:
+            webbrowser.open("https://www.google.com")
+            self.agregar_mensaje("Abriendo navegador...", "respuesta")
+        except Exception as e:
+            self.agregar_mensaje(f"No se pudo abrir navegador: {e}", "error")
+    
+    def accion_buscar(self, argumento):
+        """Busca en Google"""
+        if argumento:
+            try:
+                url = f"https://www.google.com/search?q={argumento.replace(' ', '+')}"
+                webbrowser.open(url)
+                self.agregar_mensaje(f"Buscando '{argumento}'...", "respuesta")
+            except Exception as e:
+                self.agregar_mensaje(f"No se pudo buscar: {e}", "error")
+        else:
+            self.agregar_mensaje("No se especificó qué buscar.", "error")
+    
+    def accion_buscar_archivo(self, argumento):
+        """Busca un archivo o carpeta por nombre en el índice de la ruta de trabajo"""
+        if not argumento:
+            self.agregar_mensaje("No se especificó qué archivo buscar.", "error")
             return
-            
-        # Desactivar síntesis de voz
-        elif any(frase in texto for frase in ["desactivar voz", "deshabilitar voz", "sin voz", "desactiva voz"]):
-            if self.tts_enabled:
-                self.tts_enabled = False
-                self.tts_button.setText("Voz: Desactivada")
-                self.agregar_mensaje("Síntesis de voz desactivada", "respuesta")
+        estado = self.file_index.stats()
+        inicio = time.perf_counter()
+        resultados = self.file_index.search(argumento)
+        transcurrido = (time.perf_counter() - inicio) * 1000
+        if not resultados:
+            if estado["indexando"]:
+                self.agregar_mensaje("El índice de archivos aún se está construyendo. Prueba en unos segundos.", "sistema")
             else:
-                self.agregar_mensaje("La síntesis de voz ya está desactivada", "respuesta")
-            return
-        
-        # Comando de ayuda
-        elif any(frase in texto for frase in ["ayuda", "help", "comandos", "qué puedo hacer", "que puedo hacer"]):
-            self.agregar_mensaje("Consulta la lista de comandos disponibles en el panel derecho.", "sistema")
+                self.agregar_mensaje(f"No se encontró ningún archivo parecido a '{argumento}'.", "error")
             return
-        
-        # Si no se reconoce ningún comando, dar sugerencias
+        lineas = [f"{len(resultados)} resultados para '{argumento}' ({transcurrido:.1f} ms):"]
+        for ruta, es_carpeta, coincidencia in resultados:
+            relativa = os.path.relpath(ruta, self.file_index.raiz)
+            marca = os.sep if es_carpeta else ""
+            lineas.append(f"  {relativa}{marca}" + ("" if coincidencia == "prefijo" else f"  ({coincidencia})"))
+        if estado["indexando"]:
+            lineas.append("El índice aún se está construyendo; puede haber más resultados.")
+        self.agregar_mensaje("\n".join(lineas), "respuesta")
+    
+    def accion_crear_archivo(self, argumento):
+        """Crea un archivo vacío en la ruta de trabajo"""
+        if argumento:
+            try:
+                ruta_completa = os.path.join(self.ruta_trabajo, argumento)
+                # 'x' falla si ya existe: nunca se vacía un archivo con contenido
+                with open(ruta_completa, 'x') as f:
+                    pass
+                self.agregar_mensaje(f"Archivo creado: {ruta_completa}", "respuesta")
+            except FileExistsError:
+                self.agregar_mensaje(f"El archivo ya existe: {ruta_completa}", "error")
+            except Exception as e:
+                self.agregar_mensaje(f"Error al crear archivo: {str(e)}", "error")
         else:
-            sugerencias = [
-                "Intenta decir: 'listar', 'hora', 'fecha', 'información del sistema'",
-                "Para ejecutar comandos: 'ejecutar [comando]'",
-                "Para crear: 'crear carpeta [nombre]' o 'crear archivo [nombre]'",
-                "Para ayuda: 'comandos' o 'ayuda'"
-            ]
-            self.agregar_mensaje(f"Comando no reconocido: '{texto}'.", "error")
-            self.agregar_mensaje("Sugerencias:", "sistema")
-            for sugerencia in sugerencias:
-                self.agregar_mensaje(f"• {sugerencia}", "sistema")
-            return
+            self.agregar_mensaje("No se especificó nombre de archivo.", "error")
+    
+    def accion_informacion_sistema(self, argumento):
+        """Muestra información del sistema"""
+        info = f"OS: {platform.system()} {platform.release()}\nVer: {platform.version()}\nArch: {platform.machine()}\nProc: {platform.processor()}\nHost: {platform.node()}"
+        self.agregar_mensaje(info, "respuesta")
+    
+    def accion_procesos(self, argumento):
+        """Muestra los procesos en ejecución"""
+        comando_proc = "tasklist" if self.sistema_operativo == "Windows" else "ps aux"
+        self.despachar_consulta_sistema("procesos", comando_proc)
+    
+    def accion_memoria(self, argumento):
+        """Muestra el uso de memoria"""
+        comando_mem = "wmic OS get FreePhysicalMemory,TotalVisibleMemorySize /Value" if self.sistema_operativo == "Windows" else "free -h"
+        self.despachar_consulta_sistema("memoria", comando_mem)
+    
+    def accion_disco(self, argumento):
+        """Muestra el uso de disco"""
+        comando_disk = "wmic logicaldisk get caption,freespace,size /format:table" if self.sistema_operativo == "Windows" else "df -h"
+        self.despachar_consulta_sistema("disco", comando_disk)
+    
+    def accion_red(self, argumento):
+        """Muestra las conexiones de red"""
+        comando_red = "netstat -an" if self.sistema_operativo == "Windows" else "netstat -tup"
+        self.despachar_consulta_sistema("red", comando_red)
+    
+    def accion_activar_voz(self, argumento):
+        """Activa la síntesis de voz"""
+        if not self.tts_enabled:
+            self.tts_enabled = True
+            self.config.set('tts_enabled', True)
+            self.tts_button.setText("Voz: Activada")
+            self.agregar_mensaje("Síntesis de voz activada", "respuesta")
+            if self.tts_manager.available:
+                self.tts_manager.speak("Síntesis de voz activada", TextToSpeechManager.PRIORITY_HIGH)
+        else:
+            self.agregar_mensaje("La síntesis de voz ya está activada", "respuesta")
+    
+    def accion_desactivar_voz(self, argumento):
+        """Desactiva la síntesis de voz"""
+        if self.tts_enabled:
+            self.tts_enabled = False
+            self.config.set('tts_enabled', False)
+            self.tts_manager.cancel()
+            self.tts_button.setText("Voz: Desactivada")
+            self.agregar_mensaje("Síntesis de voz desactivada", "respuesta")
+        else:
+            self.agregar_mensaje("La síntesis de voz ya está desactivada", "respuesta")
+    
+    def accion_cancelar_comandos(self, argumento):
+        """Cancela los comandos de terminal en curso"""
+        cancelados = self.command_executor.cancel_all()
+        if cancelados:
+            self.agregar_mensaje(f"Cancelando {cancelados} comando(s) en curso", "respuesta")
+        else:
+            self.agregar_mensaje("No hay comandos en ejecución", "respuesta")
+    
+    def recopilar_metricas(self):
+        """Métricas de cada componente como [(componente, dict), ...]"""
+        grupos = []
+        if hasattr(self, 'speech_thread'):
+            grupos.append(("Reconocimiento", self.speech_thread.recognition_worker.metrics()))
+            grupos.append(("VAD", self.speech_thread.vad.metrics()))
+        if self.recognition_cache is not None:
+            grupos.append(("Caché", self.recognition_cache.metrics()))
+        grupos.append(("Voz", self.tts_manager.metrics()))
+        grupos.append(("Consola", self.consola.metrics()))
+        grupos.append(("Listados", self.lister.metrics()))
+        grupos.append(("Índice", self.file_index.stats()))
+        return grupos
+    
+    def accion_metricas(self, argumento):
+        """Muestra las métricas internas en la consola"""
+        self.agregar_mensaje("Métricas:\n" + format_metrics(self.recopilar_metricas()), "respuesta")
+    
+    def accion_ayuda(self, argumento):
+        """Muestra ayuda"""
+        self.agregar_mensaje("Consulta la lista de comandos disponibles en el panel derecho.", "sistema")
             
     def confirmar_eliminacion(self, ruta_completa):
         """Muestra diálogo de confirmación para eliminar un archivo"""
@@ -1582,6 +5282,17 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
     def closeEvent(self, event):
         """Maneja el evento de cierre de ventana"""
         self.guardar_configuracion()
+        try:
+            self.config.flush()  # Escritura final síncrona de lo pendiente
+        except Exception as e: print(f"Error al guardar configuración: {e}")
+        
+        try:
+            self.historial.close()
+        except Exception as e: print(f"Error al cerrar el historial: {e}")
+        
+        try:
+            self.file_index.close()
+        except Exception as e: print(f"Error al cerrar el índice de archivos: {e}")
         
         try:
             if hasattr(self, 'audio_thread') and self.audio_thread.isRunning():
@@ -1595,6 +5306,26 @@ CONSEJOS PARA MEJOR RECONOCIMIENTO:
                 if not self.speech_thread.wait(500): self.speech_thread.terminate() 
         except Exception as e: print(f"Error al detener speech_thread: {e}")
         
+        try:
+            if hasattr(self, 'speech_thread'):
+                self.speech_thread.recognition_worker.shutdown()
+        except Exception as e: print(f"Error al detener recognition_worker: {e}")
+        
+        try:
+            if getattr(self, 'recognition_cache', None) is not None:
+                self.recognition_cache.save()
+        except Exception as e: print(f"Error al guardar la caché de reconocimiento: {e}")
+        
+        try:
+            if hasattr(self, 'tts_manager'):
+                self.tts_manager.stop()
+        except Exception as e: print(f"Error al detener tts_manager: {e}")
+        
+        try:
+            if hasattr(self, 'command_executor'):
+                self.command_executor.shutdown()
+        except Exception as e: print(f"Error al detener command_executor: {e}")
+        
         if hasattr(self, 'consola') and hasattr(self.consola, 'buffer_timer') and self.consola.buffer_timer:
             self.consola.buffer_timer.stop()
         